@@ -0,0 +1,95 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+# Measures start-up of each command with `python -X importtime` against a local fake of the GitHub API.
+#
+#     PYTHONPATH=. python3 benchmarks/startup.py --runs 10
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from github_labels_sync.fake_github import FakeGitHub, FakeServer
+
+COMMANDS = 'help', 'usage_error', 'init', 'pull', 'push', 'apply'
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog=argv[0], description='Benchmark start-up time of commands.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs of each command.')
+    parser.add_argument('--command', action='append', choices=COMMANDS, help='Run only selected commands.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    params = parser.parse_args(argv[1:])
+
+    fake = FakeGitHub.generate(repos=3, labels=5)
+    with FakeServer(fake) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, PYTHONPATH=ROOT, GITHUB_API_URL=server.url, GITHUB_GRAPHQL_URL=server.graphql_url)
+        config_path = os.path.join(tmp_dir, 'labels.json')
+        plan_path = os.path.join(tmp_dir, 'plan.jsonl')
+        # Nothing is written outside of the temporary directory, e.g. into the label store of the user.
+        common = ['--token', 'benchmark', '--no-store', '--journal', os.path.join(tmp_dir, 'journal.jsonl')]
+        commands: Dict[str, List[str]] = {
+            'help': ['--help'],
+            'usage_error': [],
+            'init': ['--init', '--config', os.path.join(tmp_dir, 'init.json'), '--primary-repo', 'owner0/repo0'],
+            'pull': ['--pull', '--config', config_path, *common],
+            'push': ['--push', '--config', config_path, '--dry-run', *common],
+            'apply': ['--apply', plan_path, '--dry-run', *common],
+        }
+        with open(config_path, 'wt', encoding='utf-8') as fh:
+            json.dump({'repos': {'primary': 'owner0/repo0', 'secondary': ['owner0/repo1', 'owner0/repo2']}}, fh)
+        run(['--pull', '--config', config_path, *common], env)
+        run(['--push', '--config', config_path, '--plan-out', plan_path, *common], env)
+        for name in params.command or COMMANDS:
+            result = measure(name, commands[name], env, params.runs)
+            print(json.dumps(result) if params.json else format_result(result))
+    return 0
+
+
+def run(args: List[str], env: Dict[str, str]) -> 'subprocess.CompletedProcess[str]':
+    return subprocess.run([sys.executable, '-X', 'importtime', '-m', 'github_labels_sync', *args], env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+
+
+def measure(name: str, args: List[str], env: Dict[str, str], runs: int) -> Dict[str, Any]:
+    wall_times = []
+    import_times = []
+    modules: List[str] = []
+    for _i in range(runs):
+        start = time.perf_counter()
+        process = run(args, env)
+        wall_times.append(time.perf_counter() - start)
+        total = 0
+        modules = []
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME.match(line)
+            if match:
+                total += int(match.group(1))
+                modules.append(match.group(4))
+        import_times.append(total / 1e6)
+    return {
+        'command': name,
+        'wall_time': round(min(wall_times), 3),
+        'import_time': round(min(import_times), 3),
+        'modules': len(modules),
+        'package_modules': sum(1 for module in modules if module.startswith('github_labels_sync.')),
+        'requests': 'requests' in modules,
+    }
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (f'{result["command"]:<12} {result["wall_time"]:>7.3f} s wall {result["import_time"]:>7.3f} s imports '
+            f'{result["modules"]:>5} modules {result["package_modules"]:>3} own '
+            f'{"with" if result["requests"] else "without"} requests')
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
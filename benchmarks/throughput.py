@@ -0,0 +1,164 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+# Measures push, pull and replace_label against a local fake of the GitHub API.
+#
+#     PYTHONPATH=. python3 benchmarks/throughput.py --repos 1000 --labels 150 --issues 10000 --latency 0.05
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub, FakeServer, RateLimiter
+from github_labels_sync.github import GitHub, GraphqlClient, RestClient, MUTATION_LINGER
+from github_labels_sync.label import Label
+from github_labels_sync.pull_command import pull
+from github_labels_sync.push_command import push, PushOptions
+from github_labels_sync.tokens import Token, TokenPool
+
+SCENARIOS = 'pull', 'push', 'replace_label'
+ISSUES_REPO = 'bench/issues'
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog=argv[0], description='Benchmark against a local fake GitHub API.')
+    parser.add_argument('--repos', type=int, default=100, help='Number of repositories in the fleet.')
+    parser.add_argument('--owners', type=int, default=1, help='Number of repository owners in the fleet.')
+    parser.add_argument('--labels', type=int, default=50, help='Number of labels in each repository.')
+    parser.add_argument('--issues', type=int, default=1000,
+                        help='Number of issues and pull requests relabeled by the replace_label scenario.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latency of each API request in seconds.')
+    parser.add_argument('--rate-limit', type=int, help='Requests per token and rate limit window.')
+    parser.add_argument('--rate-limit-window', type=float, default=3600, help='Rate limit window in seconds.')
+    parser.add_argument('--batch-mutations', action='store_true',
+                        help='Change labels with batches of GraphQL mutations in the push scenario.')
+    parser.add_argument('--tokens', type=int, default=1, help='Number of tokens with separate rate limits.')
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel jobs of the push scenario.')
+    parser.add_argument('--jobs-per-repo', type=int, default=1,
+                        help='Parallel actions in each repository of the push scenario.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only selected scenarios.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    params = parser.parse_args(argv[1:])
+
+    fake = FakeGitHub.generate(params.repos, params.labels, owners=params.owners)
+    add_issues_repo(fake, params.issues)
+    rate_limiter = RateLimiter(params.rate_limit, params.rate_limit_window)
+    with FakeServer(fake, latency=params.latency, rate_limiter=rate_limiter) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        session = requests.Session()
+        github = GitHub(GraphqlClient(server.graphql_url, session), RestClient(server.url, session))
+        if params.batch_mutations:
+            github.set_batching(linger=MUTATION_LINGER if params.jobs > 1 else 0.0)
+        if params.tokens > 1:
+            github.set_tokens(TokenPool(Token(f'benchmark{i}') for i in range(params.tokens)))
+        else:
+            github.set_token('benchmark')
+        config_path = os.path.join(tmp_dir, 'labels.json')
+        scenarios: Dict[str, Callable[[], int]] = {
+            'pull': lambda: run_pull(github, config_path),
+            'push': lambda: run_push(github, fake, config_path, params.jobs, params.jobs_per_repo),
+            'replace_label': lambda: run_replace_label(github, fake),
+        }
+        for name in params.scenario or SCENARIOS:
+            result = measure(fake, name, scenarios[name])
+            print(json.dumps(result) if params.json else format_result(result))
+    return 0
+
+
+def add_issues_repo(fake: FakeGitHub, issues: int) -> None:
+    repo = fake.add_repo(ISSUES_REPO)
+    old = fake.add_label(repo, 'old', 'ff0000')
+    fake.add_label(repo, 'new', '00ff00')
+    for i in range(issues):
+        fake.add_issue(repo, is_pull_request=i % 4 == 3).labels.append(old)
+
+
+def measure(fake: FakeGitHub, name: str, scenario: Callable[[], int]) -> Dict[str, Any]:
+    calls_before = sum(fake.calls.values())
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        actions = scenario()
+    wall_time = time.perf_counter() - start
+    calls = sum(fake.calls.values()) - calls_before
+    return {
+        'scenario': name,
+        'wall_time': round(wall_time, 3),
+        'api_calls': calls,
+        'requests_per_second': round(calls / wall_time, 1) if wall_time else None,
+        'actions': actions,
+        'api_calls_per_action': round(calls / actions, 3) if actions else None,
+    }
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (f'{result["scenario"]:<14} {result["wall_time"]:>9.3f} s {result["api_calls"]:>7} calls '
+            f'{result["requests_per_second"] or 0:>9.1f} req/s {result["actions"]:>7} actions '
+            f'{result["api_calls_per_action"] or 0:>7.3f} calls/action')
+
+
+def run_pull(github: GitHub, config_path: str) -> int:
+    config = Config(config_path, primary_repo='owner0/repo0', allow_empty=True)
+    pull(github, config)
+    return len(config.labels.mandatory)
+
+
+def run_push(github: GitHub, fake: FakeGitHub, config_path: str, jobs: int, jobs_per_repo: int) -> int:
+    config = make_push_config(fake, config_path)
+    actions = 0
+    for repo in config.all_repos:
+        owner, name = repo.split('/')
+        actions += len(config.labels.process(get_labels(fake, owner, name)))
+    push(github, config, PushOptions(jobs=jobs, jobs_per_repo=jobs_per_repo))
+    return actions
+
+
+def make_push_config(fake: FakeGitHub, config_path: str) -> Config:
+    # Recolor every tenth label, rename the first one via an alias and add a few new labels.
+    labels = get_labels(fake, 'owner0', 'repo0')
+    mandatory = {}
+    aliases = {}
+    for i, label in enumerate(labels):
+        color = 'abcdef' if i % 10 == 0 else label.color
+        name = label.name + '-renamed' if i == 0 else label.name
+        if i == 0:
+            aliases[label.name] = name
+        mandatory[name] = {'color': color, 'description': label.description}
+    for i in range(5):
+        mandatory[f'new{i}'] = {'color': '123456', 'description': f'New label {i}'}
+    repos = [name for name in (repo.name_with_owner for repo in fake.repos.values()) if name != ISSUES_REPO]
+    with open(config_path, 'wt', encoding='utf-8') as fh:
+        json.dump({'mandatory': mandatory, 'aliases': aliases,
+                   'repos': {'primary': repos[0], 'secondary': repos[1:]}}, fh)
+    return Config(config_path)
+
+
+def get_labels(fake: FakeGitHub, owner: str, name: str) -> List[Label]:
+    return [Label.create(label.name, label.color, label.description, label.id)
+            for label in fake.get_repo(owner, name).all_labels.values()]
+
+
+def run_replace_label(github: GitHub, fake: FakeGitHub) -> int:
+    total: Optional[int] = None
+
+    def progress(_done: int, count: int) -> None:
+        nonlocal total
+        total = count
+
+    github.replace_label(ISSUES_REPO, 'old', 'new', progress=progress)
+    owner, name = ISSUES_REPO.split('/')
+    old = fake.get_repo(owner, name).label('old')
+    assert old and not old.issues().total_count
+    return total or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,69 +1,228 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from github_labels_sync.github import GitHub
+from typing import Optional, Dict, Any, Tuple, Type, TYPE_CHECKING
+
+from github_labels_sync.label import Label
+from github_labels_sync.mutations import LabelMutation
 from github_labels_sync.typing import StrDict
 
+if TYPE_CHECKING:
+    # Only for annotations, not to import the HTTP stack when actions are just planned and to avoid an import cycle.
+    from github_labels_sync.async_github import AsyncGitHub  # pylint: disable=ungrouped-imports
+    from github_labels_sync.github import GitHub, ProgressCallback  # pylint: disable=ungrouped-imports
+    from github_labels_sync.journal import RelabelCheckpoint  # pylint: disable=ungrouped-imports
+
 
 class Action:
-    def run(self, github: GitHub, repo: str) -> None:
+    TYPE: str = ''
+
+    def run(self, github: 'GitHub', repo: str) -> None:
+        raise NotImplementedError
+
+    async def run_async(self, github: 'AsyncGitHub', repo: str) -> None:
+        raise NotImplementedError
+
+    def get_names(self) -> Tuple[str, ...]:
+        # Names of labels the action depends on or changes.
+        raise NotImplementedError
+
+    def get_mutation(self, repo: str) -> LabelMutation:
+        # The label mutation of the action for batches of mutations. It must be sent after `prepare`.
+        raise NotImplementedError
+
+    def prepare(self, github: 'GitHub', repo: str, **kwargs: Any) -> None:
+        pass
+
+    def export(self) -> Dict[str, Any]:
         raise NotImplementedError
 
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        try:
+            action_type = ACTIONS[data['type']]
+        except KeyError as e:
+            raise ValueError(f'Unknown action: {data!r}.') from e
+        return action_type.load(data)
+
 
 class UpdateAction(Action):
-    def __init__(self, label: StrDict, updates: StrDict) -> None:
+    TYPE = 'update'
+
+    def __init__(self, label: Label, updates: StrDict) -> None:
         self.updates = updates
         self.label = label
 
-    def run(self, github: GitHub, repo: str) -> None:
-        github.update_label(repo, self.label["name"], self.updates)
+    def run(self, github: 'GitHub', repo: str) -> None:
+        github.update_label(repo, self.label.name, self.updates)
+
+    async def run_async(self, github: 'AsyncGitHub', repo: str) -> None:
+        await github.update_label(repo, self.label.name, self.updates)
+
+    def get_names(self) -> Tuple[str, ...]:
+        return (self.label.name, self.updates['name']) if 'name' in self.updates else (self.label.name,)
+
+    def get_mutation(self, repo: str) -> LabelMutation:
+        return LabelMutation('update', repo, self.label.name, self.updates)
+
+    def export(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'label': self.label.export(), 'updates': self.updates}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        return cls(Label.load(data['label']), data['updates'])
 
     def __repr__(self) -> str:
-        return f'Update: {self.label["name"]!r}'
+        return f'Update: {self.label.name!r}'
 
 
 class ReplaceAction(Action):
-    def __init__(self, label: StrDict, replacement: StrDict) -> None:
+    TYPE = 'replace'
+
+    def __init__(self, label: Label, replacement: Label) -> None:
         self.label = label
         self.replacement = replacement
-        assert 'name' in replacement, replacement
 
-    def run(self, github: GitHub, repo: str) -> None:
-        old_label = self.label["name"]
-        github.replace_label(repo, old_label, self.replacement["name"])
-        github.delete_label(repo, old_label)
+    def run(self, github: 'GitHub', repo: str, progress: Optional['ProgressCallback'] = None,
+            checkpoint: Optional['RelabelCheckpoint'] = None) -> None:
+        self.prepare(github, repo, progress=progress, checkpoint=checkpoint)
+        github.delete_label(repo, self.label.name)
+
+    def prepare(self, github: 'GitHub', repo: str, progress: Optional['ProgressCallback'] = None,
+                checkpoint: Optional['RelabelCheckpoint'] = None, **kwargs: Any) -> None:
+        # Moves issues and pull requests to the replacement, so that only the old label is left to be deleted.
+        old_label = self.label.name
+        if not checkpoint:
+            github.replace_label(repo, old_label, self.replacement.name, progress=progress)
+        else:
+            relabeling = checkpoint.relabeling
+            if not relabeling:
+                relabeling = github.prepare_relabeling(repo, old_label, self.replacement.name)
+                if relabeling:
+                    checkpoint.set_relabeling(relabeling)
+            if relabeling:
+                github.run_relabeling(relabeling, checkpoint.relabeled, progress=checkpoint.track(progress))
+
+    async def run_async(self, github: 'AsyncGitHub', repo: str, progress: Optional['ProgressCallback'] = None) -> None:
+        old_label = self.label.name
+        await github.replace_label(repo, old_label, self.replacement.name, progress=progress)
+        await github.delete_label(repo, old_label)
+
+    def get_names(self) -> Tuple[str, ...]:
+        return self.label.name, self.replacement.name
+
+    def get_mutation(self, repo: str) -> LabelMutation:
+        return LabelMutation('delete', repo, self.label.name)
+
+    def export(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'label': self.label.export(), 'replacement': self.replacement.export()}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        return cls(Label.load(data['label']), Label.load(data['replacement']))
 
     def __repr__(self) -> str:
-        return f'Replace: {self.label["name"]!r} → {self.replacement["name"]!r}'
+        return f'Replace: {self.label.name!r} → {self.replacement.name!r}'
 
 
 class RenameAction(UpdateAction):
-    def __init__(self, label: StrDict, updates: StrDict) -> None:
+    TYPE = 'rename'
+
+    def __init__(self, label: Label, updates: StrDict) -> None:
         super().__init__(label, updates)
         assert 'name' in updates, updates
 
     def __repr__(self) -> str:
-        return f'Rename: {self.label["name"]!r} → {self.updates["name"]!r}'
+        return f'Rename: {self.label.name!r} → {self.updates["name"]!r}'
 
 
 class UnknownLabelAction(Action):
-    def __init__(self, label: StrDict) -> None:
+    TYPE = 'unknown'
+
+    def __init__(self, label: Label) -> None:
+        self.label = label
+
+    def run(self, github: 'GitHub', repo: str) -> None:
+        raise NotImplementedError(f'No idea what to do with {self.label.name!r} in {repo}')
+
+    async def run_async(self, github: 'AsyncGitHub', repo: str) -> None:
+        raise NotImplementedError(f'No idea what to do with {self.label.name!r} in {repo}')
+
+    def get_names(self) -> Tuple[str, ...]:
+        return (self.label.name,)
+
+    def export(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'label': self.label.export()}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        return cls(Label.load(data['label']))
+
+    def __repr__(self) -> str:
+        return f'Unknown: {self.label.name!r}'
+
+
+class DeleteAction(Action):
+    # Not planned from a config, but used when a label is deleted in the primary repository.
+    TYPE = 'delete'
+
+    def __init__(self, label: Label) -> None:
         self.label = label
 
-    def run(self, github: GitHub, repo: str) -> None:
-        raise NotImplementedError(f'No idea what to do with {self.label["name"]!r} in {repo}')
+    def run(self, github: 'GitHub', repo: str) -> None:
+        github.delete_label(repo, self.label.name)
+
+    async def run_async(self, github: 'AsyncGitHub', repo: str) -> None:
+        await github.delete_label(repo, self.label.name)
+
+    def get_names(self) -> Tuple[str, ...]:
+        return (self.label.name,)
+
+    def get_mutation(self, repo: str) -> LabelMutation:
+        return LabelMutation('delete', repo, self.label.name)
+
+    def export(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'label': self.label.export()}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        return cls(Label.load(data['label']))
 
     def __repr__(self) -> str:
-        return f'Unknown: {self.label["name"]!r}'
+        return f'Delete: {self.label.name!r}'
 
 
 class CreateAction(Action):
-    def __init__(self, name: str, properties: StrDict, ) -> None:
+    TYPE = 'create'
+
+    def __init__(self, name: str, properties: StrDict) -> None:
         self.name = name
         self.properties = properties
 
-    def run(self, github: GitHub, repo: str) -> None:
+    def run(self, github: 'GitHub', repo: str) -> None:
         github.create_label(repo, self.name, self.properties)
 
+    async def run_async(self, github: 'AsyncGitHub', repo: str) -> None:
+        await github.create_label(repo, self.name, self.properties)
+
+    def get_names(self) -> Tuple[str, ...]:
+        return (self.name,)
+
+    def get_mutation(self, repo: str) -> LabelMutation:
+        return LabelMutation('create', repo, self.name, self.properties)
+
+    def export(self) -> Dict[str, Any]:
+        return {'type': self.TYPE, 'name': self.name, 'properties': self.properties}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Action':
+        return cls(data['name'], data['properties'])
+
     def __repr__(self) -> str:
         return f'Create: {self.name!r}'
+
+
+ACTIONS: Dict[str, Type[Action]] = {
+    action.TYPE: action for action in (UpdateAction, ReplaceAction, RenameAction, UnknownLabelAction, DeleteAction,
+                                       CreateAction)
+}
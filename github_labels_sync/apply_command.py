@@ -0,0 +1,29 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import List
+
+from github_labels_sync.actions import Action
+from github_labels_sync.github import GitHub
+from github_labels_sync.plan import read_plan
+from github_labels_sync.push_command import run_jobs, apply_actions, RepoResult, Log, PushOptions
+
+
+def apply(github: GitHub, plan_path: str, options: PushOptions = PushOptions()) -> int:
+    journal = options.journal if not options.dry_run else None
+    options = options._replace(journal=journal)
+
+    def job(repo: str, actions: List[Action], log: Log) -> RepoResult:
+        return apply_actions(github, repo, actions, log, options)
+
+    all_ok: bool = True
+    with open(plan_path, encoding='utf-8') as fh:
+        entries = read_plan(fh)
+        if journal:
+            entries = ((repo, actions) for repo, actions in entries if not journal.is_finished(repo))
+        for result in run_jobs(job, entries, options):
+            if not result.ok:
+                all_ok = False
+    if journal:
+        journal.close(remove=all_ok)
+    return 0 if all_ok else 1
@@ -0,0 +1,305 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import asyncio
+import json
+from urllib.parse import urlsplit
+from typing import Any, AsyncIterator, Callable, Awaitable, Dict, Iterable, List, Mapping, NamedTuple, Optional, \
+    Tuple, Union
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError('AsyncGitHub requires aiohttp, install it with `pip install aiohttp`.') from e
+
+from github_labels_sync import graphql, http, queries, utils
+from github_labels_sync.github import DEFAULT_GRAPHQL_ENDPOINT_URL, DEFAULT_REST_ENDPOINT_URL, BULK_CHUNK_SIZE, \
+    RELABEL_BATCH_SIZE, ProgressCallback
+from github_labels_sync.label import Label
+from github_labels_sync.queries import PAGE_SIZE, LABEL_FIELDS, LABEL_DETAIL_FIELDS
+from github_labels_sync.typing import StrDict
+
+# The maximal number of simultaneous connections, which are kept alive and reused between requests.
+DEFAULT_POOL_SIZE = 100
+
+
+class Response(NamedTuple):
+    status: int
+    reason: str
+    headers: Mapping[str, str]
+    content: bytes
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content) if self.content else None
+
+
+def check_response(method: str, url: str, response: Response) -> Response:
+    # The same check as `http.check_response`.
+    if not 200 <= response.status < 300:
+        raise http.get_error(method, urlsplit(url).path, response.status, response.reason, response.content)
+    return response
+
+
+class AsyncClient:
+    endpoint: str
+    session: Optional[aiohttp.ClientSession]
+    headers: StrDict
+    scheduler: http.Scheduler
+    max_retries: int
+    sleep: Callable[[float], Awaitable[None]]
+
+    def __init__(self, endpoint: str, scheduler: Optional[http.Scheduler] = None) -> None:
+        self.endpoint = endpoint
+        self.session = None
+        self.headers = {'Accept': 'application/json'}
+        self.scheduler = scheduler or http.Scheduler()
+        self.max_retries = http.MAX_RETRIES
+        self.sleep = asyncio.sleep
+
+    @property
+    def budget(self) -> http.Budget:
+        return self.scheduler.budget
+
+    def set_token(self, token: Union[bytes, str]) -> None:
+        self.headers['Authorization'] = f'bearer {token if isinstance(token, str) else token.decode("ascii")}'
+
+    def unset_token(self) -> None:
+        del self.headers['Authorization']
+
+    async def send(self, method: str, url: str, *, retry: Optional[bool] = None, **kwargs: Any) -> Response:
+        # The same retry policy as `http.Client.send`.
+        assert self.session, 'The client is not opened.'
+        if retry is None:
+            retry = method in http.IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            delay = self.scheduler.delay()
+            if delay > 0:
+                await self.sleep(delay)
+            try:
+                async with self.session.request(method, url, headers=self.headers, **kwargs) as raw_response:
+                    response = Response(raw_response.status, raw_response.reason or '', raw_response.headers,
+                                        await raw_response.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not retry or attempt >= self.max_retries:
+                    raise
+                await self.sleep(http.ERROR_BACKOFF * 2 ** attempt)
+                attempt += 1
+                continue
+
+            self.scheduler.update(response.headers)
+            backoff = None
+            if attempt < self.max_retries:
+                backoff = http.get_backoff(self.scheduler, response.headers, attempt,
+                                           rate_limited=self.is_rate_limited(response),
+                                           failed=retry and response.status in http.RETRY_STATUSES)
+            if backoff is None:
+                return response
+            if backoff > 0:
+                await self.sleep(backoff)
+            attempt += 1
+
+    def is_rate_limited(self, response: Response) -> bool:
+        return http.is_rate_limited(response.status, response.headers, response.text)
+
+
+class AsyncGraphqlClient(AsyncClient):
+    def __init__(self, endpoint: str = DEFAULT_GRAPHQL_ENDPOINT_URL,
+                 scheduler: Optional[http.Scheduler] = None) -> None:
+        super().__init__(endpoint, scheduler)
+
+    async def query(self, query: str, variables: Optional[dict] = None) -> dict:
+        return graphql.get_query_data(await self.request(query, variables, retry=True))
+
+    async def mutate(self, mutation: str, variables: Optional[dict] = None) -> dict:
+        return graphql.get_mutation_data(await self.request(mutation, variables, retry=False))
+
+    async def request(self, query: str, variables: Optional[dict] = None, *, retry: bool = False) -> dict:
+        response = await self.send('POST', self.endpoint, retry=retry,
+                                   json={'query': query, 'variables': variables or {}})
+        result = check_response('POST', self.endpoint, response).json()
+        assert isinstance(result, dict)
+        graphql.update_budget(self.scheduler, result)
+        return result
+
+    def is_rate_limited(self, response: Response) -> bool:
+        if super().is_rate_limited(response):
+            return True
+        return response.status == 200 and graphql.is_rate_limited_body(response.content)
+
+
+class AsyncRestClient(AsyncClient):
+    def __init__(self, endpoint: str = DEFAULT_REST_ENDPOINT_URL,
+                 scheduler: Optional[http.Scheduler] = None) -> None:
+        super().__init__(endpoint, scheduler)
+        self.headers['Accept'] = 'application/vnd.github.symmetra-preview+json'
+
+    async def call(self, method: str) -> Union[dict, list]:
+        return await self.request('GET', method)
+
+    async def post(self, method: str, data: Union[dict, list]) -> Union[dict, list]:
+        return await self.request('POST', method, data)
+
+    async def patch(self, method: str, data: Union[dict, list]) -> Union[dict, list]:
+        return await self.request('PATCH', method, data)
+
+    async def delete(self, method: str) -> None:
+        url = f'{self.endpoint}{method}'
+        check_response('DELETE', url, await self.send('DELETE', url))
+
+    async def request(self, http_method: str, method: str, data: Union[dict, list, None] = None) -> Union[dict, list]:
+        body = json.dumps(data).encode() if data is not None else None
+        url = f'{self.endpoint}{method}'
+        result = check_response(http_method, url, await self.send(http_method, url, data=body)).json()
+        assert isinstance(result, (dict, list))
+        return result
+
+
+class AsyncGitHub:  # pylint: disable=too-many-public-methods
+    graphql_client: AsyncGraphqlClient
+    rest_client: AsyncRestClient
+    pool_size: int
+    session: Optional[aiohttp.ClientSession]
+
+    def __init__(self,
+                 graphql_client: Optional[AsyncGraphqlClient] = None,
+                 rest_client: Optional[AsyncRestClient] = None,
+                 *, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        self.graphql_client = graphql_client or AsyncGraphqlClient()
+        self.rest_client = rest_client or AsyncRestClient()
+        self.pool_size = pool_size
+        self.session = None
+
+    async def __aenter__(self) -> 'AsyncGitHub':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        # The session must be created within a running event loop.
+        if not self.session:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+            self.graphql_client.session = self.rest_client.session = self.session
+
+    async def close(self) -> None:
+        if self.session:
+            await self.session.close()
+            self.session = self.graphql_client.session = self.rest_client.session = None
+
+    def set_token(self, token: Union[bytes, str]) -> None:
+        self.graphql_client.set_token(token)
+        self.rest_client.set_token(token)
+
+    def unset_token(self) -> None:
+        self.graphql_client.unset_token()
+        self.rest_client.unset_token()
+
+    def get_budgets(self) -> Dict[str, http.Budget]:
+        return {'graphql': self.graphql_client.budget, 'rest': self.rest_client.budget}
+
+    async def get_label(self, repo: str, name: str) -> dict:
+        result = await self.rest_client.call(f'/repos/{repo}/labels/{name}')
+        assert isinstance(result, dict)
+        return result
+
+    async def create_label(self, repo: str, name: str, properties: dict) -> dict:
+        properties = dict(properties, name=name)
+        result = await self.rest_client.post(f'/repos/{repo}/labels', properties)
+        assert isinstance(result, dict)
+        return result
+
+    async def update_label(self, repo: str, name: str, properties: dict) -> dict:
+        result = await self.rest_client.patch(f'/repos/{repo}/labels/{name}', properties)
+        assert isinstance(result, dict)
+        return result
+
+    async def delete_label(self, repo: str, name: str) -> None:
+        await self.rest_client.delete(f'/repos/{repo}/labels/{name}')
+
+    async def replace_label(self, repo: str, old_label: str, new_label: str, *, batch_size: int = RELABEL_BATCH_SIZE,
+                            progress: Optional[ProgressCallback] = None) -> None:
+        old_id, new_id = await self.get_label_ids(repo, [old_label, new_label])
+        if not old_id:
+            return
+        if not new_id:
+            raise ValueError(f'Cannot find label {new_label!r} in {repo}.')
+
+        # Relabeling shrinks the result set, so collect the items before changing them not to skip any.
+        labelables = [item['id'] async for item in self.iter_labelables_with_label(repo, old_label)]
+        total = len(labelables)
+        done = 0
+        for batch in utils.chunks(labelables, batch_size):
+            await self.relabel(batch, old_id, new_id)
+            done += len(batch)
+            if progress:
+                progress(done, total)
+
+    async def relabel(self, labelables: List[str], old_id: str, new_id: str) -> None:
+        await self.graphql_client.mutate(*queries.relabel_mutation(labelables, old_id, new_id))
+
+    async def get_label_ids(self, repo: str, names: List[str]) -> List[Optional[str]]:
+        data = await self.graphql_client.query(*queries.label_ids_query(repo, names))
+        return queries.parse_label_ids(repo, names, data)
+
+    async def iter_labelables_with_label(self, repo: str, label: str,
+                                         page_size: int = PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        owner, repo = repo.split('/')
+        for connection in queries.LABELABLE_CONNECTIONS:
+            async for item in self.paginate(queries.LABELABLES_QUERY % connection,
+                                            ('repository', 'label', connection), page_size,
+                                            owner=owner, repo=repo, label=label):
+                yield item
+
+    async def list_labels(self, repo: str, page_size: int = PAGE_SIZE) -> List[Label]:
+        return [label async for label in self.iter_labels(repo, page_size)]
+
+    async def iter_labels(self, repo: str, page_size: int = PAGE_SIZE,
+                          after: Optional[str] = None) -> AsyncIterator[Label]:
+        async for node in self.iter_label_details(repo, page_size, after, fields=LABEL_FIELDS):
+            yield Label.load(node)
+
+    async def list_label_details(self, repo: str, page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        return [label async for label in self.iter_label_details(repo, page_size)]
+
+    def iter_label_details(self, repo: str, page_size: int = PAGE_SIZE, after: Optional[str] = None, *,
+                           fields: str = LABEL_DETAIL_FIELDS) -> AsyncIterator[Dict[str, Any]]:
+        owner, repo = repo.split('/')
+        return self.paginate(queries.LABELS_QUERY % fields, ('repository', 'labels'), page_size, after,
+                             owner=owner, repo=repo)
+
+    async def list_labels_bulk(self, repos: Iterable[str],
+                               chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, List[Label]]:
+        chunks = await asyncio.gather(*(self.list_labels_chunk(chunk) for chunk in utils.chunks(repos, chunk_size)))
+        return {repo: labels for chunk in chunks for repo, labels in chunk}
+
+    async def list_labels_chunk(self, repos: List[str]) -> List[Tuple[str, List[Label]]]:
+        result = []
+        for repo, repository in await self.query_repositories(repos, queries.BULK_LABELS_FIELDS):
+            labels = [Label.load(node) for node in repository['labels']['nodes']]
+            page_info = repository['labels']['pageInfo']
+            if page_info['hasNextPage']:
+                labels.extend([label async for label in self.iter_labels(repo, after=page_info['endCursor'])])
+            result.append((repo, labels))
+        return result
+
+    async def query_repositories(self, repos: List[str], fields: str) -> List[Tuple[str, Dict[str, Any]]]:
+        data = await self.graphql_client.query(*queries.repositories_query(repos, fields))
+        return queries.parse_repositories(repos, data)
+
+    async def paginate(self, query: str, path: Iterable[str], page_size: int = PAGE_SIZE,
+                       after: Optional[str] = None, **variables: Any) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            data = await self.graphql_client.query(query, dict(variables, first=page_size, after=after))
+            connection = queries.get_connection(data, path, variables)
+            for node in connection['nodes']:
+                yield node
+            page_info = connection['pageInfo']
+            if not page_info['hasNextPage']:
+                break
+            after = page_info['endCursor']
@@ -0,0 +1,107 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Optional, NamedTuple, List, Tuple
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+# Eviction removes the least recently used entries until the cache shrinks to this fraction of its maximal size.
+EVICTION_TARGET = 0.75
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: str
+
+
+class ResponseCache:
+    directory: str
+    max_size: int
+    _size: Optional[int]
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        path = self._get_path(key)
+        try:
+            with open(path, encoding='utf-8') as fh:
+                entry = json.load(fh)
+            os.utime(path)  # Mark the entry as recently used.
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(entry.get('etag'), entry.get('last_modified'), entry['body'])
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._get_path(key)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='~')
+        with os.fdopen(fd, 'wt', encoding='utf-8') as fh:
+            json.dump(response._asdict(), fh)
+        new_size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._compute_size()
+            else:
+                self._size += new_size - old_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for _mtime, _size, path in self._list_entries():
+                os.unlink(path)
+            self._size = 0
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        for name in names:
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _compute_size(self) -> int:
+        return sum(size for _mtime, size, _path in self._list_entries())
+
+    def _evict(self) -> None:
+        entries = self._list_entries()
+        size = sum(size for _mtime, size, _path in entries)
+        target = self.max_size * EVICTION_TARGET
+        for _mtime, entry_size, path in sorted(entries):
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
@@ -2,19 +2,58 @@
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
 import argparse
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 import os
 
 from github_labels_sync import io
-from github_labels_sync.config import Config
-from github_labels_sync.github import GitHub
-from github_labels_sync.init_command import init
-from github_labels_sync.pull_command import pull
-from github_labels_sync.push_command import push
+
+# Commands and the HTTP stack are imported only when needed to keep start-up fast.
+if TYPE_CHECKING:
+    from github_labels_sync.config import Config
+    from github_labels_sync.github import GitHub
+    from github_labels_sync.journal import Journal
+    from github_labels_sync.push_command import PushOptions
+    from github_labels_sync.shards import Shard
+    from github_labels_sync.stats import Stats
+    from github_labels_sync.store import LabelStore
+    from github_labels_sync.tokens import Token
 
 
 def main(argv: List[str]) -> Optional[int]:
-    parser = argparse.ArgumentParser(prog=argv[0], description='Synchronize GitHub labels.')
+    params = create_parser(argv[0]).parse_args(argv[1:])
+    if params.dir:
+        os.chdir(params.dir)
+
+    if params.merge_reports:
+        from github_labels_sync.merge_command import merge_reports  # pylint: disable=import-outside-toplevel
+        return merge_reports(params.merge_reports)
+
+    if params.find_label:
+        from github_labels_sync.find_command import find_label  # pylint: disable=import-outside-toplevel
+        return find_label(open_store(params), params.find_label)
+
+    config = load_config(params) if not params.apply else None
+    if params.init:
+        from github_labels_sync.init_command import init  # pylint: disable=import-outside-toplevel
+        assert config
+        return init(config)
+
+    tokens = load_tokens(params)
+    github = create_github(params, tokens)
+    request_stats: Optional['Stats'] = None
+    if params.stats or params.stats_out:
+        from github_labels_sync.stats import Stats  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        request_stats = Stats()
+        github.add_hook(request_stats)
+    try:
+        return run(params, github, config)
+    finally:
+        if request_stats:
+            report_stats(params, request_stats)
+
+
+def create_parser(prog: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description='Synchronize GitHub labels.')
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--init', action='store_true', default=False,
                        help='Initialize empty configuration file.')
@@ -22,40 +61,211 @@ def main(argv: List[str]) -> Optional[int]:
                        help='Pull labels from primary repository and update local labels configuration.')
     group.add_argument('--push', action='store_true', default=False,
                        help='Push labels from local configuration to all repositories.')
+    group.add_argument('--apply', metavar='PLAN',
+                       help='Apply actions from a plan file written by --push --plan-out without listing labels.')
+    group.add_argument('--report', metavar='FILE',
+                       help='Write labels of all repositories which differ from the configuration to a file '
+                            'without changing anything.')
+    group.add_argument('--serve', metavar='[HOST:]PORT',
+                       help='Listen for label webhook events and synchronize the labels they change.')
+    group.add_argument('--find-label', metavar='NAME',
+                       help='List repositories with a label from fresh snapshots in the label store without requests.')
+    group.add_argument('--merge-reports', nargs='+', metavar='FILE',
+                       help='Combine results of push shards written by --results into one summary and exit status.')
     parser.add_argument('--primary-repo',
                         help='Set primary repository, overriding that in configuration file.')
     parser.add_argument('--config',
                         help='Set path to configuration file.')
     parser.add_argument('--dir',
                         help='Change working directory at the very beginning.')
-    parser.add_argument('--dry-run',
+    parser.add_argument('--dry-run', action='store_true', default=False,
                         help='Only print what actions would be performed.')
+    parser.add_argument('--plan-out', metavar='PLAN',
+                        help='Write actions for each repository to a plan file instead of performing them.')
+    parser.add_argument('--report-format', choices=('jsonl', 'csv'), default='jsonl',
+                        help='Set format of the report file (default: jsonl).')
+    parser.add_argument('--webhook-secret',
+                        help='Set the secret of webhook events (default: $GITHUB_WEBHOOK_SECRET).')
+    parser.add_argument('--verbose', action='store_true', default=False,
+                        help='Print details of pulled labels such as the number of issues using them.')
+    parser.add_argument('--jobs', type=positive_int, default=1, metavar='N',
+                        help='Push to up to N repositories in parallel. A repository with unknown labels is skipped '
+                             'without stopping the others.')
+    parser.add_argument('--jobs-per-owner', type=positive_int, metavar='N',
+                        help='Push to up to N repositories of the same owner in parallel.')
+    parser.add_argument('--jobs-per-repo', type=positive_int, default=1, metavar='N',
+                        help='Run up to N independent actions in each repository in parallel.')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='Push only to the I-th of N parts of repositories partitioned by a stable hash of their '
+                             'names, e.g. on one of N CI runners.')
+    parser.add_argument('--primary-shard', type=positive_int, metavar='I',
+                        help='Push to the primary repository only on the I-th shard instead of the one its name '
+                             'hashes to.')
+    parser.add_argument('--results', metavar='FILE',
+                        help='Write results of a push to a file for --merge-reports.')
+    parser.add_argument('--batch-mutations', action='store_true', default=False,
+                        help='Create, update and delete labels with batches of GraphQL mutations, shared by '
+                             'repositories pushed in parallel, instead of a REST request for each label.')
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        help='Skip repositories which have not changed since the last successful push.')
+    parser.add_argument('--state-file', metavar='FILE',
+                        help='Set file to store the state of incremental pushes in.')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue an interrupted push or apply without repeating finished actions.')
+    parser.add_argument('--journal', metavar='FILE',
+                        help='Set file to record finished actions of a push or apply in.')
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help='Print statistics of API requests grouped by API, action type and repository.')
+    parser.add_argument('--stats-out', metavar='FILE',
+                        help='Write statistics of API requests to a file.')
+    parser.add_argument('--stats-format', choices=('json', 'openmetrics'), default='json',
+                        help='Set format of the statistics file (default: json).')
+    parser.add_argument('--no-config-cache', action='store_true', default=False,
+                        help='Do not keep a compiled form of the config file next to it.')
+    group = parser.add_mutually_exclusive_group(required=False)
+    group.add_argument('--http-cache', nargs='?', const=io.DEFAULT_HTTP_CACHE_DIR, metavar='DIR',
+                       help=f'List labels with conditional REST requests and cache their responses, optionally '
+                            f'in DIR (default: {io.DEFAULT_HTTP_CACHE_DIR}). Unchanged labels cost no rate limit.')
+    group.add_argument('--no-http-cache', action='store_true', default=False,
+                       help='Do not cache responses of REST requests (default).')
+    parser.add_argument('--store-ttl', type=float, default=io.DEFAULT_LABEL_STORE_TTL, metavar='SECONDS',
+                        help=f'Use labels of a repository from the label store for --report and --find-label for '
+                             f'up to SECONDS after they were listed (default: {io.DEFAULT_LABEL_STORE_TTL:g}).')
+    group = parser.add_mutually_exclusive_group(required=False)
+    group.add_argument('--store', default=io.DEFAULT_LABEL_STORE_PATH, metavar='FILE',
+                       help=f'Set file of the label store shared by all commands '
+                            f'(default: {io.DEFAULT_LABEL_STORE_PATH}).')
+    group.add_argument('--no-store', action='store_true', default=False,
+                       help='Disable the label store.')
     group = parser.add_mutually_exclusive_group(required=False)
     group.add_argument('--token',
                        help='Set GitHub OAuth2 token.')
     group.add_argument('--token-file',
-                       help='Set file to load the GitHub OAuth2 token from.')
-    params = parser.parse_args(argv[1:])
+                       help='Set file or directory to load GitHub OAuth2 tokens from. Each line holds a token, '
+                            'optionally followed by owners it may access, e.g. "TOKEN acme,acme-labs". Requests '
+                            'are spread over all tokens.')
+    return parser
 
-    if params.dir:
-        os.chdir(params.dir)
 
-    config = load_config(params)
-    if params.init:
-        return init(config)
+def create_github(params: argparse.Namespace, tokens: List['Token']) -> 'GitHub':
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from github_labels_sync.github import GitHub, GraphqlClient, RestClient, \
+        DEFAULT_GRAPHQL_ENDPOINT_URL, DEFAULT_REST_ENDPOINT_URL, MUTATION_LINGER  # pylint: disable=redefined-outer-name
+
+    session = requests.Session()
+    # The same variables as in GitHub Actions, e.g. for GitHub Enterprise Server.
+    graphql_client = GraphqlClient(os.environ.get('GITHUB_GRAPHQL_URL') or DEFAULT_GRAPHQL_ENDPOINT_URL, session)
+    rest_client = RestClient(os.environ.get('GITHUB_API_URL') or DEFAULT_REST_ENDPOINT_URL, session)
+    github = GitHub(graphql_client, rest_client)
+    if len(tokens) == 1 and tokens[0].owners is None:
+        github.set_token(tokens[0].value)
+    else:
+        from github_labels_sync.tokens import TokenPool
+        github.set_tokens(TokenPool(tokens))
+    if params.http_cache and not params.no_http_cache:
+        from github_labels_sync.cache import ResponseCache
+        github.set_cache(ResponseCache(params.http_cache))
+    if not params.no_store:
+        github.set_store(open_store(params))
+    if params.batch_mutations:
+        github.set_batching(linger=MUTATION_LINGER if params.jobs > 1 else 0.0)
+    return github
+
+
+def open_store(params: argparse.Namespace) -> 'LabelStore':
+    from github_labels_sync.store import LabelStore  # pylint: disable=import-outside-toplevel,redefined-outer-name
+    return LabelStore(params.store, params.store_ttl)
 
-    token = load_token(params)
 
-    github = GitHub()
-    github.set_token(token)
+def run(params: argparse.Namespace, github: 'GitHub', config: Optional['Config']) -> Optional[int]:
+    # pylint: disable=import-outside-toplevel
+    from github_labels_sync.push_command import PushOptions  # pylint: disable=redefined-outer-name
+
+    options = PushOptions(jobs=params.jobs, jobs_per_owner=params.jobs_per_owner, jobs_per_repo=params.jobs_per_repo,
+                          dry_run=params.dry_run, shard=get_shard(params))
+    if params.apply:
+        from github_labels_sync.apply_command import apply
+        return apply(github, params.apply, options._replace(journal=open_journal(params, params.apply)))
+    assert config
     if params.pull:
-        return pull(github, config)
+        from github_labels_sync.pull_command import pull
+        return pull(github, config, verbose=params.verbose)
     if params.push:
-        return push(github, config)
+        return run_push(params, github, config, options)
+    if params.serve:
+        from github_labels_sync.daemon_command import serve
+        return serve(github, config, params.serve, params.webhook_secret or os.environ.get('GITHUB_WEBHOOK_SECRET'),
+                     options)
+    if params.report:
+        from github_labels_sync.report_command import report
+        with open(params.report, 'wt', encoding='utf-8', newline='') as fh:
+            return report(github, config, fh, params.report_format)
     raise Exception('Unknown action')
 
 
-def load_config(params: argparse.Namespace) -> Config:
+def run_push(params: argparse.Namespace, github: 'GitHub', config: 'Config', options: 'PushOptions') -> int:
+    # pylint: disable=import-outside-toplevel
+    from github_labels_sync.push_command import push
+
+    shard = str(options.shard) if options.shard else None
+    if params.incremental:
+        from github_labels_sync.state import PushState
+        options = options._replace(state=PushState(params.state_file or io.get_state_path(config.path, shard)))
+    if params.plan_out:
+        with open(params.plan_out, 'wt', encoding='utf-8') as fh:
+            return push(github, config, options._replace(plan_out=fh))
+    options = options._replace(journal=open_journal(params, config.path, config.labels.fingerprint(), shard))
+    if params.results:
+        with open(params.results, 'wt', encoding='utf-8') as fh:
+            return push(github, config, options._replace(results_out=fh))
+    return push(github, config, options)
+
+
+def report_stats(params: argparse.Namespace, request_stats: 'Stats') -> None:
+    if params.stats:
+        request_stats.print_summary()
+    if params.stats_out:
+        with open(params.stats_out, 'wt', encoding='utf-8') as fh:
+            if params.stats_format == 'openmetrics':
+                request_stats.write_openmetrics(fh)
+            else:
+                request_stats.write_json(fh)
+
+
+def open_journal(params: argparse.Namespace, path: str, key: Optional[str] = None,
+                 shard: Optional[str] = None) -> Optional['Journal']:
+    from github_labels_sync.journal import Journal  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    if params.dry_run:
+        return None
+    journal = Journal(params.journal or io.get_journal_path(path, shard), key or io.hash_file(path),
+                      resume=params.resume)
+    if params.resume and not journal.resumed:
+        print('Nothing to resume, starting from the beginning.')
+    return journal
+
+
+def get_shard(params: argparse.Namespace) -> Optional['Shard']:
+    from github_labels_sync.shards import Shard  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    if not params.shard:
+        if params.primary_shard:
+            raise ValueError('The shard of the primary repository needs --shard.')
+        return None
+    return Shard.parse(params.shard, params.primary_shard)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'A positive integer expected, not {value!r}.')
+    return number
+
+
+def load_config(params: argparse.Namespace) -> 'Config':
+    from github_labels_sync.config import Config  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
     config_path = params.config
     if not config_path:
         for config_path in io.DEFAULT_CONFIG_FILES:
@@ -68,21 +278,25 @@ def load_config(params: argparse.Namespace) -> Config:
                 raise ValueError(
                     f'Cannot find config file. Tried: {", ".join(repr(s) for s in io.DEFAULT_CONFIG_FILES)}')
 
-    return Config(config_path, primary_repo=params.primary_repo, allow_empty=params.init)
+    return Config(config_path, primary_repo=params.primary_repo, allow_empty=params.init,
+                  cache=not params.no_config_cache)
+
 
+def load_tokens(params: argparse.Namespace) -> List['Token']:
+    # pylint: disable=import-outside-toplevel
+    from github_labels_sync.tokens import Token, load_tokens as load_token_file  # pylint: disable=redefined-outer-name
 
-def load_token(params: argparse.Namespace) -> str:
     token: Optional[str] = params.token.strip() if params.token else None
-    if not token:
-        token_path = params.token_file
-        if not token_path:
-            for token_path in io.DEFAULT_TOKEN_FILES:
-                if os.path.isfile(token_path):
-                    break
-            else:
-                raise ValueError(f'Cannot find token file. Tried: {", ".join(repr(s) for s in io.DEFAULT_TOKEN_FILES)}')
-        with open(token_path) as fh:
-            token = fh.read().strip()
-    if not token:
+    if token:
+        return [Token(token)]
+    token_path = params.token_file
+    if not token_path:
+        for token_path in io.DEFAULT_TOKEN_FILES:
+            if os.path.isfile(token_path):
+                break
+        else:
+            raise ValueError(f'Cannot find token file. Tried: {", ".join(repr(s) for s in io.DEFAULT_TOKEN_FILES)}')
+    tokens = load_token_file(token_path)
+    if not tokens:
         raise ValueError('You need OAuth2 token.')
-    return token
+    return tokens
@@ -1,13 +1,90 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
+import hashlib
 import json
-from typing import Optional, List
+import marshal
+import sys
+from typing import Any, Dict, Optional, List
 
 import os
 
-from github_labels_sync import utils
+from github_labels_sync import io, utils
 from github_labels_sync.labels import Labels
+from github_labels_sync.targets import TargetSelector
+
+COMPILED_VERSION = 1
+
+
+def compile_config(data: dict) -> Dict[str, Any]:
+    mandatory = utils.get_str_dict_of_str_dicts(data, 'mandatory')
+    optional = utils.get_str_dict_of_str_dicts(data, 'optional')
+    aliases = utils.get_str_dict(data, 'aliases')
+    labels = Labels(mandatory, optional, aliases)
+    repos = data.get('repos') or {}
+    try:
+        targets = repos['targets'] or []
+    except KeyError:
+        targets = []
+    if not isinstance(targets, list):
+        raise TypeError(f'repos.targets: A list expected, not {type(targets)!s} {targets!r}.')
+    return {
+        'labels': labels.compile(),
+        'primary': repos.get('primary'),
+        'secondary': repos.get('secondary') or [],
+        'targets': [tuple(TargetSelector.load(item)) for item in targets],
+    }
+
+
+def load_compiled_config(path: str, *, cache: bool = True) -> Dict[str, Any]:
+    # A compiled config is kept next to the config file, so that a large label catalog is not parsed and validated
+    # again unless it has been modified. The compiled form is stored with marshal, which cannot run any code.
+    stat = os.stat(path)
+    cache_path = io.get_compiled_config_path(path)
+    cached = read_compiled_config(cache_path) if cache else None
+    compiled: Dict[str, Any]
+    if cached and cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        compiled = cached['config']
+        return compiled
+    with open(path, 'rb') as fh:
+        content = fh.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached and cached['sha256'] == digest:
+        compiled = cached['config']  # Only touched, e.g. by a checkout.
+    else:
+        compiled = compile_config(json.loads(content))
+    if cache:
+        write_compiled_config(cache_path, {
+            'version': COMPILED_VERSION,
+            'python': sys.implementation.cache_tag,
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': digest,
+            'config': compiled,
+        })
+    return compiled
+
+
+def read_compiled_config(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'rb') as fh:
+            data: Dict[str, Any] = marshal.loads(fh.read())  # Much faster than reading from the file object.
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (not isinstance(data, dict) or data.get('version') != COMPILED_VERSION
+            or data.get('python') != sys.implementation.cache_tag):
+        return None
+    return data
+
+
+def write_compiled_config(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = path + '~'
+    try:
+        with open(tmp_path, 'wb') as fh:
+            fh.write(marshal.dumps(data))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # The compiled config is only an optimization, e.g. for a read-only directory.
 
 
 class Config:
@@ -16,33 +93,37 @@ class Config:
     primary_repo: str
     secondary_repos: List[str]
     all_repos: List[str]
+    targets: List[TargetSelector]
 
-    def __init__(self, path: str, *, primary_repo: Optional[str] = None, allow_empty: Optional[bool] = False) -> None:
+    def __init__(self, path: str, *, primary_repo: Optional[str] = None, allow_empty: Optional[bool] = False,
+                 cache: bool = True) -> None:
         self.path = path
-        data: dict = {}
         if os.path.isfile(path) or not allow_empty:
-            with open(path) as fh:
-                data = json.load(fh)
-        mandatory = utils.get_str_dict_of_str_dicts(data, 'mandatory')
-        optional = utils.get_str_dict_of_str_dicts(data, 'optional')
-        aliases = utils.get_str_dict(data, 'aliases')
-        self.labels = Labels(mandatory, optional, aliases)
+            compiled = load_compiled_config(path, cache=cache)
+        else:
+            compiled = compile_config({})
+        self.labels = Labels.load_compiled(compiled['labels'])
         if not primary_repo:
-            try:
-                primary_repo = data['repos']['primary']
-            except KeyError:
-                primary_repo = None
+            primary_repo = compiled['primary']
         if not primary_repo:
             raise ValueError('No primary repository specified.')
         self.primary_repo = primary_repo
-        try:
-            self.secondary_repos = data['repos']['secondary'] or []
-        except KeyError:
-            self.secondary_repos = []
+        self.secondary_repos = compiled['secondary']
         self.all_repos = [self.primary_repo] + self.secondary_repos
+        self.targets = [TargetSelector(*item) for item in compiled['targets']]
 
     def export(self) -> dict:
         self.secondary_repos.sort()
+        repos: Dict[str, Any] = {
+            '#primary': 'The repository to pull labels from.',
+            'primary': self.primary_repo,
+            '#secondary': 'Other repositories to push labels to.',
+            'secondary': self.secondary_repos,
+        }
+        if self.targets:
+            # Not written without selectors, so that configs of older versions are not rewritten.
+            repos['#targets'] = 'Selectors of other repositories of organizations or users to push labels to.'
+            repos['targets'] = [selector.export() for selector in self.targets]
         return {
             '#mandatory': 'Labels that must be in each repository.',
             'mandatory': utils.sorted_dict(self.labels.mandatory),
@@ -50,12 +131,7 @@ class Config:
             'optional': utils.sorted_dict(self.labels.optional),
             '#aliases': 'Labels that must be renamed.',
             'aliases': utils.sorted_dict(self.labels.aliases),
-            'repos': {
-                '#primary': 'The repository to pull labels from.',
-                'primary': self.primary_repo,
-                '#secondary': 'Other repositories to push labels to.',
-                'secondary': self.secondary_repos,
-            }
+            'repos': repos,
         }
 
     def save(self, *, path: Optional[str] = None, force: Optional[bool] = False) -> bool:
@@ -64,7 +140,8 @@ class Config:
                 path = self.path
             tmp_path = path + '~'
             directory = os.path.dirname(path)
-            os.makedirs(directory, exist_ok=True)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
             with open(tmp_path, 'wt') as fh:
                 json.dump(self.export(), fh, indent=2, separators=(',', ': '))
             os.rename(tmp_path, path)
@@ -0,0 +1,264 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import hmac
+import json
+import queue
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from github_labels_sync.actions import Action, DeleteAction, UnknownLabelAction
+from github_labels_sync.config import Config
+from github_labels_sync.github import GitHub
+from github_labels_sync.label import Label
+from github_labels_sync.push_command import PushOptions, RepoResult, Log, apply_actions, run_jobs_parallel
+from github_labels_sync.targets import iter_targets
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def verify_signature(secret: bytes, body: bytes, signature: Optional[str]) -> bool:
+    if not signature or not signature.startswith('sha256='):
+        return False
+    expected = hmac.new(secret, body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature[len('sha256='):], expected)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise ValueError(f'Invalid address to listen on: {address!r}.') from None
+
+
+def load_label(data: Dict[str, Any]) -> Label:
+    # Webhook payloads hold labels as the REST API, whose `id` is not the GraphQL ID used by mutations.
+    return Label.create(data['name'], data['color'], data.get('description'), data.get('node_id'))
+
+
+class LabelCache:
+    # Labels of each repository, kept up to date by webhook events instead of listing them again.
+    repos: Dict[str, Dict[str, Label]]
+    names: Dict[str, str]
+
+    def __init__(self) -> None:
+        self.repos = {}
+        self.names = {}
+
+    def __contains__(self, repo: str) -> bool:
+        return repo.lower() in self.repos
+
+    def __len__(self) -> int:
+        return len(self.repos)
+
+    def get(self, repo: str) -> List[Label]:
+        return list(self.repos[repo.lower()].values())
+
+    def set(self, repo: str, labels: Iterable[Label]) -> None:
+        self.repos[repo.lower()] = {label.name.lower(): label for label in labels}
+        self.names.setdefault(repo.lower(), repo)
+
+    def list_repos(self) -> List[str]:
+        return list(self.names.values())
+
+    def apply_event(self, repo: str, payload: Dict[str, Any]) -> None:
+        labels = self.repos[repo.lower()]
+        label = load_label(payload['label'])
+        old_name = payload.get('changes', {}).get('name', {}).get('from')
+        if old_name:
+            labels.pop(old_name.lower(), None)
+        if payload['action'] == 'deleted':
+            labels.pop(label.name.lower(), None)
+        else:
+            labels[label.name.lower()] = label
+
+
+class Daemon:
+    # Applies only the actions each `label` webhook event requires. Changes in the primary repository update
+    # the configuration like --pull and are then pushed to all repositories like --push. Changes elsewhere are
+    # reverted if they differ from the configuration.
+    github: GitHub
+    config: Config
+    secret: bytes
+    options: PushOptions
+    cache: LabelCache
+    events: 'queue.Queue[Optional[Event]]'
+    thread: Optional[threading.Thread]
+
+    def __init__(self, github: GitHub, config: Config, secret: str, options: PushOptions = PushOptions()) -> None:
+        self.github = github
+        self.config = config
+        self.secret = secret.encode('utf-8')
+        self.options = options
+        self.cache = LabelCache()
+        self.events = queue.Queue()
+        self.thread = None
+
+    def load(self) -> None:
+        # The only full scan: labels of all repositories are listed with bulk queries when the daemon starts.
+        repos = iter_targets(self.github, self.config.all_repos, self.config.targets)
+        for repo, labels in self.github.iter_labels_bulk(repos):
+            self.cache.set(repo, labels)
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.process_events, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread:
+            self.events.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def wait(self) -> None:
+        # Waits until all received events have been processed.
+        self.events.join()
+
+    def receive(self, event: str, body: bytes, signature: Optional[str]) -> int:
+        if not verify_signature(self.secret, body, signature):
+            return 401
+        if event == 'ping':
+            return 200
+        if event != 'label':
+            return 204
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400
+        self.events.put((event, payload))
+        return 202
+
+    def process_events(self) -> None:
+        # Events are processed one by one in the order of arrival, so that the cache follows the repositories.
+        while True:
+            item = self.events.get()
+            try:
+                if item is None:
+                    return
+                self.handle_label_event(item[1])
+            except Exception:  # pylint: disable=broad-except
+                print('Failed to process an event:', traceback.format_exc())
+            finally:
+                self.events.task_done()
+
+    def handle_label_event(self, payload: Dict[str, Any]) -> None:
+        repo = payload['repository']['full_name']
+        if repo not in self.cache:
+            return
+        self.cache.apply_event(repo, payload)
+        if self.github.store:
+            self.github.store.set_labels(repo, self.cache.get(repo))
+        if repo.lower() != self.config.primary_repo.lower():
+            self.sync([repo])
+            return
+
+        labels = self.config.labels
+        label = load_label(payload['label'])
+        old_name = payload.get('changes', {}).get('name', {}).get('from')
+        deleted = payload['action'] == 'deleted'
+        if deleted:
+            labels.remove(label.name)
+        else:
+            if old_name:
+                labels.rename(old_name, label.name)
+            labels.update([label])
+        if labels.modified:
+            print(repo, f'→ Label {label.name!r} {payload["action"]}, updating all repositories.')
+            self.config.save()
+            self.sync(self.cache.list_repos(), label.name if deleted else None)
+
+    def sync(self, repos: Iterable[str], deleted: Optional[str] = None) -> None:
+        # A label deleted in the primary repository is deleted elsewhere too, instead of being an unknown label.
+        def plan(repo: str) -> List[Action]:
+            actions = self.config.labels.plan(self.cache.get(repo))
+            if deleted:
+                actions = [DeleteAction(action.label) if isinstance(action, UnknownLabelAction)
+                           and action.label.name.lower() == deleted.lower() else action for action in actions]
+            return actions
+
+        def job(repo: str, actions: List[Action], log: Log) -> RepoResult:
+            result = apply_actions(self.github, repo, actions, log, self.options)
+            # Listing labels again is cheaper than guessing the effects of failed or partial actions.
+            self.cache.set(repo, self.github.list_labels(repo))
+            return result
+
+        # Unlike --push, a repository which cannot be synchronized does not stop the others.
+        planned = ((repo, plan(repo)) for repo in repos)
+        items = ((repo, actions) for repo, actions in planned if actions)
+        for result in run_jobs_parallel(job, items, self.options.jobs, self.options.jobs_per_owner):
+            if not result.ok:
+                print(result.repo, '→ Not synchronized.')
+
+
+class WebhookServer:
+    def __init__(self, daemon: Daemon, *, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.daemon = daemon
+        self.host = host
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.server.server_port}'
+
+    def start(self) -> 'WebhookServer':
+        self.daemon.start()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.daemon.stop()
+
+    def __enter__(self) -> 'WebhookServer':
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def make_handler(self) -> Callable[..., BaseHTTPRequestHandler]:
+        daemon = self.daemon
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                status = daemon.receive(self.headers.get('X-GitHub-Event', ''), body,
+                                        self.headers.get('X-Hub-Signature-256'))
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
+
+
+def serve(github: GitHub, config: Config, address: str, secret: Optional[str],
+          options: PushOptions = PushOptions()) -> int:
+    if not secret:
+        raise ValueError('A webhook secret is required to verify events.')
+    host, port = parse_address(address)
+    daemon = Daemon(github, config, secret, options)
+    daemon.load()
+    server = WebhookServer(daemon, host=host, port=port)
+    print(f'Listening on {server.url} for label events of {len(daemon.cache)} repositories.', flush=True)
+    daemon.start()
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        daemon.stop()
+    return 0
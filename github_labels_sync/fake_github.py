@@ -0,0 +1,815 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+# A local stand-in for the parts of the GitHub REST and GraphQL APIs used by github_labels_sync.
+# It is meant for benchmarks and manual testing, not as a faithful GitHub implementation.
+
+import argparse
+import hashlib
+import hmac
+import json
+import queue
+import re
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Iterator, Callable
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+TOKEN_RE = re.compile(r'''
+    (?P<ignored>[\s,]+|\#[^\n]*)
+    | (?P<punct>\.\.\.|[!$():=@\[\]{}|])
+    | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+    | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<string>"(?:\\.|[^"\\])*")
+''', re.VERBOSE)
+CAMEL_RE = re.compile(r'([A-Z])')
+RATE_LIMIT_WINDOW = 3600
+GRAPHQL_POINTS = 5000
+
+Webhook = Callable[[str, Dict[str, Any]], None]
+
+
+class GraphqlError(Exception):
+    def __init__(self, message: str, error_type: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.type = error_type
+
+
+class Variable(NamedTuple):
+    name: str
+
+
+class Field(NamedTuple):
+    alias: str
+    name: str
+    args: Dict[str, Any]
+    selections: Optional[List['Field']]
+
+
+class Operation(NamedTuple):
+    type: str
+    defaults: Dict[str, Any]
+    selections: List['Field']
+
+
+def tokenize(source: str) -> Iterator[Tuple[str, str]]:
+    pos = 0
+    while pos < len(source):
+        match = TOKEN_RE.match(source, pos)
+        if not match:
+            raise GraphqlError(f'Syntax error at {pos}: {source[pos:pos + 20]!r}', 'PARSE_ERROR')
+        pos = match.end()
+        kind = match.lastgroup
+        assert kind
+        if kind != 'ignored':
+            yield kind, match.group()
+
+
+class Parser:
+    def __init__(self, source: str) -> None:
+        self.tokens = list(tokenize(source))
+        self.pos = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ('eof', '')
+
+    def take(self, value: Optional[str] = None, kind: Optional[str] = None) -> str:
+        token_kind, token = self.peek()
+        if (value is not None and token != value) or (kind is not None and token_kind != kind):
+            raise GraphqlError(f'Syntax error: expected {value or kind!r}, got {token!r}.', 'PARSE_ERROR')
+        self.pos += 1
+        return token
+
+    def skip(self, value: str) -> bool:
+        if self.peek() == ('punct', value):
+            self.pos += 1
+            return True
+        return False
+
+    def parse_operation(self) -> Operation:
+        operation = 'query'
+        defaults: Dict[str, Any] = {}
+        if self.peek()[1] in ('query', 'mutation'):
+            operation = self.take()
+            if self.peek()[0] == 'name':
+                self.take()
+            if self.skip('('):
+                while not self.skip(')'):
+                    self.take('$')
+                    name = self.take(kind='name')
+                    self.take(':')
+                    self.parse_type()
+                    if self.skip('='):
+                        defaults[name] = self.parse_value()
+        selections = self.parse_selection_set()
+        if self.peek()[0] != 'eof':
+            raise GraphqlError('Only a single operation is supported.', 'PARSE_ERROR')
+        return Operation(operation, defaults, selections)
+
+    def parse_type(self) -> None:
+        if self.skip('['):
+            self.parse_type()
+            self.take(']')
+        else:
+            self.take(kind='name')
+        self.skip('!')
+
+    def parse_selection_set(self) -> List[Field]:
+        self.take('{')
+        fields = []
+        while not self.skip('}'):
+            fields.append(self.parse_field())
+        return fields
+
+    def parse_field(self) -> Field:
+        alias = name = self.take(kind='name')
+        if self.skip(':'):
+            name = self.take(kind='name')
+        args = {}
+        if self.skip('('):
+            while not self.skip(')'):
+                key = self.take(kind='name')
+                self.take(':')
+                args[key] = self.parse_value()
+        selections = self.parse_selection_set() if self.peek() == ('punct', '{') else None
+        return Field(alias, name, args, selections)
+
+    def parse_value(self) -> Any:
+        kind, token = self.peek()
+        if self.skip('$'):
+            return Variable(self.take(kind='name'))
+        if self.skip('['):
+            items = []
+            while not self.skip(']'):
+                items.append(self.parse_value())
+            return items
+        if self.skip('{'):
+            fields = {}
+            while not self.skip('}'):
+                key = self.take(kind='name')
+                self.take(':')
+                fields[key] = self.parse_value()
+            return fields
+        self.pos += 1
+        if kind == 'string':
+            return json.loads(token)
+        if kind == 'number':
+            return float(token) if any(c in token for c in '.eE') else int(token)
+        if kind == 'name':
+            return {'true': True, 'false': False, 'null': None}.get(token, token)
+        raise GraphqlError(f'Syntax error: unexpected {token!r}.', 'PARSE_ERROR')
+
+
+def substitute(value: Any, variables: Dict[str, Any]) -> Any:
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, list):
+        return [substitute(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, variables) for key, item in value.items()}
+    return value
+
+
+def to_snake_case(name: str) -> str:
+    return CAMEL_RE.sub(r'_\1', name).lower()
+
+
+def count_requests(selections: List[Field], variables: Dict[str, Any], parents: int = 1) -> int:
+    # GitHub counts a request for each connection and each node it is asked for, no matter how many nodes there are.
+    requests = 0
+    for field in selections:
+        first = substitute(field.args, variables).get('first')
+        if first is not None:
+            requests += parents
+        if field.selections:
+            requests += count_requests(field.selections, variables, parents * (first or 1))
+    return requests
+
+
+def get_cost(operation: Operation, variables: Dict[str, Any]) -> int:
+    # A point for each hundred of requests, at least one.
+    if operation.type == 'mutation':
+        return 1
+    return max(1, round(count_requests(operation.selections, variables) / 100))
+
+
+def timestamp(moment: float) -> str:
+    return datetime.fromtimestamp(moment, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class Execution:
+    def __init__(self, variables: Dict[str, Any]) -> None:
+        self.variables = variables
+        self.errors: List[Dict[str, Any]] = []
+
+    def execute(self, value: Any, selections: List[Field], path: List[Any]) -> Dict[str, Any]:
+        result = {}
+        for field in selections:
+            field_path = path + [field.alias]
+            try:
+                resolved = self.resolve(value, field, substitute(field.args, self.variables))
+            except GraphqlError as e:
+                self.errors.append({'type': e.type, 'message': str(e), 'path': field_path})
+                resolved = None
+            result[field.alias] = self.complete(resolved, field, field_path)
+        return result
+
+    def complete(self, value: Any, field: Field, path: List[Any]) -> Any:
+        if value is None or field.selections is None:
+            return value
+        if isinstance(value, list):
+            return [self.complete(item, field, path + [i]) for i, item in enumerate(value)]
+        return self.execute(value, field.selections, path)
+
+    @staticmethod
+    def resolve(value: Any, field: Field, args: Dict[str, Any]) -> Any:
+        if field.name == '__typename':
+            return type(value).__name__
+        if isinstance(value, dict):
+            return value.get(field.name)
+        attribute = getattr(value, to_snake_case(field.name), None)
+        if callable(attribute):
+            return attribute(**{to_snake_case(key): arg for key, arg in args.items()})
+        return attribute
+
+
+class Connection:
+    def __init__(self, items: List[Any], first: Optional[int] = None, after: Optional[str] = None) -> None:
+        start = int(after) if after else 0
+        end = start + min(first or 100, 100)
+        self.total_count = len(items)
+        self.nodes = items[start:end]
+        self.page_info = {'hasNextPage': end < len(items), 'endCursor': str(min(end, len(items)))}
+
+
+class Node:
+    id: str
+
+
+class FakeLabel(Node):
+    def __init__(self, repo: 'FakeRepo', name: str, color: str, description: str = '') -> None:
+        self.repo = repo
+        self.name = name
+        self.color = color
+        self.description = description
+        self.is_default = False
+        self.created_at = self.updated_at = timestamp(time.time())
+
+    @property
+    def url(self) -> str:
+        return f'https://github.com/{self.repo.name_with_owner}/labels/{self.name}'
+
+    def issues(self, first: Optional[int] = None, after: Optional[str] = None, **_filters: Any) -> Connection:
+        return Connection([i for i in self.repo.all_issues if not i.is_pull_request and self in i.labels], first, after)
+
+    def pull_requests(self, first: Optional[int] = None, after: Optional[str] = None, **_filters: Any) -> Connection:
+        return Connection([i for i in self.repo.all_issues if i.is_pull_request and self in i.labels], first, after)
+
+    @property
+    def database_id(self) -> int:
+        # The `id` of REST responses and webhook payloads, while the GraphQL ID is their `node_id`.
+        return int(self.id.split('_')[1])
+
+    def as_rest(self) -> Dict[str, Any]:
+        return {'id': self.database_id, 'node_id': self.id, 'name': self.name, 'color': self.color,
+                'description': self.description, 'default': self.is_default, 'url': self.url}
+
+
+class FakeIssue(Node):
+    def __init__(self, repo: 'FakeRepo', number: int, is_pull_request: bool = False) -> None:
+        self.repo = repo
+        self.number = number
+        self.is_pull_request = is_pull_request
+        self.labels: List[FakeLabel] = []
+
+
+class FakeRepo(Node):  # pylint: disable=too-many-instance-attributes
+    def __init__(self, owner: str, name: str, *, is_archived: bool = False, is_fork: bool = False,
+                 topics: Optional[List[str]] = None) -> None:
+        self.owner = owner
+        self.name = name
+        self.is_archived = is_archived
+        self.is_fork = is_fork
+        self.topics = topics or []
+        self.all_labels: Dict[str, FakeLabel] = {}
+        self.all_issues: List[FakeIssue] = []
+        self.updated_at = timestamp(time.time())
+
+    @property
+    def name_with_owner(self) -> str:
+        return f'{self.owner}/{self.name}'
+
+    def labels(self, first: Optional[int] = None, after: Optional[str] = None, **_filters: Any) -> Connection:
+        return Connection(list(self.all_labels.values()), first, after)
+
+    def label(self, name: str) -> Optional[FakeLabel]:
+        return self.all_labels.get(name.lower())
+
+    def issues(self, first: Optional[int] = None, after: Optional[str] = None, labels: Optional[List[str]] = None,
+               **_filters: Any) -> Connection:
+        return Connection(self.filter_issues(False, labels), first, after)
+
+    def pull_requests(self, first: Optional[int] = None, after: Optional[str] = None,
+                      labels: Optional[List[str]] = None, **_filters: Any) -> Connection:
+        return Connection(self.filter_issues(True, labels), first, after)
+
+    def filter_issues(self, pull_requests: bool, labels: Optional[List[str]]) -> List[FakeIssue]:
+        wanted = {name.lower() for name in labels or ()}
+        return [issue for issue in self.all_issues if issue.is_pull_request == pull_requests
+                and wanted.issubset(label.name.lower() for label in issue.labels)]
+
+    def repository_topics(self, first: Optional[int] = None, after: Optional[str] = None) -> Connection:
+        return Connection([{'topic': {'name': topic}} for topic in self.topics], first, after)
+
+    def touch(self) -> None:
+        self.updated_at = timestamp(time.time())
+
+
+class FakeOwner:
+    def __init__(self, github: 'FakeGitHub', login: str) -> None:
+        self.github = github
+        self.login = login
+
+    def repositories(self, first: Optional[int] = None, after: Optional[str] = None,
+                     is_fork: Optional[bool] = None, **_filters: Any) -> Connection:
+        repos = [repo for repo in self.github.repos.values() if repo.owner == self.login
+                 and (is_fork is None or repo.is_fork == is_fork)]
+        return Connection(repos, first, after)
+
+
+class FakeGitHub:
+    repos: Dict[str, FakeRepo]
+    nodes: Dict[str, Node]
+    calls: 'Counter[str]'
+    webhooks: List[Webhook]
+
+    def __init__(self) -> None:
+        self.repos = {}
+        self.nodes = {}
+        self.calls = Counter()
+        self.webhooks = []
+        self.lock = threading.RLock()
+        self._last_id = 0
+
+    @classmethod
+    def generate(cls, repos: int = 10, labels: int = 20, issues: int = 0, *, owners: int = 1,
+                 labeled_issues: float = 0.5) -> 'FakeGitHub':
+        github = cls()
+        for i in range(repos):
+            repo = github.add_repo(f'owner{i % owners}/repo{i}')
+            for j in range(labels):
+                github.add_label(repo, f'label{j}', f'{j * 99991 % 0xffffff:06x}', f'Label {j}')
+            repo_labels = list(repo.all_labels.values())
+            for j in range(issues):
+                issue = github.add_issue(repo, is_pull_request=j % 4 == 3)
+                if repo_labels and j < issues * labeled_issues:
+                    issue.labels.append(repo_labels[j % len(repo_labels)])
+        return github
+
+    def register(self, node: Node, prefix: str) -> None:
+        self._last_id += 1
+        node.id = f'{prefix}_{self._last_id}'
+        self.nodes[node.id] = node
+
+    def add_repo(self, full_name: str, **kwargs: Any) -> FakeRepo:
+        owner, name = full_name.split('/')
+        repo = FakeRepo(owner, name, **kwargs)
+        self.register(repo, 'R')
+        self.repos[full_name.lower()] = repo
+        return repo
+
+    def add_label(self, repo: FakeRepo, name: str, color: str, description: str = '') -> FakeLabel:
+        if name.lower() in repo.all_labels:
+            raise GraphqlError(f'Label {name!r} already exists.', 'UNPROCESSABLE')
+        label = FakeLabel(repo, name, color, description or '')
+        self.register(label, 'LA')
+        repo.all_labels[name.lower()] = label
+        repo.touch()
+        self.emit_label_event('created', label)
+        return label
+
+    def update_label(self, label: FakeLabel, properties: Dict[str, Any]) -> FakeLabel:
+        repo = label.repo
+        changes = {}
+        if 'name' in properties and properties['name'] != label.name:
+            if properties['name'].lower() in repo.all_labels and properties['name'].lower() != label.name.lower():
+                raise GraphqlError(f'Label {properties["name"]!r} already exists.', 'UNPROCESSABLE')
+            del repo.all_labels[label.name.lower()]
+            changes['name'] = {'from': label.name}
+            label.name = properties['name']
+            repo.all_labels[label.name.lower()] = label
+        for prop in 'color', 'description':
+            if properties.get(prop) is not None and properties[prop] != getattr(label, prop):
+                changes[prop] = {'from': getattr(label, prop)}
+                setattr(label, prop, properties[prop])
+        label.updated_at = timestamp(time.time())
+        repo.touch()
+        if changes:
+            self.emit_label_event('edited', label, changes)
+        return label
+
+    def delete_label(self, label: FakeLabel) -> None:
+        repo = label.repo
+        del repo.all_labels[label.name.lower()]
+        del self.nodes[label.id]
+        for issue in repo.all_issues:
+            if label in issue.labels:
+                issue.labels.remove(label)
+        repo.touch()
+        self.emit_label_event('deleted', label)
+
+    def emit_label_event(self, action: str, label: FakeLabel, changes: Optional[Dict[str, Any]] = None) -> None:
+        # The payload of a `label` event with only the fields used by github_labels_sync.
+        payload: Dict[str, Any] = {
+            'action': action,
+            'label': label.as_rest(),
+            'repository': {'full_name': label.repo.name_with_owner, 'node_id': label.repo.id},
+        }
+        if changes:
+            payload['changes'] = changes
+        for webhook in self.webhooks:
+            webhook('label', payload)
+
+    def add_issue(self, repo: FakeRepo, is_pull_request: bool = False) -> FakeIssue:
+        issue = FakeIssue(repo, len(repo.all_issues) + 1, is_pull_request)
+        self.register(issue, 'PR' if is_pull_request else 'I')
+        repo.all_issues.append(issue)
+        return issue
+
+    def get_repo(self, owner: str, name: str) -> FakeRepo:
+        try:
+            return self.repos[f'{owner}/{name}'.lower()]
+        except KeyError as e:
+            raise GraphqlError(f"Could not resolve to a Repository with the name '{owner}/{name}'.", 'NOT_FOUND') from e
+
+    def get_node(self, node_id: str, node_type: type) -> Any:
+        node = self.nodes.get(node_id)
+        if not isinstance(node, node_type):
+            raise GraphqlError(f"Could not resolve to a node with the global id of '{node_id}'.", 'NOT_FOUND')
+        return node
+
+    # GraphQL API
+
+    def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                budget: Optional[Callable[[int], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        # The budget takes the cost of a request and returns the rate limit of its token after it is paid.
+        try:
+            operation = Parser(query).parse_operation()
+        except GraphqlError as e:
+            return {'errors': [{'type': e.type, 'message': str(e)}]}
+        execution = Execution(dict(operation.defaults, **(variables or {})))
+        cost = get_cost(operation, execution.variables)
+        rate_limit = budget(cost) if budget else get_rate_limit(cost, {})
+        with self.lock:
+            self.calls[f'graphql {operation.type}'] += 1
+            root = self.Mutation(self) if operation.type == 'mutation' else self.Query(self, rate_limit)
+            data = execution.execute(root, operation.selections, [])
+        result: Dict[str, Any] = {'data': data}
+        if execution.errors:
+            result['errors'] = execution.errors
+        return result
+
+    class Query:
+        def __init__(self, github: 'FakeGitHub', rate_limit: Dict[str, Any]) -> None:
+            self.github = github
+            self.rate_limit = rate_limit
+
+        def repository(self, owner: str, name: str) -> FakeRepo:
+            return self.github.get_repo(owner, name)
+
+        def repository_owner(self, login: str) -> Optional[FakeOwner]:
+            login = login.lower()
+            for repo in self.github.repos.values():
+                if repo.owner.lower() == login:
+                    return FakeOwner(self.github, repo.owner)
+            return None
+
+        organization = user = repository_owner
+
+        def node(self, id: str) -> Node:  # pylint: disable=redefined-builtin,invalid-name
+            node: Node = self.github.get_node(id, Node)
+            return node
+
+        def nodes(self, ids: List[str]) -> List[Optional[Node]]:
+            return [self.github.nodes.get(node_id) for node_id in ids]
+
+    class Mutation:
+        def __init__(self, github: 'FakeGitHub') -> None:
+            self.github = github
+
+        def add_labels_to_labelable(self, input: Dict[str, Any]) -> Dict[str, Any]:  # pylint: disable=W0622
+            issue = self.github.get_node(input['labelableId'], FakeIssue)
+            for label_id in input['labelIds']:
+                label = self.github.get_node(label_id, FakeLabel)
+                if label not in issue.labels:
+                    issue.labels.append(label)
+            return {'clientMutationId': input.get('clientMutationId'), 'labelable': issue}
+
+        def remove_labels_from_labelable(self, input: Dict[str, Any]) -> Dict[str, Any]:  # pylint: disable=W0622
+            issue = self.github.get_node(input['labelableId'], FakeIssue)
+            for label_id in input['labelIds']:
+                label = self.github.get_node(label_id, FakeLabel)
+                if label in issue.labels:
+                    issue.labels.remove(label)
+            return {'clientMutationId': input.get('clientMutationId'), 'labelable': issue}
+
+        def create_label(self, input: Dict[str, Any]) -> Dict[str, Any]:  # pylint: disable=W0622
+            repo = self.github.get_node(input['repositoryId'], FakeRepo)
+            label = self.github.add_label(repo, input['name'], input['color'], input.get('description') or '')
+            return {'clientMutationId': input.get('clientMutationId'), 'label': label}
+
+        def update_label(self, input: Dict[str, Any]) -> Dict[str, Any]:  # pylint: disable=W0622
+            label = self.github.update_label(self.github.get_node(input['id'], FakeLabel), input)
+            return {'clientMutationId': input.get('clientMutationId'), 'label': label}
+
+        def delete_label(self, input: Dict[str, Any]) -> Dict[str, Any]:  # pylint: disable=W0622
+            self.github.delete_label(self.github.get_node(input['id'], FakeLabel))
+            return {'clientMutationId': input.get('clientMutationId')}
+
+    # REST API
+
+    def rest(self, method: str, path: str, body: Any, params: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        with self.lock:
+            self.calls[f'rest {method}'] += 1
+            try:
+                if len(parts) < 4 or parts[0] != 'repos':
+                    return 404, {'message': 'Not Found'}
+                repo = self.get_repo(parts[1], parts[2])
+                if parts[3] == 'labels':
+                    return self.rest_labels(method, repo, parts[4:], body, params or {})
+                if parts[3] == 'issues' and len(parts) >= 6 and parts[5] == 'labels':
+                    return self.rest_issue_labels(method, repo, int(parts[4]), parts[6:], body)
+            except GraphqlError as e:
+                return (404 if e.type == 'NOT_FOUND' else 422), {'message': str(e)}
+            return 404, {'message': 'Not Found'}
+
+    def rest_labels(  # pylint: disable=too-many-return-statements
+            self, method: str, repo: FakeRepo, parts: List[str], body: Any, params: Dict[str, str]) -> Tuple[int, Any]:
+        if not parts:
+            if method == 'GET':
+                per_page = int(params.get('per_page', 30))
+                start = (int(params.get('page', 1)) - 1) * per_page
+                return 200, [label.as_rest() for label in list(repo.all_labels.values())[start:start + per_page]]
+            if method == 'POST':
+                return 201, self.add_label(repo, body['name'], body['color'], body.get('description')).as_rest()
+            return 405, {'message': 'Method Not Allowed'}
+        label = repo.label(parts[0])
+        if not label:
+            return 404, {'message': 'Not Found'}
+        if method == 'GET':
+            return 200, label.as_rest()
+        if method == 'PATCH':
+            if 'new_name' in body:
+                body = dict(body, name=body['new_name'])
+            return 200, self.update_label(label, body).as_rest()
+        if method == 'DELETE':
+            self.delete_label(label)
+            return 204, None
+        return 405, {'message': 'Method Not Allowed'}
+
+    def rest_issue_labels(self, method: str, repo: FakeRepo, number: int, parts: List[str],
+                          body: Any) -> Tuple[int, Any]:
+        if not 0 < number <= len(repo.all_issues):
+            return 404, {'message': 'Not Found'}
+        issue = repo.all_issues[number - 1]
+        if method == 'POST' and not parts:
+            for name in body:
+                added = repo.label(name) or self.add_label(repo, name, 'ededed')
+                if added not in issue.labels:
+                    issue.labels.append(added)
+        elif method == 'DELETE' and parts:
+            label = repo.label(parts[0])
+            if not label or label not in issue.labels:
+                return 404, {'message': 'Label does not exist'}
+            issue.labels.remove(label)
+        elif method != 'GET':
+            return 405, {'message': 'Method Not Allowed'}
+        return 200, [label.as_rest() for label in issue.labels]
+
+
+class RateLimiter:
+    def __init__(self, limit: Optional[int], window: float = RATE_LIMIT_WINDOW) -> None:
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.budgets: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def consume(self, token: str, resource: str, cost: int = 1) -> Tuple[bool, Dict[str, str]]:
+        if self.limit is None:
+            return True, {}
+        now = time.time()
+        with self.lock:
+            remaining, reset = self.budgets.get((token, resource), (0, 0))
+            if reset <= now:
+                remaining, reset = self.limit, int(now + self.window)
+            allowed = remaining > 0
+            if allowed:
+                remaining = max(0, remaining - cost)
+            self.budgets[(token, resource)] = remaining, reset
+        return allowed, {'X-RateLimit-Limit': str(self.limit), 'X-RateLimit-Remaining': str(remaining),
+                         'X-RateLimit-Used': str(self.limit - remaining), 'X-RateLimit-Reset': str(reset),
+                         'X-RateLimit-Resource': resource}
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def get_rate_limit(cost: int, headers: Dict[str, str]) -> Dict[str, Any]:
+    # The `rateLimit` field of GraphQL queries agrees with the rate limit headers.
+    if not headers:
+        return {'cost': cost, 'limit': GRAPHQL_POINTS, 'remaining': GRAPHQL_POINTS,
+                'resetAt': timestamp(time.time() + RATE_LIMIT_WINDOW)}
+    return {'cost': cost, 'limit': int(headers['X-RateLimit-Limit']),
+            'remaining': int(headers['X-RateLimit-Remaining']),
+            'resetAt': timestamp(float(headers['X-RateLimit-Reset']))}
+
+
+class WebhookSender:
+    # Delivers webhook events to a URL one by one in the background, like GitHub, signed with a secret.
+    def __init__(self, url: str, secret: str) -> None:
+        self.url = url
+        self.secret = secret.encode('utf-8')
+        self.queue: 'queue.Queue[Optional[Tuple[str, bytes]]]' = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __call__(self, event: str, payload: Dict[str, Any]) -> None:
+        self.queue.put((event, json.dumps(payload).encode('utf-8')))
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self.send(*item)
+            finally:
+                self.queue.task_done()
+
+    def send(self, event: str, body: bytes) -> None:
+        signature = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(self.url, body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': event,
+            'X-Hub-Signature-256': f'sha256={signature}',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+        except OSError as e:
+            print(f'Failed to deliver a {event} event to {self.url}: {e}', file=sys.stderr)
+
+    def wait(self) -> None:
+        self.queue.join()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+
+class FakeServer:
+    def __init__(self, github: FakeGitHub, *, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 rate_limiter: Optional[RateLimiter] = None) -> None:
+        self.github = github
+        self.latency = latency
+        self.rate_limiter = rate_limiter or RateLimiter(None)
+        self.host = host
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.server.server_port}'
+
+    @property
+    def graphql_url(self) -> str:
+        return f'{self.url}/graphql'
+
+    def start(self) -> 'FakeServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeServer':
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def make_handler(self) -> Callable[..., BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                server.handle(self, 'GET')
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                server.handle(self, 'POST')
+
+            def do_PATCH(self) -> None:  # pylint: disable=invalid-name
+                server.handle(self, 'PATCH')
+
+            def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+                server.handle(self, 'DELETE')
+
+            def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
+
+    def handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(handler.headers.get('Content-Length') or 0)
+        raw_body = handler.rfile.read(length) if length else b''
+        body = json.loads(raw_body) if raw_body else {}
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(handler.path)
+        path = url.path
+        is_graphql = path == '/graphql'
+        token = handler.headers.get('Authorization', '')
+        headers: Dict[str, str] = {}
+
+        def budget(cost: int) -> Dict[str, Any]:
+            allowed, limit_headers = self.rate_limiter.consume(token, 'graphql' if is_graphql else 'core', cost)
+            headers.update(limit_headers)
+            if not allowed:
+                raise RateLimitExceeded()
+            return get_rate_limit(cost, limit_headers)
+
+        try:
+            if is_graphql and method == 'POST':
+                status, result = 200, self.github.graphql(body['query'], body.get('variables'), budget)
+            elif method == 'GET':
+                status, result = self.github.rest(method, path, body, dict(parse_qsl(url.query)))
+                etag = f'"{hashlib.sha256(json.dumps(result).encode()).hexdigest()}"' if status == 200 else None
+                if etag:
+                    headers['ETag'] = etag
+                if etag and handler.headers.get('If-None-Match') == etag:
+                    # Like GitHub, conditional requests answered with 304 Not Modified are not counted.
+                    status, result = 304, None
+                    with self.github.lock:
+                        self.github.calls['rest not modified'] += 1
+                else:
+                    budget(1)
+            else:
+                budget(1)
+                status, result = self.github.rest(method, path, body)
+        except RateLimitExceeded:
+            status, result = 403, {'message': 'API rate limit exceeded.'}
+        self.respond(handler, status, result, headers)
+
+    @staticmethod
+    def respond(handler: BaseHTTPRequestHandler, status: int, result: Any, headers: Dict[str, str]) -> None:
+        payload = json.dumps(result).encode('utf-8') if result is not None else b''
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog=argv[0], description='Serve a fake GitHub API with a generated fleet.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--repos', type=int, default=10)
+    parser.add_argument('--owners', type=int, default=1)
+    parser.add_argument('--labels', type=int, default=20)
+    parser.add_argument('--issues', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int)
+    parser.add_argument('--rate-limit-window', type=float, default=RATE_LIMIT_WINDOW)
+    parser.add_argument('--webhook', metavar='URL', help='Send label events to a URL.')
+    parser.add_argument('--webhook-secret', default='', help='Sign label events with a secret.')
+    params = parser.parse_args(argv[1:])
+    github = FakeGitHub.generate(params.repos, params.labels, params.issues, owners=params.owners)
+    if params.webhook:
+        github.webhooks.append(WebhookSender(params.webhook, params.webhook_secret))
+    server = FakeServer(github, port=params.port, latency=params.latency,
+                        rate_limiter=RateLimiter(params.rate_limit, params.rate_limit_window))
+    print(f'REST endpoint: {server.url}, GraphQL endpoint: {server.graphql_url}')
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,22 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import time
+from typing import Optional
+
+from github_labels_sync.store import LabelStore
+
+
+def find_label(store: LabelStore, name: str) -> int:
+    # Answered only from the label store without any requests, so repositories not listed recently are not included.
+    usages = store.find_label(name)
+    now = time.time()
+    for usage in usages:
+        print(f'{usage.repo}: {usage.name!r}, issues: {format_count(usage.issues)}, '
+              f'pull requests: {format_count(usage.pull_requests)}, listed: {int(now - usage.fetched)} s ago')
+    print(f'Label {name!r} is used in {len(usages)} repositories.')
+    return 0 if usages else 1
+
+
+def format_count(count: Optional[int]) -> str:
+    return '?' if count is None else str(count)
@@ -1,14 +1,42 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import List, Dict, Optional, Union, Iterable, Any
+import itertools
+from collections import Counter
+from typing import List, Dict, Optional, Union, Iterable, Iterator, Tuple, Any, Callable, NamedTuple
 
 import requests
 
-from github_labels_sync import graphql, rest
+from github_labels_sync import graphql, http, rest, stats, utils, queries
+from github_labels_sync.queries import PAGE_SIZE, LABEL_FIELDS, LABEL_DETAIL_FIELDS
+from github_labels_sync.cache import ResponseCache
+from github_labels_sync.label import Label
+from github_labels_sync.mutations import LabelMutation, MutationBatcher, NodeIds
+from github_labels_sync.parallel import get_owner
+from github_labels_sync.stats import RequestHook
+from github_labels_sync.store import LabelStore
+from github_labels_sync.tokens import TokenPool
 
 DEFAULT_GRAPHQL_ENDPOINT_URL = 'https://api.github.com/graphql'
 DEFAULT_REST_ENDPOINT_URL = 'https://api.github.com'
+# Each repository in a bulk query asks for up to 100 label nodes, so 50 repositories per request stay far below
+# GitHub's limit of 500,000 nodes and cost only a single point of the GraphQL rate limit.
+BULK_CHUNK_SIZE = 50
+# Change markers do not fetch any nodes, so many more repositories fit in a single request.
+MARKER_CHUNK_SIZE = 100
+# Each item costs two mutations, so a batch of 50 issues is a request with 100 mutations.
+RELABEL_BATCH_SIZE = 50
+MUTATION_BATCH_SIZE = 50
+# How long mutations of a repository wait for those of other repositories pushed in parallel to fill a batch.
+MUTATION_LINGER = 0.05
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class Relabeling(NamedTuple):
+    old_id: str
+    new_id: str
+    labelables: List[str]
 
 
 class GraphqlClient(graphql.Client):
@@ -16,19 +44,25 @@ class GraphqlClient(graphql.Client):
                  endpoint: str = DEFAULT_GRAPHQL_ENDPOINT_URL,
                  session: Optional[requests.Session] = None) -> None:
         super().__init__(endpoint, session)
+        # Label mutations used to be a preview and GitHub Enterprise Server may still need it.
+        self.headers['Accept'] = 'application/vnd.github.bane-preview+json'
 
 
 class RestClient(rest.Client):
     def __init__(self,
                  endpoint: str = DEFAULT_REST_ENDPOINT_URL,
-                 session: Optional[requests.Session] = None) -> None:
-        super().__init__(endpoint, session)
+                 session: Optional[requests.Session] = None,
+                 cache: Optional[ResponseCache] = None) -> None:
+        super().__init__(endpoint, session, cache=cache)
         self.headers['Accept'] = 'application/vnd.github.symmetra-preview+json'
 
 
-class GitHub:
+class GitHub:  # pylint: disable=too-many-public-methods
     graphql_client: graphql.Client
     rest_client: rest.Client
+    store: Optional[LabelStore]
+    node_ids: Optional[NodeIds]
+    batcher: Optional[MutationBatcher]
 
     def __init__(self,
                  graphql_client: Optional[graphql.Client] = None,
@@ -41,6 +75,9 @@ class GitHub:
                 rest_client = RestClient(session=session)
         self.graphql_client = graphql_client
         self.rest_client = rest_client
+        self.store = None
+        self.node_ids = None
+        self.batcher = None
 
     def set_token(self, token: Union[bytes, str]) -> None:
         self.graphql_client.set_token(token)
@@ -50,34 +87,198 @@ class GitHub:
         self.graphql_client.unset_token()
         self.rest_client.unset_token()
 
-    def get_label(self, owner: str, repo: str, name: str) -> dict:
-        result = self.rest_client(f'/repos/{owner}/{repo}/labels/{name}')
+    def set_tokens(self, tokens: Optional[TokenPool]) -> None:
+        # Requests are spread over a pool of tokens instead of a single token.
+        self.graphql_client.tokens = tokens
+        self.rest_client.tokens = tokens
+
+    def set_cache(self, cache: Optional[ResponseCache]) -> None:
+        self.rest_client.cache = cache
+
+    def set_store(self, store: Optional[LabelStore]) -> None:
+        self.store = store
+
+    def set_batching(self, batch_size: int = MUTATION_BATCH_SIZE, linger: float = 0.0) -> None:
+        # Labels are then created, updated and deleted with batches of GraphQL mutations, see `mutate_labels`.
+        self.node_ids = NodeIds()
+        self.batcher = MutationBatcher(self.send_label_mutations, batch_size, linger, self.get_batch_key)
+
+    def get_batch_key(self, mutation: LabelMutation) -> str:
+        # A batch of mutations must be sent with a token allowed to access all its repositories, like bulk queries.
+        tokens = self.graphql_client.tokens
+        return get_owner(mutation.repo).lower() if tokens and tokens.restricted else ''
+
+    def add_hook(self, hook: RequestHook) -> None:
+        self.graphql_client.hooks.append(hook)
+        self.rest_client.hooks.append(hook)
+
+    def get_budgets(self) -> Dict[str, http.Budget]:
+        tokens = self.graphql_client.tokens
+        if tokens:
+            return {f'{api} {token.name}': scheduler.budget
+                    for token in tokens.tokens for api, scheduler in token.schedulers.items()}
+        return {'graphql': self.graphql_client.budget, 'rest': self.rest_client.budget}
+
+    def chunk_repos(self, repos: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+        # A bulk query must be sent with a token allowed to access all its repositories, so if some tokens are
+        # restricted to some owners, each chunk holds repositories of a single owner.
+        tokens = self.graphql_client.tokens
+        if not tokens or not tokens.restricted:
+            yield from utils.chunks(repos, chunk_size)
+            return
+        for _owner, owner_repos in itertools.groupby(repos, get_owner):
+            yield from utils.chunks(owner_repos, chunk_size)
+
+    def get_label(self, repo: str, name: str) -> dict:
+        result = self.rest_client(f'/repos/{repo}/labels/{name}')
         assert isinstance(result, dict)
         return result
 
     def create_label(self, repo: str, name: str, properties: dict) -> dict:
-        properties['name'] = name
-        result = self.rest_client.post(f'/repos/{repo}/labels', properties)
+        properties = dict(properties, name=name)
+        try:
+            result = self.rest_client.post(f'/repos/{repo}/labels', properties)
+        finally:
+            self.invalidate(repo)
         assert isinstance(result, dict)
         return result
 
     def update_label(self, repo: str, name: str, properties: dict) -> dict:
-        result = self.rest_client.patch(f'/repos/{repo}/labels/{name}', properties)
+        try:
+            result = self.rest_client.patch(f'/repos/{repo}/labels/{name}', properties)
+        finally:
+            self.invalidate(repo)
         assert isinstance(result, dict)
         return result
 
     def delete_label(self, repo: str, name: str) -> None:
-        self.rest_client.delete(f'/repos/{repo}/labels/{name}')
+        try:
+            self.rest_client.delete(f'/repos/{repo}/labels/{name}')
+        finally:
+            self.invalidate(repo)
 
-    def replace_label(self, repo: str, old_label: str, new_label: str) -> None:
-        while True:
-            issues = self.list_issues_with_label(repo, old_label)
-            if not issues:
-                break
-            for issue in issues:
-                number: int = issue['number']
-                self.add_label_to_issue(repo, number, new_label)
-                self.remove_label_from_issue(repo, number, old_label)
+    def invalidate(self, repo: str) -> None:
+        # Even a failed request may have changed the labels, e.g. when the connection dropped before the response.
+        if self.store:
+            self.store.invalidate(repo)
+
+    def replace_label(self, repo: str, old_label: str, new_label: str, *, batch_size: int = RELABEL_BATCH_SIZE,
+                      progress: Optional[ProgressCallback] = None) -> None:
+        relabeling = self.prepare_relabeling(repo, old_label, new_label)
+        if relabeling:
+            self.run_relabeling(relabeling, batch_size=batch_size, progress=progress)
+
+    def prepare_relabeling(self, repo: str, old_label: str, new_label: str) -> Optional[Relabeling]:
+        old_id, new_id = self.get_label_ids(repo, [old_label, new_label])
+        if not old_id:
+            return None
+        if not new_id:
+            raise ValueError(f'Cannot find label {new_label!r} in {repo}.')
+
+        # Relabeling shrinks the result set, so collect the items before changing them not to skip any.
+        labelables = [item['id'] for item in self.iter_labelables_with_label(repo, old_label)]
+        return Relabeling(old_id, new_id, labelables)
+
+    def run_relabeling(self, relabeling: Relabeling, start: int = 0, *, batch_size: int = RELABEL_BATCH_SIZE,
+                       progress: Optional[ProgressCallback] = None) -> None:
+        total = len(relabeling.labelables)
+        done = start
+        for batch in utils.chunks(relabeling.labelables[start:], batch_size):
+            self.relabel(batch, relabeling.old_id, relabeling.new_id)
+            done += len(batch)
+            if progress:
+                progress(done, total)
+
+    def mutate_labels(self, mutations: List[LabelMutation]) -> List[Optional[BaseException]]:
+        # Returns an error or None for each mutation. Mutations of other threads may join the same requests.
+        if self.batcher:
+            return self.batcher.run(mutations)
+        return list(self.send_label_mutations(mutations))
+
+    def send_label_mutations(self, mutations: List[LabelMutation]) -> List[Optional[Exception]]:
+        errors: List[Optional[Exception]] = [None] * len(mutations)
+        node_ids = self.resolve_node_ids(mutations)
+        items = []
+        for i, (mutation, node_id) in enumerate(zip(mutations, node_ids)):
+            if node_id:
+                items.append((i, mutation, get_mutation_input(mutation, node_id)))
+            elif mutation.type == 'create':
+                errors[i] = ValueError(f'Cannot find repository {mutation.repo!r}.')
+            else:
+                errors[i] = ValueError(f'Cannot find label {mutation.name!r} in {mutation.repo}.')
+        if not items:
+            return errors
+        try:
+            # Mutations refer to nodes by their IDs, so owners of their repositories are passed explicitly.
+            with stats.shared(get_shares(mutation.repo for _i, mutation, _input in items)):
+                result = self.graphql_client.request(*queries.label_mutations(
+                    [(mutation.type, mutation_input) for _i, mutation, mutation_input in items]),
+                    owners=frozenset(get_owner(mutation.repo).lower() for _i, mutation, _input in items))
+        finally:
+            for repo in {mutation.repo for mutation in mutations}:
+                self.invalidate(repo)
+        for (i, mutation, _input), (data, error) in zip(items, queries.parse_label_mutations(len(items), result)):
+            if error or not data:
+                errors[i] = ValueError(f'GraphQL mutation failed: {error or "No data."}')
+            else:
+                self.track_node_ids(mutation, data)
+        return errors
+
+    def resolve_node_ids(self, mutations: List[LabelMutation]) -> List[Optional[str]]:
+        # Repository IDs for creating labels, label IDs otherwise. Unknown IDs are looked up in bulk.
+        node_ids = self.node_ids or NodeIds()
+        repos = {mutation.repo.lower(): mutation.repo for mutation in mutations if mutation.type == 'create'}
+        missing = [repo for repo in repos.values() if not node_ids.get_repo(repo)]
+        if missing and self.store:
+            for repo in missing:
+                node_id = self.store.get_repo_id(repo)
+                if node_id:
+                    node_ids.set_repo(repo, node_id)
+        missing = [repo for repo in repos.values() if not node_ids.get_repo(repo)]
+        for chunk in self.chunk_repos(missing, BULK_CHUNK_SIZE):
+            for repo, repository in self.query_repositories(chunk, 'id'):
+                node_ids.set_repo(repo, repository['id'])
+
+        labels: Dict[str, List[str]] = {}
+        for mutation in mutations:
+            if mutation.type != 'create' and not node_ids.get_label(mutation.repo, mutation.name):
+                labels.setdefault(mutation.repo, []).append(mutation.name)
+        for repo, names in labels.items():
+            with stats.tagged(repo=repo):
+                label_ids = self.get_label_ids(repo, names)
+            for name, node_id in zip(names, label_ids):
+                if node_id:
+                    node_ids.set_label(repo, name, node_id)
+        return [node_ids.get_repo(mutation.repo) if mutation.type == 'create'
+                else node_ids.get_label(mutation.repo, mutation.name) for mutation in mutations]
+
+    def track_node_ids(self, mutation: LabelMutation, data: Dict[str, Any]) -> None:
+        node_ids = self.node_ids
+        if not node_ids:
+            return
+        if mutation.type == 'create':
+            node_ids.set_label(mutation.repo, mutation.name, data['label']['id'])
+        elif mutation.type == 'delete':
+            node_ids.remove_label(mutation.repo, mutation.name)
+        elif mutation.properties and 'name' in mutation.properties:
+            node_ids.remove_label(mutation.repo, mutation.name)
+            node_ids.set_label(mutation.repo, mutation.properties['name'], data['label']['id'])
+
+    def forget_node_ids(self, repo: str) -> None:
+        if self.node_ids:
+            self.node_ids.forget(repo)
+
+    def relabel(self, labelables: List[str], old_id: str, new_id: str) -> None:
+        self.graphql_client.mutate(*queries.relabel_mutation(labelables, old_id, new_id))
+
+    def get_label_ids(self, repo: str, names: List[str]) -> List[Optional[str]]:
+        return queries.parse_label_ids(repo, names, self.graphql_client.query(*queries.label_ids_query(repo, names)))
+
+    def iter_labelables_with_label(self, repo: str, label: str, page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        owner, repo = repo.split('/')
+        for connection in queries.LABELABLE_CONNECTIONS:
+            yield from self.paginate(queries.LABELABLES_QUERY % connection, ('repository', 'label', connection),
+                                     page_size, owner=owner, repo=repo, label=label)
 
     def add_label_to_issue(self, repo: str, issue: int, label: str) -> List[str]:
         return self.add_labels_to_issue(repo, issue, [label])
@@ -90,39 +291,139 @@ class GitHub:
     def remove_label_from_issue(self, repo: str, issue: int, label: str) -> None:
         self.rest_client.delete(f'/repos/{repo}/issues/{issue}/labels/{label}')
 
-    def list_labels(self, repo: str) -> List[Dict[str, str]]:
+    def list_labels(self, repo: str, page_size: int = PAGE_SIZE) -> List[Label]:
+        # Always listed from GitHub, e.g. for --pull, and then stored for other commands. With the HTTP cache, labels
+        # are listed with conditional REST requests, which cost nothing while the labels are unchanged. GraphQL
+        # queries cannot be conditional.
+        if self.rest_client.cache:
+            labels = list(self.iter_labels_rest(repo, page_size))
+        else:
+            labels = list(self.iter_labels(repo, page_size))
+        if self.store:
+            self.store.set_labels(repo, labels)
+        if self.node_ids:
+            self.node_ids.set_labels(repo, labels)
+        return labels
+
+    def iter_labels_rest(self, repo: str, page_size: int = PAGE_SIZE) -> Iterator[Label]:
+        page = 1
+        while True:
+            nodes = self.rest_client(f'/repos/{repo}/labels?per_page={page_size}&page={page}')
+            assert isinstance(nodes, list)
+            for node in nodes:
+                yield Label.create(node['name'], node['color'], node.get('description'), node.get('node_id'))
+            if len(nodes) < page_size:
+                break
+            page += 1
+
+    def iter_labels(self, repo: str, page_size: int = PAGE_SIZE, after: Optional[str] = None) -> Iterator[Label]:
+        # Each page of nodes is decoded into compact labels right away, so that only one page of dicts is alive.
+        return (Label.load(node) for node in self.iter_label_details(repo, page_size, after, fields=LABEL_FIELDS))
+
+    def list_label_details(self, repo: str, page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        details = list(self.iter_label_details(repo, page_size))
+        if self.store:
+            counts = {node['name']: (node['issues']['totalCount'], node['pullRequests']['totalCount'])
+                      for node in details}
+            self.store.set_labels(repo, [Label.load(node) for node in details], counts=counts)
+        return details
+
+    def iter_label_details(self, repo: str, page_size: int = PAGE_SIZE, after: Optional[str] = None, *,
+                           fields: str = LABEL_DETAIL_FIELDS) -> Iterator[Dict[str, Any]]:
         owner, repo = repo.split('/')
-        data = self.graphql_client.query(
-            '''
-            query ($owner: String!, $repo: String!) {
-              repository(owner: $owner, name: $repo) {
-                labels(first: 100) {
-                  nodes {
-                    id
-                    name
-                    color
-                    description
-                  }
-                }
-              }
-            }
-            ''', owner=owner, repo=repo)
-        result: List[Dict[str, str]] = data['repository']['labels']['nodes']
+        return self.paginate(queries.LABELS_QUERY % fields, ('repository', 'labels'), page_size, after,
+                             owner=owner, repo=repo)
+
+    def iter_labels_bulk(self, repos: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE, *,
+                         cached: bool = False) -> Iterator[Tuple[str, List[Label]]]:
+        # Labels are listed from GitHub and then stored, unless `cached` is set for commands which change nothing.
+        # Then fresh snapshots from the label store are used as they are and only the other repositories are queried.
+        for chunk in self.chunk_repos(repos, chunk_size):
+            if not self.store or not cached:
+                yield from self.list_labels_chunk(chunk)
+                continue
+            stored = self.store.get_labels_many(chunk)
+            missing = [repo for repo in chunk if repo.lower() not in stored]
+            fetched = dict(self.list_labels_chunk(missing)) if missing else {}
+            for repo in chunk:
+                labels = stored.get(repo.lower())
+                if labels is None:
+                    labels = fetched[repo]
+                elif self.node_ids:
+                    self.node_ids.set_labels(repo, labels)
+                yield repo, labels
+
+    def list_labels_bulk(self, repos: Iterable[str], chunk_size: int = BULK_CHUNK_SIZE, *,
+                         cached: bool = False) -> Dict[str, List[Label]]:
+        return dict(self.iter_labels_bulk(repos, chunk_size, cached=cached))
+
+    def list_labels_chunk(self, repos: List[str]) -> List[Tuple[str, List[Label]]]:
+        if self.rest_client.cache:
+            # Many conditional requests answered from the HTTP cache are cheaper than one bulk query.
+            return [(repo, self.list_labels(repo)) for repo in repos]
+        result = []
+        for repo, repository in self.query_repositories(repos, queries.BULK_LABELS_FIELDS):
+            labels = [Label.load(node) for node in repository['labels']['nodes']]
+            page_info = repository['labels']['pageInfo']
+            if page_info['hasNextPage']:
+                labels.extend(self.iter_labels(repo, after=page_info['endCursor']))
+            if self.store:
+                self.store.set_labels(repo, labels, node_id=repository['id'])
+            if self.node_ids:
+                self.node_ids.set_repo(repo, repository['id'])
+                self.node_ids.set_labels(repo, labels)
+            result.append((repo, labels))
         return result
 
-    def list_issues_with_label(self, repo: str, label: str) -> List[Dict[str, Any]]:
+    def iter_repo_markers(self, repos: Iterable[str], chunk_size: int = MARKER_CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+        for chunk in self.chunk_repos(repos, chunk_size):
+            for repo, repository in self.query_repositories(chunk, queries.MARKER_FIELDS):
+                labels = repository['labels']['nodes']
+                page_info = repository['labels']['pageInfo']
+                if page_info['hasNextPage']:
+                    labels.extend(self.iter_label_details(repo, after=page_info['endCursor'], fields=LABEL_FIELDS))
+                yield repo, queries.get_marker(repository, labels)
+
+    def iter_owner_repos(self, owner: str, *, fork: Optional[bool] = None,
+                         page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        return self.paginate(queries.OWNER_REPOSITORIES_QUERY, ('repositoryOwner', 'repositories'), page_size,
+                             owner=owner, isFork=fork)
+
+    def query_repositories(self, repos: List[str], fields: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with stats.shared(get_shares(repos)):
+            data = self.graphql_client.query(*queries.repositories_query(repos, fields))
+        return queries.parse_repositories(repos, data)
+
+    def list_issues_with_label(self, repo: str, label: str, page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        return list(self.iter_issues_with_label(repo, label, page_size))
+
+    def iter_issues_with_label(self, repo: str, label: str, page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
         owner, repo = repo.split('/')
-        data = self.graphql_client.query(
-            '''
-            query ($owner: String!, $repo: String!, $label: String!) {
-              repository(owner: $owner, name: $repo) {
-                issues(labels: [$label], first: 100) {
-                  nodes {
-                    number
-                  }
-                }
-              }
-            }
-            ''', owner=owner, repo=repo, label=label)
-        result: List[Dict[str, str]] = data['repository']['issues']['nodes']
-        return result
+        return self.paginate(queries.ISSUES_WITH_LABEL_QUERY, ('repository', 'issues'), page_size,
+                             owner=owner, repo=repo, label=label)
+
+    def paginate(self, query: str, path: Iterable[str], page_size: int = PAGE_SIZE, after: Optional[str] = None,
+                 **variables: Any) -> Iterator[Dict[str, Any]]:
+        while True:
+            data = self.graphql_client.query(query, dict(variables, first=page_size, after=after))
+            connection = queries.get_connection(data, path, variables)
+            yield from connection['nodes']
+            page_info = connection['pageInfo']
+            if not page_info['hasNextPage']:
+                break
+            after = page_info['endCursor']
+
+
+def get_shares(repos: Iterable[str]) -> Dict[str, float]:
+    # Parts of a request shared by repositories, by the number of their items in it.
+    counts = Counter(repos)
+    total = sum(counts.values())
+    return {repo: count / total for repo, count in counts.items()}
+
+
+def get_mutation_input(mutation: LabelMutation, node_id: str) -> Dict[str, Any]:
+    if mutation.type == 'create':
+        return dict(mutation.properties or {}, repositoryId=node_id, name=mutation.name)
+    if mutation.type == 'update':
+        return dict(mutation.properties or {}, id=node_id)
+    return {'id': node_id}
@@ -1,27 +1,106 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Union, Any, Optional
+import json
+from datetime import datetime, timezone
+from typing import Union, Any, Dict, FrozenSet, Optional
+
+import requests
 
 from github_labels_sync import http
 
 
 class Client(http.Client):
+    API = 'graphql'
+
     def query(self, query: str, variables: Optional[dict] = None, **kwargs: Any) -> dict:
+        return get_query_data(self.request(query, variables, retry=True, **kwargs))
+
+    __call__ = query
+
+    def mutate(self, mutation: str, variables: Optional[dict] = None, **kwargs: Any) -> dict:
+        return get_mutation_data(self.request(mutation, variables, retry=False, **kwargs))
+
+    def request(self, query: str, variables: Optional[dict] = None, *, retry: bool = False,
+                owners: Optional[FrozenSet[str]] = None, **kwargs: Any) -> dict:
         if variables is None:
             variables = kwargs
         elif kwargs:
             variables.update(kwargs)
 
-        response = self.session.post(self.endpoint, json={'query': query, 'variables': variables}, headers=self.headers)
-        data = response.json()['data']
-        assert isinstance(data, dict)
-        return data
+        response = self.send('POST', self.endpoint, retry=retry, owners=owners,
+                             json={'query': query, 'variables': variables})
+        result = http.check_response(response).json()
+        assert isinstance(result, dict)
+        return result
 
-    __call__ = query
+    def update_budget(self, scheduler: http.Scheduler, response: requests.Response) -> None:
+        super().update_budget(scheduler, response)
+        if b'"rateLimit"' in response.content:
+            try:
+                update_budget(scheduler, response.json())
+            except ValueError:
+                pass
+
+    def get_owners(self, url: str, kwargs: Dict[str, Any]) -> FrozenSet[str]:
+        # Queries of repositories have variables `owner` or `owner0`, `owner1`, etc. for bulk queries.
+        variables = kwargs['json']['variables']
+        owners = frozenset(value.lower() for key, value in variables.items()
+                           if key == 'owner' or (key.startswith('owner') and key[5:].isdigit()))
+        return owners or super().get_owners(url, kwargs)
+
+    def get_cost(self, response: requests.Response) -> int:
+        # The cost is known only for queries asking for it, otherwise it is the minimal one.
+        if b'"rateLimit"' in response.content:
+            try:
+                return int(response.json()['data']['rateLimit']['cost'])
+            except (ValueError, KeyError, TypeError):
+                pass
+        return 1
+
+    def is_rate_limited(self, response: requests.Response) -> bool:
+        if super().is_rate_limited(response):
+            return True
+        return response.status_code == 200 and is_rate_limited_body(response.content)
 
     def set_token(self, token: Union[bytes, str]) -> None:
         self.headers['Authorization'] = f'bearer {token if isinstance(token, str) else token.decode("ascii")}'
 
     def unset_token(self) -> None:
         del self.headers['Authorization']
+
+
+def is_rate_limited_body(content: bytes) -> bool:
+    if b'RATE_LIMITED' not in content:
+        return False
+    try:
+        errors = json.loads(content).get('errors') or []
+    except ValueError:
+        return False
+    return any(error.get('type') == 'RATE_LIMITED' for error in errors)
+
+
+def update_budget(scheduler: http.Scheduler, result: dict) -> None:
+    rate_limit = (result.get('data') or {}).get('rateLimit')
+    if rate_limit:
+        reset = datetime.strptime(rate_limit['resetAt'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        scheduler.set_budget(rate_limit.get('limit'), rate_limit['remaining'], reset.timestamp())
+
+
+def get_query_data(result: dict) -> dict:
+    # Queries may return partial data with errors, e.g. of repositories which cannot be found, so errors fail only
+    # queries without any data.
+    data = result.get('data')
+    if not isinstance(data, dict):
+        raise ValueError('GraphQL query failed: ' + '; '.join(
+            str(error.get('message')) for error in result.get('errors') or [{'message': 'No data.'}]))
+    return data
+
+
+def get_mutation_data(result: dict) -> dict:
+    errors = result.get('errors')
+    if errors:
+        raise ValueError('GraphQL mutation failed: ' + '; '.join(str(error.get('message')) for error in errors))
+    data = result['data']
+    assert isinstance(data, dict)
+    return data
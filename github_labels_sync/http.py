@@ -1,21 +1,276 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Optional
+import json
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from typing import Optional, Callable, NamedTuple, Any, Mapping, List, Dict, FrozenSet, Tuple, TYPE_CHECKING
 
 import requests
 
+from github_labels_sync import stats
 from github_labels_sync.typing import StrDict
 
+if TYPE_CHECKING:
+    from github_labels_sync.tokens import TokenPool
 
-class Client:
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+MAX_RETRIES = 5
+# GitHub asks to wait at least one minute after hitting a secondary rate limit without a Retry-After header.
+SECONDARY_LIMIT_BACKOFF = 60.0
+ERROR_BACKOFF = 1.0
+# Start spacing requests evenly once less than this fraction of the budget is left.
+RESERVE = 0.2
+
+
+class Budget(NamedTuple):
+    limit: Optional[int]
+    remaining: Optional[int]
+    reset: Optional[float]
+    used: Optional[int]
+
+
+class Scheduler:
+    reserve: float
+    clock: Callable[[], float]
+    blocked_until: float
+    next_slot: float
+    _budget: Budget
+
+    def __init__(self, *, reserve: float = RESERVE, clock: Callable[[], float] = time.time) -> None:
+        self.reserve = reserve
+        self.clock = clock
+        self.blocked_until = self.next_slot = 0.0
+        self._budget = Budget(None, None, None, None)
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> Budget:
+        return self._budget
+
+    def delay(self) -> float:
+        # Reserves a slot for a request and returns how many seconds to wait for it.
+        with self._lock:
+            now = self.clock()
+            start = max(now, self.blocked_until, self.next_slot)
+            limit, remaining, reset, _used = self._budget
+            if remaining is None or reset is None or reset <= start:
+                return start - now
+            if remaining <= 0:
+                self.next_slot = reset
+                return reset - now
+            interval = 0.0
+            if limit and remaining < limit * self.reserve:
+                interval = (reset - start) / remaining
+            self._budget = self._budget._replace(remaining=remaining - 1)
+            self.next_slot = start + interval
+            return start - now
+
+    def get_available_at(self) -> float:
+        # When the next request could be sent, without reserving a slot for it. It may be in the past.
+        with self._lock:
+            available_at = max(self.blocked_until, self.next_slot)
+            _limit, remaining, reset, _used = self._budget
+            if remaining is not None and remaining <= 0 and reset is not None:
+                available_at = max(available_at, reset)
+            return available_at
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        used: Optional[int] = int(headers['X-RateLimit-Used']) if 'X-RateLimit-Used' in headers else None
+        self.set_budget(limit, remaining, reset, used)
+
+    def set_budget(self, limit: Optional[int], remaining: int, reset: float, used: Optional[int] = None) -> None:
+        with self._lock:
+            budget = self._budget
+            if budget.reset is not None and reset < budget.reset:
+                return  # A stale response from a previous rate limit window.
+            if budget.reset == reset and budget.remaining is not None:
+                # Responses of concurrent requests may arrive out of order.
+                remaining = min(remaining, budget.remaining)
+            self._budget = Budget(limit if limit is not None else budget.limit, remaining, reset,
+                                  used if used is not None else budget.used)
+
+    def back_off(self, headers: Mapping[str, str], attempt: int) -> None:
+        now = self.clock()
+        retry_after = parse_retry_after(headers.get('Retry-After'), now)
+        if retry_after is not None:
+            until = now + retry_after
+        elif headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in headers:
+            until = float(headers['X-RateLimit-Reset'])
+        else:
+            until = now + SECONDARY_LIMIT_BACKOFF * 2 ** attempt
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, until)
+
+
+def parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+class Client:  # pylint: disable=too-many-instance-attributes
+    API: str = 'http'
     endpoint: str
     session: requests.Session
     headers: StrDict
+    scheduler: Scheduler
+    tokens: Optional['TokenPool']
+    max_retries: int
+    sleep: Callable[[float], None]
+    hooks: List[stats.RequestHook]
 
-    def __init__(self, endpoint: str, session: Optional[requests.Session] = None) -> None:
+    def __init__(self, endpoint: str, session: Optional[requests.Session] = None,
+                 scheduler: Optional[Scheduler] = None) -> None:
         self.endpoint = endpoint
         if not session:
             session = requests.Session()
         self.headers = {'Accept': 'application/json'}
         self.session = session
+        self.scheduler = scheduler or Scheduler()
+        self.tokens = None
+        self.max_retries = MAX_RETRIES
+        self.sleep = time.sleep
+        self.hooks = []
+
+    @property
+    def budget(self) -> Budget:
+        return self.scheduler.budget
+
+    def send(self, method: str, url: str, *,  # pylint: disable=too-many-arguments
+             retry: Optional[bool] = None, headers: Optional[StrDict] = None,
+             extra_headers: Optional[Callable[[StrDict], StrDict]] = None, owners: Optional[FrozenSet[str]] = None,
+             **kwargs: Any) -> requests.Response:
+        # Requests rejected by a rate limit are always repeated because GitHub has not processed them. Requests which
+        # failed for other reasons are repeated only if `retry` is set, which defaults to idempotent HTTP methods.
+        # `extra_headers` adds headers which depend on those of each attempt, e.g. on the token selected for it.
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        headers = dict(self.headers, **headers) if headers else self.headers
+        # With a pool of tokens, each attempt picks a token again, e.g. after the previous one hit its rate limit.
+        # `owners` of accessed repositories are found by `get_owners` unless they are passed explicitly.
+        if not self.tokens or not self.tokens.restricted:
+            owners = frozenset()
+        elif owners is None:
+            owners = self.get_owners(url, kwargs)
+        attempt = 0
+        while True:
+            request_headers, scheduler = self.select_token(headers, owners)
+            if extra_headers:
+                request_headers = dict(request_headers, **extra_headers(request_headers))
+            delay = scheduler.delay()
+            if delay > 0:
+                self.sleep(delay)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, headers=request_headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record(method, url, None, time.perf_counter() - started)
+                if not retry or attempt >= self.max_retries:
+                    raise
+                self.sleep(ERROR_BACKOFF * 2 ** attempt)
+                attempt += 1
+                continue
+
+            self.record(method, url, response, time.perf_counter() - started)
+            self.update_budget(scheduler, response)
+            if attempt >= self.max_retries:
+                return response
+            backoff = get_backoff(scheduler, response.headers, attempt,
+                                  rate_limited=self.is_rate_limited(response),
+                                  failed=retry and response.status_code in RETRY_STATUSES)
+            if backoff is None:
+                return response
+            if backoff > 0:
+                self.sleep(backoff)
+            attempt += 1
+
+    def select_token(self, headers: StrDict, owners: FrozenSet[str]) -> Tuple[StrDict, Scheduler]:
+        if not self.tokens:
+            return headers, self.scheduler
+        token, scheduler = self.tokens.select(self.API, owners)
+        return dict(headers, Authorization=token.authorization), scheduler
+
+    def record(self, method: str, url: str, response: Optional[requests.Response], latency: float) -> None:
+        if not self.hooks:
+            return
+        path = urlsplit(url).path
+        if response is None:
+            record = stats.RequestRecord(self.API, method, path, 0, latency, 0, 0, 0,
+                                         stats.get_tag('repo'), stats.get_tag('action'))
+        else:
+            body = response.request.body
+            record = stats.RequestRecord(self.API, method, path, response.status_code, latency,
+                                         len(body) if body else 0, len(response.content), self.get_cost(response),
+                                         stats.get_tag('repo'), stats.get_tag('action'))
+        for item in stats.split(record):
+            for hook in self.hooks:
+                hook(item)
+
+    def update_budget(self, scheduler: Scheduler, response: requests.Response) -> None:
+        scheduler.update(response.headers)
+
+    def get_owners(self, url: str, kwargs: Dict[str, Any]) -> FrozenSet[str]:  # pylint: disable=unused-argument
+        # Owners of repositories a request accesses, so that it is sent with a token allowed to access them.
+        # Requests which refer to nodes by their IDs are attributed to the repository they are sent for.
+        repo = stats.get_tag('repo')
+        return frozenset((repo.split('/')[0].lower(),)) if repo else frozenset()
+
+    def get_cost(self, response: requests.Response) -> int:
+        # Conditional requests answered with 304 Not Modified do not count against the rate limit.
+        return 0 if response.status_code == 304 else 1
+
+    def is_rate_limited(self, response: requests.Response) -> bool:
+        return is_rate_limited(response.status_code, response.headers, response.text)
+
+
+def check_response(response: requests.Response) -> requests.Response:
+    if not 200 <= response.status_code < 300:
+        request = response.request
+        raise get_error(str(request.method), request.path_url, response.status_code, response.reason,
+                        response.content)
+    return response
+
+
+def get_error(method: str, path: str, status: int, reason: str, content: bytes) -> ValueError:
+    try:
+        message = json.loads(content)['message']
+    except (ValueError, KeyError, TypeError):
+        message = reason
+    return ValueError(f'{method} {path} failed: {status} {message}')
+
+
+def get_backoff(scheduler: Scheduler, headers: Mapping[str, str], attempt: int, *, rate_limited: bool,
+                failed: bool) -> Optional[float]:
+    # Returns how many seconds to wait before repeating a request or None if the response is final. The wait for
+    # a rate limit is left to the scheduler so that it blocks other requests as well.
+    if rate_limited:
+        scheduler.back_off(headers, attempt)
+        return 0.0
+    if failed:
+        return float(ERROR_BACKOFF * 2 ** attempt)
+    return None
+
+
+def is_rate_limited(status: int, headers: Mapping[str, str], text: str) -> bool:
+    if status == 429:
+        return True
+    if status == 403:
+        return headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in headers or 'rate limit' in text.lower()
+    return False
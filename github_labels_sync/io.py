@@ -1,15 +1,53 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
+import hashlib
 import os
 from typing import Optional
 
 DEFAULT_CONFIG_PATH = os.path.expanduser('~/.config')
+DEFAULT_CACHE_PATH = os.path.expanduser('~/.cache')
 
 
 def get_config_path(path: Optional[str] = None) -> str:
     return os.path.join(DEFAULT_CONFIG_PATH, path) if path else DEFAULT_CONFIG_PATH
 
 
+def get_cache_path(path: Optional[str] = None) -> str:
+    return os.path.join(DEFAULT_CACHE_PATH, path) if path else DEFAULT_CACHE_PATH
+
+
 DEFAULT_CONFIG_FILES = ['.github/labels.json', '.github_labels.json', 'labels.json']
 DEFAULT_TOKEN_FILES = [get_config_path('github/oauth2_token.txt')]
+DEFAULT_HTTP_CACHE_DIR = get_cache_path('github-labels-sync/http')
+DEFAULT_LABEL_STORE_PATH = get_cache_path('github-labels-sync/labels.sqlite')
+DEFAULT_LABEL_STORE_TTL = 300.0
+
+
+def get_state_path(config_path: str, shard: Optional[str] = None) -> str:
+    # Shards running on the same machine must not overwrite the state or journal of each other.
+    key = get_path_key(config_path, shard)
+    return get_cache_path(f'github-labels-sync/state/{key}.json')
+
+
+def get_journal_path(path: str, shard: Optional[str] = None) -> str:
+    key = get_path_key(path, shard)
+    return get_cache_path(f'github-labels-sync/journal/{key}.jsonl')
+
+
+def get_path_key(path: str, shard: Optional[str] = None) -> str:
+    path = os.path.abspath(path)
+    return hashlib.sha1((f'{path}#{shard}' if shard else path).encode('utf-8')).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_compiled_config_path(config_path: str) -> str:
+    directory, name = os.path.split(config_path)
+    return os.path.join(directory, f'.{name}.compiled')
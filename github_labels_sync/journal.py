@@ -0,0 +1,192 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+from github_labels_sync.actions import Action
+from github_labels_sync.github import Relabeling, ProgressCallback
+
+VERSION = 1
+
+
+class RepoProgress:
+    # Independent actions may run concurrently, so their progress is kept by their indexes.
+    actions: List[Action]
+    done: Set[int]
+    relabelings: Dict[int, Relabeling]
+    relabeled: Dict[int, int]
+    finished: Optional[bool]
+
+    def __init__(self, actions: List[Action]) -> None:
+        self.actions = actions
+        self.done = set()
+        self.relabelings = {}
+        self.relabeled = {}
+        self.finished = None
+
+    def set_done(self, index: int) -> None:
+        self.done.add(index)
+        self.relabelings.pop(index, None)
+        self.relabeled.pop(index, None)
+
+
+class Journal:
+    # An append-only log of a push, so that an interrupted push can continue without repeating finished steps.
+    # Each line records a single step: planned actions of a repository, a finished action, collected items of
+    # a `ReplaceAction`, a finished batch of these items, or a finished repository.
+    path: str
+    key: str
+    repos: Dict[str, RepoProgress]
+    resumed: bool
+    _fh: Optional[TextIO]
+
+    def __init__(self, path: str, key: str, *, resume: bool = False) -> None:
+        self.path = path
+        self.key = key
+        self.repos = {}
+        self.resumed = resume and os.path.isfile(path)
+        self._fh = None
+        self._lock = threading.Lock()
+        if self.resumed:
+            self.load()
+
+    def load(self) -> None:
+        with open(self.path, 'rb') as fh:
+            lines = fh.readlines()
+        size = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError
+                entry = json.loads(line)
+            except ValueError:
+                if number == len(lines):
+                    # The last entry may be incomplete if the push has been killed, so it is cut off.
+                    os.truncate(self.path, size)
+                    break
+                raise ValueError(f'{self.path}:{number}: Invalid journal entry.') from None
+            if number == 1:
+                if entry != {'version': VERSION, 'key': self.key}:
+                    raise ValueError(f'The journal {self.path!r} belongs to a different push and cannot be resumed.')
+            else:
+                self.replay(entry)
+            size += len(line)
+
+    def replay(self, entry: Dict[str, Any]) -> None:
+        repo = entry['repo']
+        if 'actions' in entry:
+            self.repos[repo] = RepoProgress([Action.load(action) for action in entry['actions']])
+            return
+        progress = self.repos[repo]
+        if 'done' in entry:
+            progress.set_done(entry['done'])
+        elif 'relabeling' in entry:
+            progress.relabelings[entry['action']] = Relabeling(**entry['relabeling'])
+        elif 'relabeled' in entry:
+            progress.relabeled[entry['action']] = entry['relabeled']
+        elif 'finished' in entry:
+            progress.finished = entry['finished']
+
+    def is_finished(self, repo: str) -> bool:
+        progress = self.repos.get(repo)
+        return progress is not None and progress.finished is True
+
+    def is_started(self, repo: str) -> bool:
+        # Repositories which have failed are started again from the beginning.
+        progress = self.repos.get(repo)
+        return progress is not None and progress.finished is not False
+
+    def get_finished(self) -> List[str]:
+        return [repo for repo, progress in self.repos.items() if progress.finished is True]
+
+    def get_resumed(self) -> List[Tuple[str, List[Action]]]:
+        return [(repo, progress.actions) for repo, progress in self.repos.items() if progress.finished is None]
+
+    def start(self, repo: str, actions: List[Action]) -> RepoProgress:
+        progress = self.repos.get(repo)
+        if progress is None or progress.finished is not None:
+            progress = self.repos[repo] = RepoProgress(actions)
+            self.write({'repo': repo, 'actions': [action.export() for action in actions]})
+        return progress
+
+    def set_done(self, repo: str, index: int) -> None:
+        self.repos[repo].set_done(index)
+        self.write({'repo': repo, 'done': index})
+
+    def get_checkpoint(self, repo: str, index: int) -> 'RelabelCheckpoint':
+        return RelabelCheckpoint(self, repo, index)
+
+    def set_relabeling(self, repo: str, index: int, relabeling: Relabeling) -> None:
+        self.repos[repo].relabelings[index] = relabeling
+        self.write({'repo': repo, 'action': index, 'relabeling': relabeling._asdict()})
+
+    def set_relabeled(self, repo: str, index: int, relabeled: int) -> None:
+        self.repos[repo].relabeled[index] = relabeled
+        self.write({'repo': repo, 'action': index, 'relabeled': relabeled})
+
+    def set_finished(self, repo: str, ok: bool) -> None:
+        self.repos[repo].finished = ok
+        self.write({'repo': repo, 'finished': ok})
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self._fh:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # The journal is kept open to append entries until it is closed.
+                self._fh = open(self.path, 'at' if self.resumed else 'wt',  # pylint: disable=consider-using-with
+                                encoding='utf-8')
+                if not self.resumed:
+                    self._write({'version': VERSION, 'key': self.key})
+            self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        assert self._fh
+        self._fh.write(json.dumps(entry, separators=(',', ':')))
+        self._fh.write('\n')
+        self._fh.flush()
+
+    def close(self, *, remove: bool = False) -> None:
+        # A journal of a complete push is of no use.
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+        if remove and os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+class RelabelCheckpoint:
+    # Lets a `ReplaceAction` continue relabeling with the batch after the last finished one.
+    journal: Journal
+    repo: str
+    index: int
+
+    def __init__(self, journal: Journal, repo: str, index: int) -> None:
+        self.journal = journal
+        self.repo = repo
+        self.index = index
+
+    @property
+    def relabeling(self) -> Optional[Relabeling]:
+        return self.journal.repos[self.repo].relabelings.get(self.index)
+
+    @property
+    def relabeled(self) -> int:
+        return self.journal.repos[self.repo].relabeled.get(self.index, 0)
+
+    def set_relabeling(self, relabeling: Relabeling) -> None:
+        self.journal.set_relabeling(self.repo, self.index, relabeling)
+
+    def set_relabeled(self, relabeled: int) -> None:
+        self.journal.set_relabeled(self.repo, self.index, relabeled)
+
+    def track(self, progress: Optional[ProgressCallback] = None) -> ProgressCallback:
+        def callback(done: int, total: int) -> None:
+            self.set_relabeled(done)
+            if progress:
+                progress(done, total)
+        return callback
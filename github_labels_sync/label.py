@@ -0,0 +1,44 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import sys
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from github_labels_sync.typing import StrDict
+
+PROPERTIES = 'color', 'description'
+
+LabelKey = Tuple[str, str, str]
+
+
+class Label(NamedTuple):
+    # Labels of thousands of repositories are held in memory during a push. A named tuple has no instance dict,
+    # and names, colors and descriptions are interned because most repositories share the same labels.
+    name: str
+    color: str
+    description: str = ''
+    node_id: Optional[str] = None  # Only for labels from the GraphQL API.
+
+    @classmethod
+    def create(cls, name: str, color: str, description: Optional[str] = None,
+               node_id: Optional[str] = None) -> 'Label':
+        intern = sys.intern
+        return cls(intern(name), intern(color), intern(description or ''), node_id)
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'Label':
+        return cls.create(data['name'], data['color'], data.get('description'), data.get('id'))
+
+    @property
+    def key(self) -> LabelKey:
+        return self.name, self.color, self.description
+
+    def get(self, prop: str) -> str:
+        value: str = getattr(self, prop)
+        return value
+
+    def get_properties(self) -> StrDict:
+        return {'color': self.color, 'description': self.description}
+
+    def export(self) -> StrDict:
+        return {'name': self.name, 'color': self.color, 'description': self.description}
@@ -1,19 +1,22 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import List, Optional, Iterable
+import hashlib
+import json
+from typing import Any, List, Optional, Iterable, Dict, FrozenSet
 
 from github_labels_sync.actions import Action, UpdateAction, ReplaceAction, RenameAction, UnknownLabelAction, \
     CreateAction
+from github_labels_sync.label import Label, LabelKey, PROPERTIES
 from github_labels_sync.typing import StrDict, DictOfStrDicts
 
-PROPERTIES = 'color', 'description'
+LabelSet = FrozenSet[LabelKey]
 
 
-def find_changes(original: StrDict, changed: StrDict, properties: Iterable[str]) -> StrDict:
+def find_changes(original: Label, changed: StrDict, properties: Iterable[str]) -> StrDict:
     changes: StrDict = {}
     for prop in properties:
-        if original[prop] != changed[prop]:
+        if original.get(prop) != changed[prop]:
             changes[prop] = changed[prop]
     return changes
 
@@ -24,6 +27,8 @@ class Labels:
     aliases: StrDict
     modified: bool
     all_labels: DictOfStrDicts
+    plans: Dict[LabelSet, List[Action]]
+    _fingerprint: Optional[str]
 
     def __init__(self,
                  mandatory: Optional[DictOfStrDicts] = None,
@@ -39,30 +44,99 @@ class Labels:
         for label, alias in self.aliases.items():
             if alias not in self.all_labels:
                 raise ValueError(f'Cannot find label {alias!r} specified as an alias for {label!r}.')
+        self.plans = {}
+        self._fingerprint = None
+
+    @classmethod
+    def load_compiled(cls, data: Dict[str, Any]) -> 'Labels':
+        # The data come from `compile` and have been validated already, so the indexes are used as they are.
+        labels = cls.__new__(cls)
+        labels.mandatory = data['mandatory']
+        labels.optional = data['optional']
+        labels.aliases = data['aliases']
+        labels.all_labels = data['all_labels']
+        labels.modified = False
+        labels.plans = {}
+        labels._fingerprint = data['fingerprint']
+        return labels
+
+    def compile(self) -> Dict[str, Any]:
+        # `all_labels` shares the label dicts with `mandatory` and `optional`, which marshal preserves.
+        return {'mandatory': self.mandatory, 'optional': self.optional, 'aliases': self.aliases,
+                'all_labels': self.all_labels, 'fingerprint': self.fingerprint()}
+
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            data = {'mandatory': self.mandatory, 'optional': self.optional, 'aliases': self.aliases}
+            self._fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+        return self._fingerprint
 
     def get_label(self, name: str) -> Optional[StrDict]:
         return self.all_labels.get(name)
 
-    def update(self, labels: List[StrDict]) -> None:
+    def update(self, labels: List[Label]) -> None:
         for label in labels:
-            name = label['name']
+            name = label.name
             if name not in self.aliases:
                 item = self.optional.get(name, self.mandatory.get(name))
                 if item:
                     for prop in PROPERTIES:
-                        if item[prop] != label[prop]:
-                            item[prop] = label[prop]
+                        if item[prop] != label.get(prop):
+                            item[prop] = label.get(prop)
                             self.modified = True
                 else:
-                    self.mandatory[name] = {prop: label[prop] for prop in PROPERTIES}
+                    self.mandatory[name] = self.all_labels[name] = label.get_properties()
                     self.modified = True
+        if self.modified:
+            self.plans.clear()
+            self._fingerprint = None
+
+    def rename(self, old: str, new: str) -> None:
+        # The old name becomes an alias, so that the label is renamed in other repositories too.
+        if old not in self.all_labels:
+            return
+        for labels in self.mandatory, self.optional:
+            if old in labels and new not in labels:
+                labels[new] = labels.pop(old)
+        self.aliases.pop(new, None)
+        for name, alias in self.aliases.items():
+            if alias == old:
+                self.aliases[name] = new
+        if new in self.mandatory or new in self.optional:
+            self.aliases[old] = new
+        self._changed()
+
+    def remove(self, name: str) -> None:
+        if name not in self.all_labels:
+            return
+        self.mandatory.pop(name, None)
+        self.optional.pop(name, None)
+        self.aliases = {label: alias for label, alias in self.aliases.items() if alias != name}
+        self._changed()
+
+    def _changed(self) -> None:
+        self.all_labels = {}
+        self.all_labels.update(self.optional)
+        self.all_labels.update(self.mandatory)
+        self.modified = True
+        self.plans.clear()
+        self._fingerprint = None
+
+    def plan(self, labels: List[Label]) -> List[Action]:
+        # Most repositories share the same label set, so actions are computed only once for each distinct set.
+        # Actions must not be modified because they are shared.
+        key = frozenset(label.key for label in labels)
+        actions = self.plans.get(key)
+        if actions is None:
+            actions = self.plans[key] = self.process(labels)
+        return actions
 
-    def process(self, labels: List[StrDict]) -> List[Action]:
+    def process(self, labels: List[Label]) -> List[Action]:
         mandatory = self.mandatory.copy()
         actions: List[Action] = []
-        labels_map: DictOfStrDicts = {}
+        labels_map: Dict[str, Label] = {}
         for label in labels:
-            labels_map[label['name']] = label
+            labels_map[label.name] = label
 
         for name in tuple(labels_map.keys()):
             label = labels_map[name]
@@ -73,11 +147,10 @@ class Labels:
                 else:
                     alias_label = self.get_label(alias)
                     assert alias_label
-                    alias_label.copy()
                     changes = find_changes(label, alias_label, PROPERTIES)
-                    changes['name'] = alias_label['name'] = alias
+                    changes['name'] = alias
                     actions.append(RenameAction(label, changes))
-                    labels_map[alias] = alias_label
+                    labels_map[alias] = Label.create(alias, alias_label['color'], alias_label['description'])
                 del labels_map[name]
             elif name not in self.all_labels:
                 actions.append(UnknownLabelAction(label))
@@ -93,6 +166,6 @@ class Labels:
             except KeyError:
                 assert name in self.optional
 
-        for name, label in mandatory.items():
-            actions.append(CreateAction(name, label))
+        for name, properties in mandatory.items():
+            actions.append(CreateAction(name, properties))
         return actions
@@ -0,0 +1,50 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import Dict, List, Set
+
+from github_labels_sync.shards import ShardResults, read_results
+
+
+def merge_reports(paths: List[str]) -> int:
+    # The merged push succeeds only if results of all shards are there, for the same config, and all succeeded.
+    results = [read_results(path) for path in paths]
+    errors = check_shards(results)
+    repos: Dict[str, bool] = {}
+    actions = 0
+    for shard_results in results:
+        for result in shard_results.repos:
+            repos[result.repo] = repos.get(result.repo, True) and result.ok
+            actions += result.actions
+    failed = sorted(repo for repo, ok in repos.items() if not ok)
+    for repo in failed:
+        print(repo, '→ Not synchronized.')
+    for error in errors:
+        print('Error:', error)
+    print(f'{len(repos)} repositories in {len(results)} shards: {len(repos) - len(failed)} synchronized, '
+          f'{len(failed)} failed, {actions} actions.')
+    return 0 if not failed and not errors else 1
+
+
+def check_shards(results: List[ShardResults]) -> List[str]:
+    errors = []
+    if len({item.config for item in results}) > 1:
+        errors.append('Shards were pushed with different configs.')
+    shards = [item.shard for item in results if item.shard]
+    if len(shards) < len(results):
+        errors.append('Some results are not of a shard.')
+    totals = {shard.total for shard in shards}
+    if len(totals) > 1:
+        errors.append(f'Shards of different partitionings: {", ".join(str(shard) for shard in shards)}.')
+    elif totals:
+        seen: Set[int] = set()
+        for shard in shards:
+            if shard.number in seen:
+                errors.append(f'Shard {shard} is there more than once.')
+            seen.add(shard.number)
+        missing = sorted(set(range(1, totals.pop() + 1)) - seen)
+        if missing:
+            errors.append(f'Missing results of shards {", ".join(str(number) for number in missing)}.')
+    if len({shard.primary for shard in shards}) > 1:
+        errors.append('Shards disagree on the shard of the primary repository.')
+    return errors
@@ -0,0 +1,124 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import threading
+from concurrent.futures import Future, wait
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from github_labels_sync.label import Label
+from github_labels_sync.typing import StrDict
+
+MUTATION_TYPES = 'create', 'update', 'delete'
+
+
+class LabelMutation(NamedTuple):
+    type: str  # One of MUTATION_TYPES.
+    repo: str
+    name: str
+    properties: Optional[StrDict] = None
+
+
+MutationSender = Callable[[List[LabelMutation]], List[Optional[Exception]]]
+BatchKey = Callable[[LabelMutation], str]
+PendingMutation = Tuple[LabelMutation, 'Future[None]']
+
+
+class NodeIds:
+    # Node IDs of repositories and labels seen when listing labels, so that mutations need no extra lookups.
+    # Label IDs differ in each repository and are forgotten once the repository has been synchronized.
+    repos: Dict[str, str]
+    labels: Dict[Tuple[str, str], str]
+
+    def __init__(self) -> None:
+        self.repos = {}
+        self.labels = {}
+        self._lock = threading.Lock()
+
+    def get_repo(self, repo: str) -> Optional[str]:
+        return self.repos.get(repo.lower())
+
+    def set_repo(self, repo: str, node_id: str) -> None:
+        self.repos[repo.lower()] = node_id
+
+    def get_label(self, repo: str, name: str) -> Optional[str]:
+        return self.labels.get((repo.lower(), name.lower()))
+
+    def set_label(self, repo: str, name: str, node_id: str) -> None:
+        with self._lock:
+            self.labels[(repo.lower(), name.lower())] = node_id
+
+    def set_labels(self, repo: str, labels: Iterable[Label]) -> None:
+        repo = repo.lower()
+        with self._lock:
+            for label in labels:
+                if label.node_id:
+                    self.labels[(repo, label.name.lower())] = label.node_id
+
+    def remove_label(self, repo: str, name: str) -> None:
+        with self._lock:
+            self.labels.pop((repo.lower(), name.lower()), None)
+
+    def forget(self, repo: str) -> None:
+        repo = repo.lower()
+        with self._lock:
+            for key in [key for key in self.labels if key[0] == repo]:
+                del self.labels[key]
+
+
+class MutationBatcher:
+    # Groups label mutations of all threads into requests of up to `batch_size` mutations. Full batches are sent
+    # right away, the rest waits up to `linger` seconds for mutations of other repositories to join them. Only
+    # mutations with the same `key`, e.g. the owner of their repository, are sent in the same request.
+    send: MutationSender
+    batch_size: int
+    linger: float
+    key: Optional[BatchKey]
+
+    def __init__(self, send: MutationSender, batch_size: int, linger: float = 0.0,
+                 key: Optional[BatchKey] = None) -> None:
+        self.send = send
+        self.batch_size = batch_size
+        self.linger = linger
+        self.key = key
+        self._pending: Dict[str, List[PendingMutation]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, mutations: List[LabelMutation]) -> List[Optional[BaseException]]:
+        futures: List['Future[None]'] = [Future() for _mutation in mutations]
+        with self._lock:
+            for mutation, future in zip(mutations, futures):
+                self._pending.setdefault(self.key(mutation) if self.key else '', []).append((mutation, future))
+            batches = self._take(full_only=True)
+        for batch in batches:
+            self._send(batch)
+        if self.linger and not all(future.done() for future in futures):
+            wait(futures, timeout=self.linger)
+        if not all(future.done() for future in futures):
+            with self._lock:
+                batches = self._take(full_only=False)
+            for batch in batches:
+                self._send(batch)
+        return [future.exception() for future in futures]
+
+    def _take(self, full_only: bool) -> List[List[PendingMutation]]:
+        batches = []
+        for key, pending in list(self._pending.items()):
+            while len(pending) >= (self.batch_size if full_only else 1):
+                batches.append(pending[:self.batch_size])
+                del pending[:self.batch_size]
+            if not pending:
+                del self._pending[key]
+        return batches
+
+    def _send(self, batch: List[PendingMutation]) -> None:
+        try:
+            errors = self.send([mutation for mutation, _future in batch])
+        except Exception as e:  # pylint: disable=broad-except
+            for _mutation, future in batch:
+                future.set_exception(e)
+        else:
+            for (_mutation, future), error in zip(batch, errors):
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
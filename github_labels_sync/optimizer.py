@@ -0,0 +1,23 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import Dict, List
+
+from github_labels_sync.actions import Action
+
+
+def get_stages(actions: List[Action]) -> List[List[int]]:
+    # Actions are put into the first stage after all preceding actions with any of their labels, e.g. a label is
+    # created only after a label of the same name has been renamed or replaced. Actions of a stage are independent
+    # of each other and can run concurrently. Stages hold indexes of actions.
+    stages: List[List[int]] = []
+    next_stage: Dict[str, int] = {}
+    for index, action in enumerate(actions):
+        names = [name.lower() for name in action.get_names()]
+        stage = max(next_stage.get(name, 0) for name in names)
+        if stage == len(stages):
+            stages.append([])
+        stages[stage].append(index)
+        for name in names:
+            next_stage[name] = stage + 1
+    return stages
@@ -0,0 +1,62 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')  # pylint: disable=invalid-name
+R = TypeVar('R')  # pylint: disable=invalid-name
+
+
+def get_owner(repo: str) -> str:
+    return repo.split('/')[0]
+
+
+class RepoPool(Generic[T, R]):
+    # Runs jobs of repositories in threads with at most `jobs_per_owner` jobs of an owner at a time. Repositories
+    # which have to wait for their owner are kept aside, up to `jobs` of them, while the source is read lazily.
+    jobs: int
+    jobs_per_owner: Optional[int]
+
+    def __init__(self, jobs: int, jobs_per_owner: Optional[int] = None) -> None:
+        self.jobs = jobs
+        self.jobs_per_owner = jobs_per_owner
+        self._pending: List[Tuple[str, T]] = []
+        self._active: Dict[str, int] = defaultdict(int)
+
+    def map(self, job: Callable[[str, T], R], items: Iterable[Tuple[str, T]]) -> Iterator[R]:
+        source = iter(items)
+        running: Dict['Future[R]', str] = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while True:
+                while len(running) < self.jobs:
+                    item = self._pop_runnable(source)
+                    if not item:
+                        break
+                    repo, data = item
+                    self._active[get_owner(repo)] += 1
+                    running[executor.submit(job, repo, data)] = repo
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._active[get_owner(running.pop(future))] -= 1
+                    yield future.result()
+
+    def _is_runnable(self, repo: str) -> bool:
+        return not self.jobs_per_owner or self._active[get_owner(repo)] < self.jobs_per_owner
+
+    def _pop_runnable(self, source: Iterator[Tuple[str, T]]) -> Optional[Tuple[str, T]]:
+        for i, (repo, _data) in enumerate(self._pending):
+            if self._is_runnable(repo):
+                return self._pending.pop(i)
+        while len(self._pending) < self.jobs:
+            item = next(source, None)
+            if item is None:
+                break
+            if self._is_runnable(item[0]):
+                return item
+            self._pending.append(item)
+        return None
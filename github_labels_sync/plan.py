@@ -0,0 +1,23 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from typing import List, TextIO, Iterator, Tuple
+
+from github_labels_sync.actions import Action
+
+
+def write_plan(fh: TextIO, repo: str, actions: List[Action]) -> None:
+    fh.write(json.dumps({'repo': repo, 'actions': [action.export() for action in actions]}, separators=(',', ':')))
+    fh.write('\n')
+
+
+def read_plan(fh: TextIO) -> Iterator[Tuple[str, List[Action]]]:
+    for number, line in enumerate(fh, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            yield data['repo'], [Action.load(action) for action in data['actions']]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f'{fh.name}:{number}: Invalid plan entry: {e}') from e
@@ -3,13 +3,18 @@
 
 from github_labels_sync.config import Config
 from github_labels_sync.github import GitHub
+from github_labels_sync.label import Label
 
 
-def pull(github: GitHub, config: Config) -> int:
-    owner, repo = config.primary_repo.split('/')
-    labels = github.list_labels(config.primary_repo)
+def pull(github: GitHub, config: Config, *, verbose: bool = False) -> int:
+    if verbose:
+        details = github.list_label_details(config.primary_repo)
+        labels = [Label.load(label) for label in details]
+    else:
+        labels = github.list_labels(config.primary_repo)
+        details = [label.export() for label in labels]
     config.labels.update(labels)
     config.save(force=True)
-    for label in labels:
-        print(github.get_label(owner, repo, label['name']))
+    for label in details:
+        print(label)
     return 0
@@ -1,27 +1,205 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple, Any, Iterator, Iterable, NamedTuple, TextIO, TypeVar
+
+import requests
+
+from github_labels_sync import shards, stats
 from github_labels_sync.config import Config
 from github_labels_sync.github import GitHub
-from github_labels_sync.actions import UnknownLabelAction
-
-
-def push(github: GitHub, config: Config) -> int:
-    all_ok: bool = True
-    for repo in config.all_repos:
-        labels = github.list_labels(repo)
-        actions = config.labels.process(labels)
-        proceed: bool = True
-        for action in actions:
-            if isinstance(action, UnknownLabelAction):
-                print(repo, 'Error:', action)
-                proceed = False
-        if not proceed:
-            print(repo, '→ Aborting because of errors.')
-            all_ok = False
-            break
-
-        for action in actions:
-            print(repo, action)
-            action.run(github, repo)
-    return 0 if all_ok else 1
+from github_labels_sync.journal import Journal
+from github_labels_sync.actions import Action, UnknownLabelAction, ReplaceAction
+from github_labels_sync.optimizer import get_stages
+from github_labels_sync.parallel import RepoPool
+from github_labels_sync.plan import write_plan
+from github_labels_sync.shards import Shard, ShardResults, write_results
+from github_labels_sync.state import PushState
+from github_labels_sync.targets import iter_targets
+
+T = TypeVar('T')  # pylint: disable=invalid-name
+Log = Callable[..., None]
+
+
+class RepoResult(NamedTuple):
+    repo: str
+    ok: bool
+    actions: List[Action]
+
+
+class PushOptions(NamedTuple):
+    jobs: int = 1
+    jobs_per_owner: Optional[int] = None
+    jobs_per_repo: int = 1
+    dry_run: bool = False
+    plan_out: Optional[TextIO] = None
+    state: Optional[PushState] = None
+    journal: Optional[Journal] = None
+    shard: Optional[Shard] = None
+    results_out: Optional[TextIO] = None
+
+
+RepoJob = Callable[[str, T, Log], RepoResult]
+JobResult = Tuple[RepoResult, List[Tuple[Any, ...]]]
+
+
+def push(github: GitHub, config: Config, options: PushOptions = PushOptions()) -> int:
+    dry_run = options.dry_run or bool(options.plan_out)
+    options = options._replace(dry_run=dry_run, journal=options.journal if not dry_run else None)
+
+    def job(repo: str, actions: List[Action], log: Log) -> RepoResult:
+        return apply_actions(github, repo, actions, log, options)
+
+    repos: Iterable[str] = iter_targets(github, config.all_repos, config.targets)
+    shard = options.shard
+    if shard:
+        # Repositories are partitioned before anything is listed, so each shard sends only its own requests.
+        repos = (repo for repo in repos if shard.contains(repo, config.primary_repo))
+    finished: List[str] = []
+    resumed: List[Tuple[str, List[Action]]] = []
+    if options.journal:
+        finished, resumed = options.journal.get_finished(), options.journal.get_resumed()
+        if finished:
+            print(f'Skipping {len(finished)} repositories finished by the interrupted push.')
+        # Repositories of an interrupted push are neither listed nor planned again.
+        repos = (repo for repo in repos if not options.journal.is_started(repo))
+    if options.state:
+        repos = select_changed_repos(github, config, options.state, repos)
+    planned = ((repo, config.labels.plan(labels)) for repo, labels in github.iter_labels_bulk(repos))
+    results = []
+    for result in run_jobs(job, itertools.chain(resumed, planned), options):
+        if options.plan_out:
+            write_plan(options.plan_out, result.repo, result.actions)
+        results.append(result)
+    ok = all(result.ok for result in results)
+    if options.state and not dry_run:
+        record_state(github, config, options.state, finished + [result.repo for result in results if result.ok])
+    if options.journal:
+        options.journal.close(remove=ok)
+    if options.results_out:
+        repo_results = [shards.RepoSummary(repo, True, 0) for repo in finished]
+        repo_results.extend(shards.RepoSummary(result.repo, result.ok, len(result.actions)) for result in results)
+        write_results(options.results_out, ShardResults(shard, config.labels.fingerprint(), repo_results))
+    return 0 if ok else 1
+
+
+def run_jobs(job: RepoJob[T], items: Iterable[Tuple[str, T]], options: PushOptions) -> Iterator[RepoResult]:
+    if options.jobs > 1:
+        yield from run_jobs_parallel(job, items, options.jobs, options.jobs_per_owner)
+    else:
+        for repo, data in items:
+            result = job(repo, data, print)
+            yield result
+            if not result.ok:
+                break
+
+
+def run_jobs_parallel(job: RepoJob[T], items: Iterable[Tuple[str, T]], jobs: int,
+                      jobs_per_owner: Optional[int] = None) -> Iterator[RepoResult]:
+    def buffered_job(repo: str, data: T) -> JobResult:
+        lines: List[Tuple[Any, ...]] = []
+        return job(repo, data, lambda *args: lines.append(args)), lines
+
+    pool: RepoPool[T, JobResult] = RepoPool(jobs, jobs_per_owner)
+    for result, lines in pool.map(buffered_job, items):
+        for line in lines:
+            print(*line)
+        yield result
+
+
+def apply_actions(github: GitHub, repo: str, actions: List[Action], log: Log,
+                  options: PushOptions = PushOptions()) -> RepoResult:
+    journal = options.journal
+    done = journal.start(repo, actions).done if journal else set()
+    ok: bool = True
+    for action in actions:
+        if isinstance(action, UnknownLabelAction):
+            log(repo, 'Error:', action)
+            ok = False
+    if ok:
+        if done:
+            log(repo, f'→ Resuming after {len(done)} finished actions.')
+        stages = [[(index, actions[index]) for index in stage if index not in done] for stage in get_stages(actions)]
+        try:
+            run_stages(github, repo, stages, log, options)
+        except (ValueError, requests.RequestException) as e:
+            # Actions finished so far are in the journal, but the repository is not recorded as synchronized.
+            log(repo, 'Error:', e)
+            ok = False
+    if not ok:
+        log(repo, '→ Aborting because of errors.')
+    if journal:
+        journal.set_finished(repo, ok)
+    github.forget_node_ids(repo)
+    return RepoResult(repo, ok, actions)
+
+
+def run_stages(github: GitHub, repo: str, stages: List[List[Tuple[int, Action]]], log: Log,
+               options: PushOptions) -> None:
+    journal = options.journal
+
+    def run_action(index: int, action: Action) -> None:
+        log(repo, action)
+        if options.dry_run:
+            return
+        with stats.tagged(repo=repo, action=action.TYPE):
+            if isinstance(action, ReplaceAction):
+                action.run(github, repo, progress=lambda count, total: log(repo, f'  {count}/{total} items relabeled'),
+                           checkpoint=journal.get_checkpoint(repo, index) if journal else None)
+            else:
+                action.run(github, repo)
+        if journal:
+            journal.set_done(repo, index)
+
+    for pending in stages:
+        if github.batcher and pending and not options.dry_run:
+            run_batched(github, repo, pending, log, journal)
+        elif options.jobs_per_repo > 1 and len(pending) > 1 and not options.dry_run:
+            with ThreadPoolExecutor(max_workers=min(options.jobs_per_repo, len(pending))) as executor:
+                for _result in executor.map(lambda item: run_action(*item), pending):
+                    pass  # Re-raises the first error after the other actions of the stage have finished.
+        else:
+            for index, action in pending:
+                run_action(index, action)
+
+
+def run_batched(github: GitHub, repo: str, stage: List[Tuple[int, Action]], log: Log,
+                journal: Optional[Journal]) -> None:
+    # Actions of a stage are independent, so their label mutations are sent together, possibly in the same requests
+    # as those of other repositories. Issues are moved away from replaced labels before that.
+    for index, action in stage:
+        log(repo, action)
+        with stats.tagged(repo=repo, action=action.TYPE):
+            action.prepare(github, repo, progress=lambda count, total: log(repo, f'  {count}/{total} items relabeled'),
+                           checkpoint=journal.get_checkpoint(repo, index) if journal else None)
+    with stats.tagged(repo=repo, action='batch'):
+        errors = github.mutate_labels([action.get_mutation(repo) for _index, action in stage])
+    if journal:
+        for (index, _action), error in zip(stage, errors):
+            if not error:
+                journal.set_done(repo, index)
+    for error in errors:
+        if error:
+            raise error  # Only after the other actions of the stage have been recorded as done.
+
+
+def select_changed_repos(github: GitHub, config: Config, state: PushState, repos: Iterable[str]) -> Iterator[str]:
+    fingerprint = config.labels.fingerprint()
+    skipped = 0
+    for repo, marker in github.iter_repo_markers(repos):
+        if state.is_unchanged(repo, fingerprint, marker):
+            skipped += 1
+        else:
+            yield repo
+    if skipped:
+        print(f'Skipped {skipped} repositories unchanged since the last push.')
+
+
+def record_state(github: GitHub, config: Config, state: PushState, repos: List[str]) -> None:
+    # Actions change the marker of a repository, so it must be fetched again after they are applied.
+    fingerprint = config.labels.fingerprint()
+    for repo, marker in github.iter_repo_markers(repos):
+        state.set(repo, fingerprint, marker)
+    state.save()
@@ -0,0 +1,209 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# GitHub does not return more than 100 nodes of a connection per request.
+PAGE_SIZE = 100
+# Queries ask for their cost and the budget left, so that requests are scheduled with their real costs. Mutations
+# cannot ask for it, their budget is known only from headers.
+RATE_LIMIT_FIELDS = 'rateLimit { cost limit remaining resetAt }'
+LABEL_FIELDS = '''
+    id
+    name
+    color
+    description
+'''
+LABEL_DETAIL_FIELDS = LABEL_FIELDS + '''
+    url
+    isDefault
+    createdAt
+    updatedAt
+    issues { totalCount }
+    pullRequests { totalCount }
+'''
+LABELS_QUERY = '''
+    query ($owner: String!, $repo: String!, $first: Int!, $after: String) {
+      repository(owner: $owner, name: $repo) {
+        labels(first: $first, after: $after) {
+          nodes { %s }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+      rateLimit { cost limit remaining resetAt }
+    }
+'''
+BULK_LABELS_FIELDS = f'''
+    id
+    labels(first: {PAGE_SIZE}) {{
+      nodes {{ {LABEL_FIELDS} }}
+      pageInfo {{ hasNextPage endCursor }}
+    }}
+'''
+MARKER_FIELDS = f'''
+    updatedAt
+    labels(first: {PAGE_SIZE}) {{
+      totalCount
+      nodes {{ name color description }}
+      pageInfo {{ hasNextPage endCursor }}
+    }}
+'''
+ISSUES_WITH_LABEL_QUERY = '''
+    query ($owner: String!, $repo: String!, $label: String!, $first: Int!, $after: String) {
+      repository(owner: $owner, name: $repo) {
+        issues(labels: [$label], first: $first, after: $after) {
+          nodes {
+            number
+          }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+      rateLimit { cost limit remaining resetAt }
+    }
+'''
+LABELABLES_QUERY = '''
+    query ($owner: String!, $repo: String!, $label: String!, $first: Int!, $after: String) {
+      repository(owner: $owner, name: $repo) {
+        label(name: $label) {
+          %s(first: $first, after: $after) {
+            nodes {
+              id
+            }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+      }
+      rateLimit { cost limit remaining resetAt }
+    }
+'''
+OWNER_REPOSITORIES_QUERY = '''
+    query ($owner: String!, $isFork: Boolean, $first: Int!, $after: String) {
+      repositoryOwner(login: $owner) {
+        repositories(isFork: $isFork, first: $first, after: $after, orderBy: {field: NAME, direction: ASC}) {
+          nodes {
+            nameWithOwner
+            isArchived
+            isFork
+            repositoryTopics(first: 20) { nodes { topic { name } } }
+          }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+      rateLimit { cost limit remaining resetAt }
+    }
+'''
+LABELABLE_CONNECTIONS = 'issues', 'pullRequests'
+# The mutation, its input type and selection for each type of label mutation.
+LABEL_MUTATIONS = {
+    'create': ('createLabel', 'CreateLabelInput', 'label { id }'),
+    'update': ('updateLabel', 'UpdateLabelInput', 'label { id }'),
+    'delete': ('deleteLabel', 'DeleteLabelInput', 'clientMutationId'),
+}
+
+Query = Tuple[str, Dict[str, Any]]
+
+
+def repositories_query(repos: List[str], fields: str) -> Query:
+    params = []
+    selections = []
+    variables = {}
+    for i, repo in enumerate(repos):
+        variables[f'owner{i}'], variables[f'name{i}'] = repo.split('/')
+        params.append(f'$owner{i}: String!, $name{i}: String!')
+        selections.append(f'repo{i}: repository(owner: $owner{i}, name: $name{i}) {{ {fields} }}')
+    return f'query ({", ".join(params)}) {{ {" ".join(selections)} {RATE_LIMIT_FIELDS} }}', variables
+
+
+def parse_repositories(repos: List[str], data: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    result = []
+    for i, repo in enumerate(repos):
+        repository = data.get(f'repo{i}')
+        if not repository:
+            raise ValueError(f'Cannot find repository {repo!r}.')
+        result.append((repo, repository))
+    return result
+
+
+def get_marker(repository: Dict[str, Any], labels: Iterable[Dict[str, Any]]) -> str:
+    # A change marker of repository labels: their number, the last update of the repository and a digest of names,
+    # colors and descriptions of the labels, because editing a label changes neither of the former reliably.
+    digest = hashlib.sha256(json.dumps(sorted((label['name'], label['color'], label['description'] or '')
+                                              for label in labels)).encode('utf-8')).hexdigest()
+    return f'{repository["labels"]["totalCount"]}:{repository["updatedAt"]}:{digest}'
+
+
+def label_ids_query(repo: str, names: List[str]) -> Query:
+    params = ['$owner: String!', '$repo: String!']
+    fields = []
+    variables = dict(zip(('owner', 'repo'), repo.split('/')))
+    for i, name in enumerate(names):
+        variables[f'label{i}'] = name
+        params.append(f'$label{i}: String!')
+        fields.append(f'label{i}: label(name: $label{i}) {{ id }}')
+    return f'''
+        query ({", ".join(params)}) {{
+          repository(owner: $owner, name: $repo) {{
+            {" ".join(fields)}
+          }}
+          {RATE_LIMIT_FIELDS}
+        }}''', variables
+
+
+def parse_label_ids(repo: str, names: List[str], data: Dict[str, Any]) -> List[Optional[str]]:
+    repository = data.get('repository')
+    if not repository:
+        raise ValueError(f'Cannot find repository {repo!r}.')
+    return [(repository[f'label{i}'] or {}).get('id') for i in range(len(names))]
+
+
+def relabel_mutation(labelables: List[str], old_id: str, new_id: str) -> Query:
+    params = ['$old: ID!', '$new: ID!']
+    fields = []
+    variables = {'old': old_id, 'new': new_id}
+    for i, labelable in enumerate(labelables):
+        variables[f'item{i}'] = labelable
+        params.append(f'$item{i}: ID!')
+        fields.append(f'''
+          add{i}: addLabelsToLabelable(input: {{labelableId: $item{i}, labelIds: [$new]}}) {{ clientMutationId }}
+          remove{i}: removeLabelsFromLabelable(input: {{labelableId: $item{i}, labelIds: [$old]}}) {{
+            clientMutationId
+          }}''')
+    return f'mutation ({", ".join(params)}) {{ {"".join(fields)} }}', variables
+
+
+def label_mutations(mutations: List[Tuple[str, Dict[str, Any]]]) -> Query:
+    params = []
+    fields = []
+    variables = {}
+    for i, (mutation_type, mutation_input) in enumerate(mutations):
+        name, input_type, selection = LABEL_MUTATIONS[mutation_type]
+        variables[f'input{i}'] = mutation_input
+        params.append(f'$input{i}: {input_type}!')
+        fields.append(f'mutation{i}: {name}(input: $input{i}) {{ {selection} }}')
+    return f'mutation ({", ".join(params)}) {{ {" ".join(fields)} }}', variables
+
+
+def parse_label_mutations(count: int, result: Dict[str, Any]) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    # The data and error message of each mutation. An error without a path fails all of them.
+    data = result.get('data') or {}
+    errors: Dict[Optional[str], List[str]] = {}
+    for error in result.get('errors') or []:
+        path = error.get('path') or [None]
+        errors.setdefault(path[0], []).append(str(error.get('message')))
+    parsed = []
+    for i in range(count):
+        messages = errors.get(f'mutation{i}', []) + errors.get(None, [])
+        parsed.append((data.get(f'mutation{i}'), '; '.join(messages) if messages else None))
+    return parsed
+
+
+def get_connection(data: Dict[str, Any], path: Iterable[str], variables: Dict[str, Any]) -> Dict[str, Any]:
+    connection: Any = data
+    for key in path:
+        connection = connection[key]
+        if connection is None:
+            raise ValueError(f'Cannot find {key} {variables!r}.')
+    assert isinstance(connection, dict)
+    return connection
@@ -0,0 +1,78 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import csv
+import json
+from typing import Callable, List, NamedTuple, Optional, TextIO
+
+from github_labels_sync.actions import Action, CreateAction, RenameAction, ReplaceAction, UnknownLabelAction, \
+    UpdateAction
+from github_labels_sync.config import Config
+from github_labels_sync.github import GitHub
+from github_labels_sync.label import PROPERTIES
+from github_labels_sync.targets import iter_targets
+
+REPORT_FORMATS = 'jsonl', 'csv'
+REPORT_FIELDS = 'repo', 'label', 'drift', 'expected', 'actual'
+
+
+class Drift(NamedTuple):
+    label: str
+    drift: str  # One of missing, extra, alias, color and description.
+    expected: Optional[str] = None
+    actual: Optional[str] = None
+
+
+ReportWriter = Callable[[str, Drift], None]
+
+
+def report(github: GitHub, config: Config, fh: TextIO, report_format: str = 'jsonl') -> int:
+    # Only labels which differ from the config are written, so the matrix stays small for thousands of repositories.
+    write = get_writer(fh, report_format)
+    repos = drifted = 0
+    targets = iter_targets(github, config.all_repos, config.targets)
+    for repo, labels in github.iter_labels_bulk(targets, cached=True):
+        repos += 1
+        drift = get_drift(config.labels.plan(labels))
+        if drift:
+            drifted += 1
+        for item in drift:
+            write(repo, item)
+    print(f'{drifted} of {repos} repositories have drifted from the config.')
+    return 0
+
+
+def get_drift(actions: List[Action]) -> List[Drift]:
+    drift = []
+    for action in actions:
+        if isinstance(action, CreateAction):
+            drift.append(Drift(action.name, 'missing'))
+        elif isinstance(action, UnknownLabelAction):
+            drift.append(Drift(action.label.name, 'extra'))
+        elif isinstance(action, ReplaceAction):
+            drift.append(Drift(action.label.name, 'alias', action.replacement.name, action.label.name))
+        elif isinstance(action, UpdateAction):
+            if isinstance(action, RenameAction):
+                drift.append(Drift(action.label.name, 'alias', action.updates['name'], action.label.name))
+            for prop in PROPERTIES:
+                if prop in action.updates:
+                    drift.append(Drift(action.label.name, prop, action.updates[prop], action.label.get(prop)))
+    return drift
+
+
+def get_writer(fh: TextIO, report_format: str) -> ReportWriter:
+    if report_format == 'csv':
+        writer = csv.writer(fh)
+        writer.writerow(REPORT_FIELDS)
+
+        def write_csv(repo: str, drift: Drift) -> None:
+            writer.writerow((repo, *drift))
+        return write_csv
+
+    if report_format == 'jsonl':
+        def write_jsonl(repo: str, drift: Drift) -> None:
+            fh.write(json.dumps({'repo': repo, **drift._asdict()}, separators=(',', ':')))
+            fh.write('\n')
+        return write_jsonl
+
+    raise ValueError(f'Unknown report format: {report_format!r}.')
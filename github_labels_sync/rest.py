@@ -2,37 +2,87 @@
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
 import json
-from typing import Union
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+
+import requests
 
 from github_labels_sync import http
+from github_labels_sync.cache import ResponseCache, CachedResponse
+from github_labels_sync.typing import StrDict
 
 
 class Client(http.Client):
+    API = 'rest'
+    cache: Optional[ResponseCache]
+
+    def __init__(self, endpoint: str, session: Optional[requests.Session] = None,
+                 scheduler: Optional[http.Scheduler] = None, cache: Optional[ResponseCache] = None) -> None:
+        super().__init__(endpoint, session, scheduler)
+        self.cache = cache
+
     def set_token(self, token: Union[bytes, str]) -> None:
         self.headers['Authorization'] = f'bearer {token if isinstance(token, str) else token.decode("ascii")}'
 
     def unset_token(self) -> None:
         del self.headers['Authorization']
 
+    def get_owners(self, url: str, kwargs: Dict[str, Any]) -> FrozenSet[str]:
+        path = url[len(self.endpoint):].split('/')
+        if len(path) > 2 and path[1] == 'repos':
+            return frozenset((path[2].lower(),))
+        return super().get_owners(url, kwargs)
+
     def call(self, method: str) -> Union[dict, list]:
-        response = self.session.get(f'{self.endpoint}{method}', headers=self.headers)
-        data = response.json()
+        url = f'{self.endpoint}{method}'
+        if self.cache:
+            data = self.call_cached(url, self.cache)
+        else:
+            data = http.check_response(self.send('GET', url)).json()
         assert isinstance(data, (dict, list))
         return data
 
-    def post(self, method: str, data: Union[dict, list]) -> Union[dict, list]:
-        response = self.session.post(f'{self.endpoint}{method}', headers=self.headers, data=json.dumps(data).encode())
+    def call_cached(self, url: str, cache: ResponseCache) -> Union[dict, list]:
+        # Responses are cached for each token, as tokens may see different data. With a pool of tokens, the token is
+        # known only once it is selected for an attempt.
+        entries: List[Tuple[str, Optional[CachedResponse]]] = []
+
+        def get_conditional_headers(headers: StrDict) -> StrDict:
+            key = cache.make_key(url, headers.get('Authorization', ''), headers.get('Accept', ''))
+            cached = cache.get(key)
+            entries.append((key, cached))
+            conditional = {}
+            if cached and cached.etag:
+                conditional['If-None-Match'] = cached.etag
+            if cached and cached.last_modified:
+                conditional['If-Modified-Since'] = cached.last_modified
+            return conditional
+
+        response = self.send('GET', url, extra_headers=get_conditional_headers)
+        key, cached = entries[-1]
+        if cached and response.status_code == 304:
+            data: Union[dict, list] = json.loads(cached.body)
+            return data
+        http.check_response(response)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or last_modified):
+            cache.put(key, CachedResponse(etag, last_modified, response.text))
         data = response.json()
+        return data
+
+    def post(self, method: str, data: Union[dict, list]) -> Union[dict, list]:
+        response = self.send('POST', f'{self.endpoint}{method}', data=json.dumps(data).encode())
+        data = http.check_response(response).json()
         assert isinstance(data, (dict, list))
         return data
 
     def patch(self, method: str, data: Union[dict, list]) -> Union[dict, list]:
-        response = self.session.patch(f'{self.endpoint}{method}', headers=self.headers, data=json.dumps(data).encode())
-        data = response.json()
+        response = self.send('PATCH', f'{self.endpoint}{method}', data=json.dumps(data).encode())
+        data = http.check_response(response).json()
         assert isinstance(data, (dict, list))
         return data
 
     def delete(self, method: str) -> None:
-        self.session.delete(f'{self.endpoint}{method}', headers=self.headers)
+        http.check_response(self.send('DELETE', f'{self.endpoint}{method}'))
 
     __call__ = call
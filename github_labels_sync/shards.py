@@ -0,0 +1,83 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import hashlib
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, TextIO
+
+VERSION = 1
+
+
+class Shard(NamedTuple):
+    number: int  # From 1 to total, like CI_NODE_INDEX of GitLab CI.
+    total: int
+    primary: Optional[int] = None  # The shard which handles the primary repository regardless of its hash.
+
+    @classmethod
+    def parse(cls, value: str, primary: Optional[int] = None) -> 'Shard':
+        number, _, total = value.partition('/')
+        try:
+            shard = cls(int(number), int(total), primary)
+        except ValueError:
+            raise ValueError(f'Shard I/N expected, not {value!r}.') from None
+        if not 1 <= shard.number <= shard.total:
+            raise ValueError(f'Shard number must be from 1 to {shard.total}, not {shard.number}.')
+        if primary is not None and not 1 <= primary <= shard.total:
+            raise ValueError(f'Shard of the primary repository must be from 1 to {shard.total}, not {primary}.')
+        return shard
+
+    def __str__(self) -> str:
+        return f'{self.number}/{self.total}'
+
+    def get_number(self, repo: str, primary_repo: Optional[str] = None) -> int:
+        # A stable hash, unlike hash(), so that all shards agree on the partitioning without talking to each other.
+        if self.primary is not None and primary_repo and repo.lower() == primary_repo.lower():
+            return self.primary
+        digest = hashlib.sha1(repo.lower().encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % self.total + 1
+
+    def contains(self, repo: str, primary_repo: Optional[str] = None) -> bool:
+        return self.get_number(repo, primary_repo) == self.number
+
+
+class RepoSummary(NamedTuple):
+    repo: str
+    ok: bool
+    actions: int
+
+
+class ShardResults(NamedTuple):
+    shard: Optional[Shard]
+    config: str  # The fingerprint of labels, so that results of different configs are not merged.
+    repos: List[RepoSummary]
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.repos)
+
+    def export(self) -> Dict[str, Any]:
+        return {
+            'version': VERSION,
+            'shard': str(self.shard) if self.shard else None,
+            'primary_shard': self.shard.primary if self.shard else None,
+            'config': self.config,
+            'ok': self.ok,
+            'repos': [result._asdict() for result in self.repos],
+        }
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'ShardResults':
+        if data.get('version') != VERSION:
+            raise ValueError(f'Unsupported version of shard results: {data.get("version")!r}.')
+        shard = Shard.parse(data['shard'], data.get('primary_shard')) if data['shard'] else None
+        return cls(shard, data['config'], [RepoSummary(**item) for item in data['repos']])
+
+
+def write_results(fh: TextIO, results: ShardResults) -> None:
+    json.dump(results.export(), fh, indent=2)
+    fh.write('\n')
+
+
+def read_results(path: str) -> ShardResults:
+    with open(path, encoding='utf-8') as fh:
+        return ShardResults.load(json.load(fh))
@@ -0,0 +1,44 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+from typing import Dict
+
+VERSION = 1
+
+
+class PushState:
+    path: str
+    repos: Dict[str, Dict[str, str]]
+    modified: bool
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.repos = {}
+        self.modified = False
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as fh:
+                data = json.load(fh)
+            if data.get('version') == VERSION:
+                self.repos = data['repos']
+
+    def is_unchanged(self, repo: str, config: str, marker: str) -> bool:
+        return self.repos.get(repo) == {'config': config, 'marker': marker}
+
+    def set(self, repo: str, config: str, marker: str) -> None:
+        self.repos[repo] = {'config': config, 'marker': marker}
+        self.modified = True
+
+    def save(self) -> bool:
+        if not self.modified:
+            return False
+        tmp_path = self.path + '~'
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, 'wt', encoding='utf-8') as fh:
+            json.dump({'version': VERSION, 'repos': self.repos}, fh, indent=2, sort_keys=True)
+        os.rename(tmp_path, self.path)
+        self.modified = False
+        return True
@@ -0,0 +1,181 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import contextlib
+import json
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+METRICS_PREFIX = 'github_labels_sync'
+SLOWEST_REPOS = 10
+NO_TAG = '-'
+
+TAGS: ContextVar[Dict[str, str]] = ContextVar('tags', default={})
+SHARES: ContextVar[Optional[Dict[str, float]]] = ContextVar('shares', default=None)
+
+
+class RequestRecord(NamedTuple):
+    api: str
+    method: str
+    path: str
+    status: int  # Zero if the request has failed without a response.
+    latency: float
+    sent: int
+    received: int
+    cost: int  # Points of the primary rate limit.
+    repo: Optional[str]
+    action: Optional[str]
+    share: float = 1.0  # The part of a request shared by several repositories which is attributed to `repo`.
+
+
+RequestHook = Callable[[RequestRecord], None]
+
+
+@contextlib.contextmanager
+def tagged(**tags: str) -> Iterator[None]:
+    # Tags requests sent by the current thread or task within the block, e.g. with a repository and an action type.
+    token = TAGS.set(dict(TAGS.get(), **tags))
+    try:
+        yield
+    finally:
+        TAGS.reset(token)
+
+
+def get_tag(name: str) -> Optional[str]:
+    return TAGS.get().get(name)
+
+
+@contextlib.contextmanager
+def shared(shares: Dict[str, float]) -> Iterator[None]:
+    # Splits requests sent within the block among repositories, e.g. a batch of mutations of several repositories.
+    token = SHARES.set(shares)
+    try:
+        yield
+    finally:
+        SHARES.reset(token)
+
+
+def split(record: RequestRecord) -> List[RequestRecord]:
+    shares = SHARES.get()
+    if not shares:
+        return [record]
+    return [record._replace(repo=repo, share=share) for repo, share in shares.items()]
+
+
+class Totals:
+    # Requests shared by several repositories count by their shares, so totals of repositories may be fractional.
+    requests: float
+    failed: float
+    seconds: float
+    sent: float
+    received: float
+    cost: float
+
+    def __init__(self) -> None:
+        self.requests = self.failed = self.sent = self.received = self.cost = 0
+        self.seconds = 0.0
+
+    def add(self, record: RequestRecord) -> None:
+        share = record.share
+        self.requests += share
+        if not 200 <= record.status < 400:
+            self.failed += share
+        self.seconds += record.latency * share
+        self.sent += record.sent * share
+        self.received += record.received * share
+        self.cost += record.cost * share
+
+    def export(self) -> Dict[str, Any]:
+        return {'requests': round_number(self.requests), 'failed': round_number(self.failed),
+                'seconds': round(self.seconds, 6), 'sent': round_number(self.sent),
+                'received': round_number(self.received), 'cost': round_number(self.cost)}
+
+    def __str__(self) -> str:
+        return (f'{round_number(self.requests)} requests ({round_number(self.failed)} failed) in {self.seconds:.2f} s, '
+                f'{self.sent / 1024:.1f} kB sent, {self.received / 1024:.1f} kB received, '
+                f'cost {round_number(self.cost)}')
+
+
+def round_number(value: float) -> float:
+    # Whole numbers stay integers, e.g. totals of requests which were not shared.
+    value = round(float(value), 6)
+    return int(value) if value.is_integer() else value
+
+
+class Stats:
+    records: List[RequestRecord]
+
+    def __init__(self) -> None:
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record: RequestRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def group(self, key: Callable[[RequestRecord], Any]) -> Dict[Any, Totals]:
+        groups: Dict[Any, Totals] = {}
+        for record in self.records:
+            group_key = key(record)
+            totals = groups.get(group_key)
+            if totals is None:
+                totals = groups[group_key] = Totals()
+            totals.add(record)
+        return groups
+
+    def get_totals(self) -> Totals:
+        return self.group(lambda record: None).get(None) or Totals()
+
+    def print_summary(self, out: Optional[TextIO] = None) -> None:
+        def show(*args: Any) -> None:
+            print(*args, file=out)
+
+        show('Total:', self.get_totals())
+        show('By API:')
+        for api, totals in sorted(self.group(lambda record: record.api).items()):
+            show(f'  {api}:', totals)
+        show('By action:')
+        for action, totals in sorted(self.group(lambda record: record.action or NO_TAG).items()):
+            show(f'  {action}:', totals)
+        repos = self.group(lambda record: record.repo)
+        repos.pop(None, None)
+        if repos:
+            show('Slowest repositories:')
+            for repo, totals in sorted(repos.items(), key=lambda item: -item[1].seconds)[:SLOWEST_REPOS]:
+                show(f'  {repo}:', totals)
+
+    def write_json(self, fh: TextIO) -> None:
+        def export(groups: Dict[Any, Totals]) -> Dict[str, Any]:
+            return {key or NO_TAG: totals.export() for key, totals in sorted(groups.items(), key=lambda x: x[0] or '')}
+
+        json.dump({
+            'total': self.get_totals().export(),
+            'apis': export(self.group(lambda record: record.api)),
+            'actions': export(self.group(lambda record: record.action)),
+            'repos': export(self.group(lambda record: record.repo)),
+            'requests': [record._asdict() for record in self.records],
+        }, fh, indent=2)
+        fh.write('\n')
+
+    def write_openmetrics(self, fh: TextIO) -> None:
+        # Repositories are left out not to create a metric series for each of them.
+        groups: Dict[Tuple[str, str, int], Totals] = self.group(
+            lambda record: (record.api, record.action or NO_TAG, record.status))
+        metrics: Tuple[Tuple[str, Optional[str], str, Callable[[Totals], float]], ...] = (
+            ('requests', None, 'Number of requests.', lambda totals: totals.requests),
+            ('request_seconds', 'seconds', 'Time spent waiting for responses.', lambda totals: totals.seconds),
+            ('sent_bytes', 'bytes', 'Size of request bodies.', lambda totals: totals.sent),
+            ('received_bytes', 'bytes', 'Size of response bodies.', lambda totals: totals.received),
+            ('cost', None, 'Points of the primary rate limit.', lambda totals: totals.cost),
+        )
+        for name, unit, help_text, value in metrics:
+            family = f'{METRICS_PREFIX}_{name}'
+            fh.write(f'# TYPE {family} counter\n')
+            if unit:
+                fh.write(f'# UNIT {family} {unit}\n')
+            fh.write(f'# HELP {family} {help_text}\n')
+            for (api, action, status), totals in sorted(groups.items()):
+                fh.write(f'{family}_total{{api="{api}",action="{action}",status="{status}"}} '
+                         f'{round_number(value(totals))}\n')
+        fh.write('# EOF\n')
@@ -0,0 +1,136 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from github_labels_sync.io import DEFAULT_LABEL_STORE_TTL
+from github_labels_sync.label import Label
+
+VERSION = 1
+SCHEMA = f'''
+    BEGIN;
+    DROP TABLE IF EXISTS labels;
+    DROP TABLE IF EXISTS repos;
+    CREATE TABLE repos (
+        repo TEXT PRIMARY KEY COLLATE NOCASE,
+        node_id TEXT,
+        fetched REAL
+    );
+    CREATE TABLE labels (
+        repo TEXT NOT NULL COLLATE NOCASE,
+        name TEXT NOT NULL COLLATE NOCASE,
+        color TEXT NOT NULL,
+        description TEXT NOT NULL,
+        node_id TEXT,
+        issues INTEGER,
+        pull_requests INTEGER,
+        PRIMARY KEY (repo, name)
+    );
+    CREATE INDEX labels_name ON labels (name);
+    PRAGMA user_version = {VERSION};
+    COMMIT;
+'''
+
+LabelCounts = Tuple[int, int]  # Issues and pull requests with a label.
+
+
+class LabelUsage(NamedTuple):
+    repo: str
+    name: str
+    issues: Optional[int]
+    pull_requests: Optional[int]
+    fetched: float
+
+
+class LabelStore:
+    # Snapshots of labels of repositories shared by all commands, so that commands which change nothing do not list
+    # labels listed recently again. A snapshot is fresh for `ttl` seconds and it is dropped when labels of the
+    # repository are changed.
+    path: str
+    ttl: float
+
+    def __init__(self, path: str, ttl: float = DEFAULT_LABEL_STORE_TTL) -> None:
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != VERSION:
+            # Snapshots are only a cache, so they are simply dropped when the schema changes.
+            self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def is_fresh(self, fetched: Optional[float], max_age: Optional[float] = None) -> bool:
+        return fetched is not None and time.time() - fetched < (self.ttl if max_age is None else max_age)
+
+    def get_labels(self, repo: str, max_age: Optional[float] = None) -> Optional[List[Label]]:
+        return self.get_labels_many([repo], max_age).get(repo.lower())
+
+    def get_labels_many(self, repos: Iterable[str], max_age: Optional[float] = None) -> Dict[str, List[Label]]:
+        # Fresh snapshots keyed by lower-case names of repositories.
+        result: Dict[str, List[Label]] = {}
+        names = [repo.lower() for repo in repos]
+        with self._lock:
+            for chunk in (names[i:i + 500] for i in range(0, len(names), 500)):
+                placeholders = ', '.join('?' * len(chunk))
+                for repo, fetched in self._db.execute(
+                        f'SELECT lower(repo), fetched FROM repos WHERE repo IN ({placeholders})', chunk).fetchall():
+                    if self.is_fresh(fetched, max_age):
+                        result[repo] = []
+                rows = self._db.execute(
+                    f'SELECT lower(repo), name, color, description, node_id FROM labels '
+                    f'WHERE repo IN ({placeholders}) ORDER BY rowid', chunk)
+                for repo, name, color, description, node_id in rows:
+                    if repo in result:
+                        result[repo].append(Label.create(name, color, description, node_id))
+        return result
+
+    def set_labels(self, repo: str, labels: List[Label], *, node_id: Optional[str] = None,
+                   counts: Optional[Dict[str, LabelCounts]] = None) -> None:
+        # Without new counts, the last known counts of labels which are still there are kept.
+        with self._lock, self._db:
+            self._db.execute('BEGIN')
+            known: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+            if counts is None:
+                for name, issues, pull_requests in self._db.execute(
+                        'SELECT lower(name), issues, pull_requests FROM labels WHERE repo = ?', (repo,)):
+                    known[name] = issues, pull_requests
+            else:
+                known.update((name.lower(), item) for name, item in counts.items())
+            self._db.execute('INSERT INTO repos (repo, node_id, fetched) VALUES (?, ?, ?) ON CONFLICT (repo) '
+                             'DO UPDATE SET node_id = coalesce(excluded.node_id, node_id), fetched = excluded.fetched',
+                             (repo, node_id, time.time()))
+            self._db.execute('DELETE FROM labels WHERE repo = ?', (repo,))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO labels (repo, name, color, description, node_id, issues, pull_requests) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(repo, label.name, label.color, label.description, label.node_id,
+                  *known.get(label.name.lower(), (None, None))) for label in labels])
+
+    def invalidate(self, repo: str) -> None:
+        # The node ID of the repository is kept, only its labels are listed again next time.
+        with self._lock:
+            self._db.execute('UPDATE repos SET fetched = NULL WHERE repo = ?', (repo,))
+
+    def get_repo_id(self, repo: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute('SELECT node_id FROM repos WHERE repo = ?', (repo,)).fetchone()
+        return row[0] if row else None
+
+    def find_label(self, name: str, max_age: Optional[float] = None) -> List[LabelUsage]:
+        # Answered from fresh snapshots only, like labels used by other commands.
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT repos.repo, labels.name, issues, pull_requests, fetched FROM labels '
+                'JOIN repos USING (repo) WHERE labels.name = ? ORDER BY repos.repo', (name,)).fetchall()
+        return [LabelUsage(repo, label, issues, pull_requests, fetched)
+                for repo, label, issues, pull_requests, fetched in rows if self.is_fresh(fetched, max_age)]
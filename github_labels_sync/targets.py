@@ -0,0 +1,84 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from github_labels_sync.github import GitHub
+
+SELECTOR_KEYS = 'owner', 'names', 'exclude', 'topics', 'archived', 'fork'
+
+
+class TargetSelector(NamedTuple):
+    owner: str
+    names: Tuple[str, ...] = ('*',)
+    exclude: Tuple[str, ...] = ()
+    topics: Tuple[str, ...] = ()  # A repository must have at least one of them.
+    archived: Optional[bool] = False  # None for both archived and active repositories.
+    fork: Optional[bool] = None  # None for both forks and source repositories.
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> 'TargetSelector':
+        if not isinstance(data, dict):
+            raise TypeError(f'repos.targets: A dict expected, not {type(data)!s} {data!r}.')
+        unknown = set(data) - set(SELECTOR_KEYS)
+        if unknown:
+            raise ValueError(f'repos.targets: Unknown keys {", ".join(sorted(unknown))} in {data!r}.')
+        owner = data.get('owner')
+        if not owner or not isinstance(owner, str):
+            raise TypeError(f'repos.targets: Owner must be a non-empty str in {data!r}.')
+        values: Dict[str, Any] = {'owner': owner}
+        for key in 'names', 'exclude', 'topics':
+            if key in data:
+                value = data[key]
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    raise TypeError(f'repos.targets.{key}: A list of str expected, not {value!r}.')
+                values[key] = tuple(item.lower() for item in value)
+        for key in 'archived', 'fork':
+            if key in data:
+                value = data[key]
+                if value is not None and not isinstance(value, bool):
+                    raise TypeError(f'repos.targets.{key}: A bool or null expected, not {value!r}.')
+                values[key] = value
+        return cls(**values)
+
+    def export(self) -> Dict[str, Any]:
+        defaults = TargetSelector(self.owner)
+        data: Dict[str, Any] = {'owner': self.owner}
+        for key in SELECTOR_KEYS[1:]:
+            value = getattr(self, key)
+            if value != getattr(defaults, key):
+                data[key] = list(value) if isinstance(value, tuple) else value
+        return data
+
+    def matches(self, repository: Dict[str, Any]) -> bool:
+        if self.archived is not None and repository['isArchived'] != self.archived:
+            return False
+        if self.fork is not None and repository['isFork'] != self.fork:
+            return False
+        name = repository['nameWithOwner'].split('/')[1].lower()
+        if not any(fnmatchcase(name, pattern) for pattern in self.names):
+            return False
+        if any(fnmatchcase(name, pattern) for pattern in self.exclude):
+            return False
+        if self.topics:
+            topics = {node['topic']['name'].lower() for node in repository['repositoryTopics']['nodes']}
+            if topics.isdisjoint(self.topics):
+                return False
+        return True
+
+
+def iter_targets(github: 'GitHub', repos: Iterable[str], selectors: List[TargetSelector]) -> Iterator[str]:
+    # Repositories are yielded as soon as each page of them arrives, so that they can be processed right away.
+    seen: Set[str] = set()
+    for repo in repos:
+        if repo.lower() not in seen:
+            seen.add(repo.lower())
+            yield repo
+    for selector in selectors:
+        for repository in github.iter_owner_repos(selector.owner, fork=selector.fork):
+            repo = repository['nameWithOwner']
+            if repo.lower() not in seen and selector.matches(repository):
+                seen.add(repo.lower())
+                yield repo
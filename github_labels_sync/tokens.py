@@ -0,0 +1,106 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import math
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from github_labels_sync.http import Scheduler
+
+
+class Token:
+    # A token with its own rate limits, e.g. a personal access token or an installation token of a GitHub App,
+    # optionally restricted to repositories of some owners.
+    name: str
+    value: str
+    owners: Optional[FrozenSet[str]]
+    schedulers: Dict[str, Scheduler]
+
+    def __init__(self, value: str, owners: Optional[Iterable[str]] = None, name: str = '') -> None:
+        self.value = value
+        self.owners = frozenset(owner.lower() for owner in owners) if owners is not None else None
+        self.name = name or f'{value[:4]}…'
+        self.schedulers = {}
+
+    @property
+    def authorization(self) -> str:
+        return f'bearer {self.value}'
+
+    def allows(self, owners: FrozenSet[str]) -> bool:
+        return self.owners is None or owners <= self.owners
+
+    def get_scheduler(self, api: str) -> Scheduler:
+        # Each token has separate rate limits of the REST and GraphQL APIs.
+        scheduler = self.schedulers.get(api)
+        if scheduler is None:
+            scheduler = self.schedulers[api] = Scheduler()
+        return scheduler
+
+
+class TokenPool:
+    # Sends each request with the token which can send it the soonest, preferring the one with the most budget left.
+    # Tokens with an unknown budget are tried first and ties go to the least used token, so that each token is used
+    # right from the start.
+    tokens: List[Token]
+
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        self.tokens = list(tokens)
+        if not self.tokens:
+            raise ValueError('You need OAuth2 token.')
+        self._lock = threading.Lock()
+        self._sent: Dict[Tuple[int, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def restricted(self) -> bool:
+        return any(token.owners is not None for token in self.tokens)
+
+    def select(self, api: str, owners: FrozenSet[str]) -> Tuple[Token, Scheduler]:
+        now = time.time()
+        with self._lock:
+            best: Optional[Tuple[float, float, int]] = None
+            selected: Optional[int] = None
+            for index, token in enumerate(self.tokens):
+                if not token.allows(owners):
+                    continue
+                scheduler = token.get_scheduler(api)
+                remaining = scheduler.budget.remaining
+                key = (max(now, scheduler.get_available_at()), -(math.inf if remaining is None else remaining),
+                       self._sent.get((index, api), 0))
+                if best is None or key < best:
+                    best, selected = key, index
+            if selected is None:
+                raise ValueError(f'No token is allowed to access repositories of {", ".join(sorted(owners))}.')
+            self._sent[(selected, api)] = self._sent.get((selected, api), 0) + 1
+        token = self.tokens[selected]
+        return token, token.get_scheduler(api)
+
+
+def parse_tokens(source: str, name: str = '') -> List[Token]:
+    # One token per line, optionally followed by owners it may access, e.g. `ghs_xxx acme,acme-labs`.
+    tokens = []
+    for number, line in enumerate(source.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if line:
+            value, *owners = line.split(None, 1)
+            tokens.append(Token(value, owners[0].replace(',', ' ').split() if owners else None,
+                                f'{name}:{number}' if name else ''))
+    return tokens
+
+
+def load_tokens(path: str) -> List[Token]:
+    # A token file or a directory of token files, e.g. with an installation token of a GitHub App for each owner.
+    if not os.path.isdir(path):
+        with open(path, encoding='utf-8') as fh:
+            return parse_tokens(fh.read(), os.path.basename(path))
+    tokens = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if not name.startswith('.') and os.path.isfile(file_path):
+            with open(file_path, encoding='utf-8') as fh:
+                tokens.extend(parse_tokens(fh.read(), name))
+    return tokens
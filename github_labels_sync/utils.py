@@ -1,7 +1,9 @@
 # Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
 # Licensed under BSD-2-Clause license - see file LICENSE for details.
 
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')  # pylint: disable=invalid-name
 
 
 def get_str_dict(data: dict, key: str) -> Union[Dict[str, str], None]:
@@ -39,3 +41,14 @@ def get_str_dict_of_str_dicts(data: dict, key: str) -> Union[Dict[str, Dict[str,
 
 def sorted_dict(dictionary: Dict[str, Any]) -> Dict[str, Any]:
     return {key: dictionary[key] for key in sorted(dictionary)}
+
+
+def chunks(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk: List[T] = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,68 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import pytest
+import requests
+
+from github_labels_sync.cli import main
+from github_labels_sync.fake_github import FakeGitHub, FakeServer, RateLimiter
+from github_labels_sync.github import GitHub, GraphqlClient, RestClient
+
+GitHubFactory = Callable[[], GitHub]
+CliRunner = Callable[..., Optional[int]]
+
+
+@pytest.fixture
+def fake() -> FakeGitHub:
+    return FakeGitHub.generate(repos=6, labels=5, issues=4, owners=2)
+
+
+@pytest.fixture
+def rate_limiter() -> RateLimiter:
+    return RateLimiter(None)
+
+
+@pytest.fixture
+def server(fake: FakeGitHub, rate_limiter: RateLimiter) -> Iterator[FakeServer]:
+    with FakeServer(fake, rate_limiter=rate_limiter) as fake_server:
+        yield fake_server
+
+
+@pytest.fixture
+def make_github(server: FakeServer) -> GitHubFactory:
+    def make() -> GitHub:
+        session = requests.Session()
+        github = GitHub(GraphqlClient(server.graphql_url, session), RestClient(server.url, session))
+        github.set_token('token')
+        return github
+
+    return make
+
+
+@pytest.fixture
+def github(make_github: GitHubFactory) -> GitHub:
+    return make_github()
+
+
+@pytest.fixture
+def config_path(fake: FakeGitHub, tmp_path: Path) -> str:
+    repos = sorted(repo.name_with_owner for repo in fake.repos.values())
+    path = tmp_path / 'labels.json'
+    path.write_text(json.dumps({'repos': {'primary': repos[0], 'secondary': repos[1:]}}))
+    return str(path)
+
+
+@pytest.fixture
+def run_cli(server: FakeServer, config_path: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> CliRunner:
+    monkeypatch.setenv('GITHUB_API_URL', server.url)
+    monkeypatch.setenv('GITHUB_GRAPHQL_URL', server.graphql_url)
+
+    def run(*args: str) -> Optional[int]:
+        return main(['gh-label-sync', '--token', 'token', '--config', config_path, '--no-config-cache',
+                     '--store', str(tmp_path / 'labels.sqlite'), '--journal', str(tmp_path / 'journal.jsonl'), *args])
+
+    return run
@@ -0,0 +1,41 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from pathlib import Path
+
+import pytest
+
+from github_labels_sync.actions import CreateAction
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.label import Label
+from github_labels_sync.plan import read_plan
+
+from .conftest import CliRunner
+
+
+def test_plan_is_applied_later(fake: FakeGitHub, run_cli: CliRunner, config_path: str, tmp_path: Path) -> None:
+    assert run_cli('--pull') == 0
+    config = Config(config_path, cache=False)
+    config.labels.update([Label.create('new', '123456', 'A new label')])
+    config.save()
+    plan_path = str(tmp_path / 'plan.jsonl')
+    assert run_cli('--push', '--plan-out', plan_path) == 0
+    assert not any('new' in repo.all_labels for repo in fake.repos.values())
+    with open(plan_path, encoding='utf-8') as fh:
+        plan = list(read_plan(fh))
+    assert [repo for repo, _actions in plan] == config.all_repos
+    assert all(len(actions) == 1 and isinstance(actions[0], CreateAction) for _repo, actions in plan)
+
+    fake.calls.clear()
+    assert run_cli('--apply', plan_path) == 0
+    # Labels are not listed again.
+    assert not fake.calls['graphql query']
+    assert all(repo.all_labels['new'].description == 'A new label' for repo in fake.repos.values())
+
+
+def test_invalid_plan_entry(tmp_path: Path) -> None:
+    plan_path = tmp_path / 'plan.jsonl'
+    plan_path.write_text('{"repo": "acme/app", "actions": [{"type": "explode"}]}\n')
+    with open(plan_path, encoding='utf-8') as fh, pytest.raises(ValueError, match=r'plan.jsonl:1: Invalid plan entry'):
+        list(read_plan(fh))
@@ -0,0 +1,73 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+from github_labels_sync.actions import Action, CreateAction, DeleteAction, RenameAction, ReplaceAction, UpdateAction
+from github_labels_sync.async_github import AsyncGitHub, AsyncGraphqlClient, AsyncRestClient
+from github_labels_sync.fake_github import FakeGitHub, FakeLabel, FakeServer, GraphqlError
+from github_labels_sync.label import Label
+
+REPO = 'owner0/repo0'
+
+
+def run(server: FakeServer, call: Callable[[AsyncGitHub], Awaitable[Any]]) -> Any:
+    async def main() -> Any:
+        async with AsyncGitHub(AsyncGraphqlClient(server.graphql_url), AsyncRestClient(server.url)) as github:
+            github.set_token('token')
+            return await call(github)
+
+    return asyncio.run(main())
+
+
+def run_action(server: FakeServer, action: Action) -> None:
+    run(server, lambda github: action.run_async(github, REPO))
+
+
+def get_label(fake: FakeGitHub, name: str) -> Label:
+    label = fake.repos[REPO].all_labels[name]
+    return Label.create(label.name, label.color, label.description)
+
+
+def test_create_label(fake: FakeGitHub, server: FakeServer) -> None:
+    run_action(server, CreateAction('new', {'color': '123456', 'description': ''}))
+    assert fake.repos[REPO].all_labels['new'].color == '123456'
+    with pytest.raises(ValueError, match='POST /repos/owner0/repo0/labels failed: 422'):
+        run_action(server, CreateAction('label0', {'color': '123456', 'description': ''}))
+
+
+def test_update_label(fake: FakeGitHub, server: FakeServer) -> None:
+    run_action(server, UpdateAction(get_label(fake, 'label0'), {'color': '123456'}))
+    assert fake.repos[REPO].all_labels['label0'].color == '123456'
+    with pytest.raises(ValueError, match='PATCH /repos/owner0/repo0/labels/label0 failed: 422 .*already exists'):
+        run_action(server, RenameAction(get_label(fake, 'label0'), {'name': 'label1'}))
+
+
+def test_delete_label(fake: FakeGitHub, server: FakeServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    run_action(server, DeleteAction(get_label(fake, 'label0')))
+    assert 'label0' not in fake.repos[REPO].all_labels
+
+    def fail(_label: FakeLabel) -> None:
+        raise GraphqlError('Validation Failed', 'UNPROCESSABLE')
+
+    monkeypatch.setattr(fake, 'delete_label', fail)
+    with pytest.raises(ValueError, match='DELETE /repos/owner0/repo0/labels/label1 failed: 422 Validation Failed'):
+        run_action(server, DeleteAction(get_label(fake, 'label1')))
+
+
+def test_replace_label(fake: FakeGitHub, server: FakeServer) -> None:
+    repo = fake.repos[REPO]
+    labeled = [issue for issue in repo.all_issues if repo.all_labels['label0'] in issue.labels]
+    assert labeled
+    run_action(server, ReplaceAction(get_label(fake, 'label0'), get_label(fake, 'label1')))
+    assert 'label0' not in repo.all_labels
+    assert all(repo.all_labels['label1'] in issue.labels for issue in labeled)
+
+
+def test_query_errors(server: FakeServer) -> None:
+    assert [label.name for label in run(server, lambda github: github.list_labels(REPO))][:2] == ['label0', 'label1']
+    with pytest.raises(ValueError, match='GraphQL query failed: '):
+        run(server, lambda github: github.graphql_client.query('query {'))
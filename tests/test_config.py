@@ -0,0 +1,52 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from github_labels_sync import io
+from github_labels_sync.config import Config, compile_config, load_compiled_config
+from github_labels_sync.targets import TargetSelector
+
+
+def test_targets_are_exported_only_if_set(config_path: str) -> None:
+    config = Config(config_path, cache=False)
+    config.save(force=True)
+    with open(config_path, encoding='utf-8') as fh:
+        assert not {'targets', '#targets'} & set(json.load(fh)['repos'])
+    config.targets.append(TargetSelector('acme', exclude=('legacy-*',)))
+    config.save(force=True)
+    with open(config_path, encoding='utf-8') as fh:
+        assert json.load(fh)['repos']['targets'] == [{'owner': 'acme', 'exclude': ['legacy-*']}]
+    assert Config(config_path, cache=False).targets == config.targets
+
+
+def test_compiled_config_is_cached(config_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    compiled: List[Dict[str, Any]] = []
+
+    def compile_and_count(data: Dict[str, Any]) -> Dict[str, Any]:
+        compiled.append(data)
+        return compile_config(data)
+
+    monkeypatch.setattr('github_labels_sync.config.compile_config', compile_and_count)
+    first = load_compiled_config(config_path)
+    assert os.path.isfile(io.get_compiled_config_path(config_path))
+    assert load_compiled_config(config_path) == first
+    assert len(compiled) == 1
+    # Only touched, so the content is compared.
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_compiled_config(config_path) == first
+    assert len(compiled) == 1
+    with open(config_path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    data['mandatory'] = {'bug': {'color': 'ff0000', 'description': ''}}
+    with open(config_path, 'wt', encoding='utf-8') as fh:
+        json.dump(data, fh)
+    assert load_compiled_config(config_path)['labels'] != first['labels']
+    assert len(compiled) == 2
+    assert load_compiled_config(config_path, cache=False)['labels'] != first['labels']
+    assert len(compiled) == 3
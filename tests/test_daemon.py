@@ -0,0 +1,53 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import Any, Dict, List
+
+import pytest
+
+from github_labels_sync.config import Config
+from github_labels_sync.daemon_command import Daemon
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.github import GitHub
+from github_labels_sync.push_command import PushOptions
+
+
+class Events:
+    # Events are handled only after the fake has released its lock, which the requests of the daemon need.
+    def __init__(self, fake: FakeGitHub, daemon: Daemon) -> None:
+        self.daemon = daemon
+        self.payloads: List[Dict[str, Any]] = []
+        fake.webhooks.append(lambda _event, payload: self.payloads.append(payload))
+
+    def handle(self) -> None:
+        while self.payloads:
+            self.daemon.handle_label_event(self.payloads.pop(0))
+
+
+@pytest.fixture
+def daemon(github: GitHub, config_path: str) -> Daemon:
+    config = Config(config_path)
+    config.labels.update(github.list_labels(config.primary_repo))
+    config.save()
+    daemon = Daemon(github, config, 'secret', PushOptions(jobs=2))
+    daemon.load()
+    return daemon
+
+
+def test_labels_of_events_have_node_ids(fake: FakeGitHub, daemon: Daemon) -> None:
+    events = Events(fake, daemon)
+    label = fake.add_label(fake.repos['owner0/repo0'], 'new', '123456')
+    events.handle()
+    assert {item.name: item.node_id for item in daemon.cache.get('owner0/repo0')}['new'] == label.id
+
+
+def test_label_deleted_in_primary_repository(fake: FakeGitHub, daemon: Daemon,
+                                             capsys: pytest.CaptureFixture[str]) -> None:
+    events = Events(fake, daemon)
+    assert all('label1' in repo.all_labels for repo in fake.repos.values())
+    fake.delete_label(fake.repos['owner0/repo0'].all_labels['label1'])
+    events.handle()
+    assert 'Not synchronized' not in capsys.readouterr().out
+    assert not any('label1' in repo.all_labels for repo in fake.repos.values())
+    assert 'label1' not in Config(daemon.config.path).labels.all_labels
+    assert all('label1' not in {label.name for label in daemon.cache.get(repo)} for repo in fake.repos)
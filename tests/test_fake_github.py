@@ -0,0 +1,12 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from github_labels_sync.fake_github import FakeGitHub
+
+
+def test_fake_label_ids(fake: FakeGitHub) -> None:
+    label = next(iter(fake.repos['owner0/repo0'].all_labels.values()))
+    data = label.as_rest()
+    assert isinstance(data['id'], int)
+    assert data['node_id'] == label.id
+    assert data['id'] == label.database_id
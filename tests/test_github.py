@@ -0,0 +1,51 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import List, Tuple
+
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.github import GitHub
+
+
+def test_labels_are_listed_in_bulk(fake: FakeGitHub, github: GitHub) -> None:
+    crowded = fake.repos['owner0/repo2']
+    for i in range(120):
+        fake.add_label(crowded, f'extra{i}', 'ededed')
+    repos = sorted(repo.name_with_owner for repo in fake.repos.values())
+    fake.calls.clear()
+    labels = github.list_labels_bulk(repos, chunk_size=4)
+    # Two chunks of repositories and the second page of labels of the crowded repository.
+    assert fake.calls['graphql query'] == 3
+    assert list(labels) == repos
+    assert len(labels['owner0/repo2']) == 125
+    assert labels == {repo: github.list_labels(repo) for repo in repos}
+
+
+def test_cursors_are_followed(fake: FakeGitHub, github: GitHub) -> None:
+    repo = fake.repos['owner0/repo0']
+    label = repo.all_labels['label0']
+    for issue in repo.all_issues:
+        if label not in issue.labels:
+            issue.labels.append(label)
+    fake.calls.clear()
+    assert [label.name for label in github.list_labels('owner0/repo0', page_size=2)] == [
+        f'label{i}' for i in range(5)]
+    assert fake.calls['graphql query'] == 3
+    # Pull requests are not issues.
+    assert [issue['number'] for issue in github.list_issues_with_label('owner0/repo0', 'label0', page_size=1)] == [
+        1, 2, 3]
+
+
+def test_issues_are_relabeled_in_batches(fake: FakeGitHub, github: GitHub) -> None:
+    repo = fake.repos['owner0/repo0']
+    old, new = repo.all_labels['label0'], repo.all_labels['label1']
+    for issue in repo.all_issues:
+        issue.labels = [old]
+    progress: List[Tuple[int, int]] = []
+    fake.calls.clear()
+    github.replace_label('owner0/repo0', 'label0', 'label1', batch_size=3,
+                         progress=lambda count, total: progress.append((count, total)))
+    # Both issues and pull requests, with one mutation request for each batch.
+    assert progress == [(3, 4), (4, 4)]
+    assert fake.calls['graphql mutation'] == 2
+    assert all(issue.labels == [new] for issue in repo.all_issues)
@@ -0,0 +1,24 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from github_labels_sync.actions import CreateAction, UpdateAction
+from github_labels_sync.config import Config
+from github_labels_sync.github import GitHub
+from github_labels_sync.label import Label
+
+
+def test_plans_are_shared_by_identical_label_sets(github: GitHub, config_path: str) -> None:
+    config = Config(config_path, cache=False)
+    labels = config.labels
+    labels.update(github.list_labels(config.primary_repo))
+    labels.update([Label.create('new', '123456', '')])
+    listed = github.list_labels_bulk(config.all_repos)
+    plans = [labels.plan(repo_labels) for repo_labels in listed.values()]
+    # Node IDs differ in each repository, but the planned actions do not.
+    assert all(plan is plans[0] for plan in plans)
+    assert [type(action) for action in plans[0]] == [CreateAction]
+    changed = [label._replace(color='ffffff') if label.name == 'label1' else label for label in listed['owner0/repo2']]
+    assert [type(action) for action in labels.plan(changed)] == [UpdateAction, CreateAction]
+    # Plans are computed again when the config changes.
+    labels.remove('new')
+    assert labels.plan(listed['owner0/repo2']) == []
@@ -0,0 +1,28 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from github_labels_sync.actions import CreateAction, RenameAction, ReplaceAction, UpdateAction
+from github_labels_sync.label import Label
+from github_labels_sync.labels import Labels
+from github_labels_sync.optimizer import get_stages
+
+
+def test_stages_of_planned_actions() -> None:
+    labels = Labels(
+        mandatory={
+            'bug': {'color': 'ff0000', 'description': 'Something is broken.'},
+            'feature': {'color': '00ff00', 'description': ''},
+            'docs': {'color': '0000ff', 'description': ''},
+            'wontfix': {'color': 'ffffff', 'description': ''},
+        },
+        aliases={'enhancement': 'feature', 'defect': 'bug'})
+    actions = labels.process([
+        Label.create('defect', 'ff0000'),
+        Label.create('bug', '000000'),
+        Label.create('enhancement', '00ff00'),
+        Label.create('wontfix', 'eeeeee'),
+    ])
+    assert [type(action) for action in actions] == [ReplaceAction, RenameAction, UpdateAction, UpdateAction,
+                                                    CreateAction]
+    # Updates and creates of other labels do not wait for replacing `defect` by `bug`, only the update of `bug` does.
+    assert get_stages(actions) == [[0, 1, 3, 4], [2]]
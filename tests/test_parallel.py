@@ -0,0 +1,51 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import threading
+from typing import Iterator, List, Tuple
+
+from github_labels_sync.parallel import RepoPool
+
+
+def test_source_is_consumed_lazily() -> None:
+    pulled: List[str] = []
+    release = threading.Event()
+
+    def source() -> Iterator[Tuple[str, None]]:
+        for i in range(100):
+            repo = f'acme/repo{i}'
+            pulled.append(repo)
+            yield repo, None
+
+    def job(repo: str, _data: None) -> str:
+        release.wait(5)
+        return repo
+
+    pool: RepoPool[None, str] = RepoPool(2, jobs_per_owner=1)
+    results = pool.map(job, source())
+    threading.Timer(0.2, release.set).start()
+    first = next(results)
+    # One job of the owner runs and at most `jobs` repositories wait aside.
+    assert first == 'acme/repo0'
+    assert len(pulled) <= 4
+    assert sorted(results) == sorted(f'acme/repo{i}' for i in range(1, 100))
+
+
+def test_jobs_per_owner() -> None:
+    lock = threading.Lock()
+    active: List[int] = [0]
+    peak: List[int] = [0]
+
+    def job(repo: str, _data: None) -> str:
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.01)
+        with lock:
+            active[0] -= 1
+        return repo
+
+    items = [(f'acme/repo{i}', None) for i in range(10)]
+    pool: RepoPool[None, str] = RepoPool(4, jobs_per_owner=2)
+    assert len(list(pool.map(job, items))) == 10
+    assert peak[0] <= 2
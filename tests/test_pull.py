@@ -0,0 +1,21 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import pytest
+
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub
+
+from .conftest import CliRunner
+
+
+@pytest.mark.parametrize('verbose', [False, True])
+def test_pull_sends_one_query(fake: FakeGitHub, run_cli: CliRunner, config_path: str,
+                              capsys: pytest.CaptureFixture[str], verbose: bool) -> None:
+    assert run_cli('--pull', *(['--verbose'] if verbose else [])) == 0
+    assert fake.calls == {'graphql query': 1}
+    labels = Config(config_path, cache=False).labels
+    assert {name: label['color'] for name, label in labels.mandatory.items()} == {
+        label.name: label.color for label in fake.repos['owner0/repo0'].all_labels.values()}
+    out = capsys.readouterr().out
+    assert ("'issues': {'totalCount': " in out) == verbose
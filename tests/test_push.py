@@ -0,0 +1,77 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from github_labels_sync.fake_github import FakeGitHub, FakeRepo, GraphqlError
+
+from .conftest import CliRunner
+
+
+def add_label(config_path: str, name: str, color: str) -> None:
+    with open(config_path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    data['mandatory'][name] = {'color': color, 'description': ''}
+    with open(config_path, 'wt', encoding='utf-8') as fh:
+        json.dump(data, fh)
+
+
+def fail_creating(fake: FakeGitHub, monkeypatch: pytest.MonkeyPatch, failing_repo: str) -> None:
+    add = fake.add_label
+
+    def add_label_or_fail(repo: FakeRepo, name: str, *args: Any) -> Any:
+        if repo.name_with_owner == failing_repo:
+            raise GraphqlError('Validation Failed', 'UNPROCESSABLE')
+        return add(repo, name, *args)
+
+    monkeypatch.setattr(fake, 'add_label', add_label_or_fail)
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_failed_mutation(fake: FakeGitHub, run_cli: CliRunner, config_path: str, tmp_path: Path,
+                         monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], batch: bool) -> None:
+    assert run_cli('--pull') == 0
+    add_label(config_path, 'new', '123456')
+    state_path, results_path = tmp_path / 'state.json', tmp_path / 'results.json'
+    args = ['--push', '--jobs', '2', '--incremental', '--state-file', str(state_path), '--results', str(results_path)]
+    if batch:
+        args.append('--batch-mutations')
+    with monkeypatch.context() as patch:
+        fail_creating(fake, patch, 'owner1/repo3')
+        assert run_cli(*args) == 1
+    assert 'owner1/repo3 Error:' in capsys.readouterr().out
+    state = json.loads(state_path.read_text())['repos']
+    assert sorted(state) == ['owner0/repo0', 'owner0/repo2', 'owner0/repo4', 'owner1/repo1', 'owner1/repo5']
+    results = json.loads(results_path.read_text())
+    assert not results['ok']
+    assert [item['repo'] for item in results['repos'] if not item['ok']] == ['owner1/repo3']
+    journal = [json.loads(line) for line in (tmp_path / 'journal.jsonl').read_text().splitlines()]
+    assert {'repo': 'owner1/repo3', 'finished': False} in journal
+    assert not any(entry.get('repo') == 'owner1/repo3' and 'done' in entry for entry in journal)
+
+    assert run_cli(*args, '--resume') == 0
+    assert 'new' in fake.repos['owner1/repo3'].all_labels
+
+
+def test_incremental_push_replans_edited_labels(fake: FakeGitHub, run_cli: CliRunner, tmp_path: Path,
+                                                capsys: pytest.CaptureFixture[str]) -> None:
+    args = ['--push', '--incremental', '--state-file', str(tmp_path / 'state.json')]
+    assert run_cli('--pull') == 0
+    assert run_cli(*args) == 0
+    capsys.readouterr()
+    assert run_cli(*args) == 0
+    assert 'Skipped 6 repositories unchanged' in capsys.readouterr().out
+    # GitHub does not reliably bump updatedAt of the repository when a label is edited.
+    repo = fake.repos['owner1/repo3']
+    updated_at = repo.updated_at
+    fake.update_label(repo.all_labels['label1'], {'color': '123456'})
+    repo.updated_at = updated_at
+    assert run_cli(*args) == 0
+    out = capsys.readouterr().out
+    assert 'Skipped 5 repositories unchanged' in out
+    assert "owner1/repo3 Update: 'label1'" in out
+    assert repo.all_labels['label1'].color != '123456'
@@ -0,0 +1,48 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import pytest
+
+from github_labels_sync.fake_github import RateLimiter
+from github_labels_sync.github import GitHub
+from github_labels_sync.stats import Stats
+
+COSTLY_QUERY = '''
+    query ($owner: String!) {
+      repositoryOwner(login: $owner) {
+        repositories(first: 100) {
+          nodes { labels(first: 100) { nodes { issues(first: 100) { totalCount } } } }
+        }
+      }
+      rateLimit { cost limit remaining resetAt }
+    }
+'''
+
+
+@pytest.fixture
+def rate_limiter() -> RateLimiter:
+    return RateLimiter(5000)
+
+
+def test_scheduler_sees_cost_of_queries(github: GitHub) -> None:
+    stats = Stats()
+    github.add_hook(stats)
+    repos = [repo['nameWithOwner'] for repo in github.iter_owner_repos('owner0')]
+    list(github.iter_labels_bulk(repos))
+    assert github.get_budgets()['graphql'].remaining == 5000 - 2
+    # 1 request of repositories, 100 of labels and 10,000 of issues, a point for each hundred of them.
+    github.graphql_client.query(COSTLY_QUERY, {'owner': 'owner0'})
+    assert stats.records[-1].cost == 101
+    assert github.get_budgets()['graphql'].remaining == 5000 - 2 - 101
+    assert stats.get_totals().cost == 2 + 101
+
+
+@pytest.mark.parametrize('rate_limiter', [RateLimiter(None)])
+def test_budget_without_headers(github: GitHub) -> None:
+    # Without rate limit headers, the budget is known only from the `rateLimit` field of queries.
+    repos = [repo['nameWithOwner'] for repo in github.iter_owner_repos('owner1')]
+    list(github.iter_labels_bulk(repos))
+    list(github.iter_repo_markers(repos))
+    budget = github.get_budgets()['graphql']
+    assert budget.limit == 5000
+    assert budget.remaining is not None and budget.remaining > 4900
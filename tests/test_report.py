@@ -0,0 +1,39 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from github_labels_sync.fake_github import FakeGitHub
+
+from .conftest import CliRunner
+
+
+def test_report_of_drift(fake: FakeGitHub, run_cli: CliRunner, tmp_path: Path,
+                         capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_cli('--pull') == 0
+    fake.update_label(fake.repos['owner1/repo1'].all_labels['label1'], {'color': '123456'})
+    fake.delete_label(fake.repos['owner0/repo2'].all_labels['label2'])
+    fake.add_label(fake.repos['owner0/repo2'], 'extra', 'ededed')
+    report_path = tmp_path / 'report.jsonl'
+    capsys.readouterr()
+    assert run_cli('--report', str(report_path)) == 0
+    assert '2 of 6 repositories have drifted from the config.' in capsys.readouterr().out
+    color = fake.repos['owner0/repo0'].all_labels['label1'].color
+    assert [json.loads(line) for line in report_path.read_text().splitlines()] == [
+        {'repo': 'owner0/repo2', 'label': 'extra', 'drift': 'extra', 'expected': None, 'actual': None},
+        {'repo': 'owner0/repo2', 'label': 'label2', 'drift': 'missing', 'expected': None, 'actual': None},
+        {'repo': 'owner1/repo1', 'label': 'label1', 'drift': 'color', 'expected': color, 'actual': '123456'},
+    ]
+    # Nothing is changed.
+    assert fake.repos['owner1/repo1'].all_labels['label1'].color == '123456'
+
+    assert run_cli('--report', str(report_path), '--report-format', 'csv') == 0
+    with open(report_path, encoding='utf-8', newline='') as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0] == ['repo', 'label', 'drift', 'expected', 'actual']
+    assert rows[1:] == [['owner0/repo2', 'extra', 'extra', '', ''], ['owner0/repo2', 'label2', 'missing', '', ''],
+                        ['owner1/repo1', 'label1', 'color', color, '123456']]
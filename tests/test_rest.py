@@ -0,0 +1,74 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from pathlib import Path
+from typing import Any, List, Union
+
+import pytest
+import requests
+
+from github_labels_sync.cache import ResponseCache
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.rest import Client
+from github_labels_sync.tokens import Token, TokenPool
+from github_labels_sync.typing import StrDict
+
+from .conftest import CliRunner
+
+
+class Session(requests.Session):
+    # Answers with an ETag of the token, or 304 Not Modified if the token sends it back.
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent: List[StrDict] = []
+
+    def request(self, method: Union[str, bytes], url: Union[str, bytes],
+                *args: Any, **kwargs: Any) -> requests.Response:
+        headers = kwargs['headers']
+        self.sent.append(headers)
+        etag = f'"{headers["Authorization"]}"'
+        response = requests.Response()
+        response.request = requests.Request(method, url, headers=headers).prepare()
+        if headers.get('If-None-Match') == etag:
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response.headers['ETag'] = etag
+            response._content = json.dumps({'token': headers['Authorization']}).encode()  # pylint: disable=W0212
+        return response
+
+
+def get_token(client: Client) -> str:
+    data = client.call('/repos/acme/app/labels/bug')
+    assert isinstance(data, dict)
+    token: str = data['token']
+    return token
+
+
+def test_cache_is_keyed_by_selected_token(tmp_path: Path) -> None:
+    session = Session()
+    client = Client('https://api.github.com', session, cache=ResponseCache(str(tmp_path)))
+    client.tokens = TokenPool([Token('a'), Token('b')])
+    assert sorted(get_token(client) for _i in range(2)) == ['bearer a', 'bearer b']
+    assert not any('If-None-Match' in headers for headers in session.sent)
+    assert sorted(get_token(client) for _i in range(2)) == ['bearer a', 'bearer b']
+    assert [headers['If-None-Match'] for headers in session.sent[2:]] == [
+        f'"{headers["Authorization"]}"' for headers in session.sent[2:]]
+
+
+def test_labels_are_listed_with_conditional_requests(fake: FakeGitHub, run_cli: CliRunner, tmp_path: Path,
+                                                     capsys: pytest.CaptureFixture[str]) -> None:
+    cache = ['--http-cache', str(tmp_path / 'http')]
+    assert run_cli('--pull', *cache) == 0
+    assert run_cli('--push', '--dry-run', *cache) == 0
+    assert fake.calls['rest not modified'] == 1
+    fake.calls.clear()
+    assert run_cli('--pull', *cache) == 0
+    assert run_cli('--push', '--dry-run', *cache) == 0
+    assert fake.calls['rest not modified'] == fake.calls['rest GET'] == 7
+    assert not fake.calls['graphql query']
+    fake.update_label(fake.repos['owner1/repo3'].all_labels['label1'], {'color': '123456'})
+    capsys.readouterr()
+    assert run_cli('--push', '--dry-run', *cache) == 0
+    assert "owner1/repo3 Update: 'label1'" in capsys.readouterr().out
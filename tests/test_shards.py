@@ -0,0 +1,51 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from pathlib import Path
+
+import pytest
+
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.label import Label
+from github_labels_sync.shards import Shard, read_results
+
+from .conftest import CliRunner
+
+
+def test_sharded_push(fake: FakeGitHub, run_cli: CliRunner, config_path: str, tmp_path: Path,
+                      capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_cli('--pull') == 0
+    config = Config(config_path, cache=False)
+    config.labels.update([Label.create('new', '123456', '')])
+    config.save()
+    paths = [str(tmp_path / 'results1.json'), str(tmp_path / 'results2.json')]
+    assert run_cli('--push', '--shard', '1/2', '--primary-shard', '1', '--results', paths[0]) == 0
+    assert run_cli('--push', '--shard', '2/2', '--primary-shard', '1', '--results', paths[1]) == 0
+    # Each repository is pushed by exactly one shard.
+    repos = [result.repo for path in paths for result in read_results(path).repos]
+    assert sorted(repos) == sorted(fake.repos)
+    assert 'owner0/repo0' in [result.repo for result in read_results(paths[0]).repos]
+    assert all('new' in repo.all_labels for repo in fake.repos.values())
+
+    capsys.readouterr()
+    assert run_cli('--merge-reports', *paths) == 0
+    assert '6 repositories in 2 shards: 6 synchronized, 0 failed' in capsys.readouterr().out
+    assert run_cli('--merge-reports', paths[0]) == 1
+    assert 'Error: Missing results of shards 2.' in capsys.readouterr().out
+    assert run_cli('--merge-reports', paths[0], paths[0]) == 1
+    assert 'Error: Shard 1/2 is there more than once.' in capsys.readouterr().out
+
+
+def test_shard_partitioning() -> None:
+    shards = [Shard.parse(f'{number}/3') for number in range(1, 4)]
+    repos = [f'owner/repo{index}' for index in range(30)]
+    assert sorted(repo for shard in shards for repo in repos if shard.contains(repo)) == sorted(repos)
+    assert Shard.parse('2/3').contains('Owner/Repo1') == Shard.parse('2/3').contains('owner/repo1')
+    assert Shard.parse('1/2', 2).get_number('owner/primary', 'owner/primary') == 2
+    with pytest.raises(ValueError, match='Shard I/N expected'):
+        Shard.parse('1')
+    with pytest.raises(ValueError, match='from 1 to 2, not 3'):
+        Shard.parse('3/2')
+    with pytest.raises(ValueError, match='primary repository must be from 1 to 2, not 0'):
+        Shard.parse('1/2', 0)
@@ -0,0 +1,43 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from pathlib import Path
+
+import pytest
+
+from github_labels_sync import stats
+from github_labels_sync.fake_github import FakeGitHub
+
+from .conftest import CliRunner
+from .test_push import add_label
+
+
+def test_shared_requests() -> None:
+    records = []
+    record = stats.RequestRecord('graphql', 'POST', '/graphql', 200, 0.3, 100, 200, 3, 'acme/a', 'batch')
+    with stats.shared({'acme/a': 2 / 3, 'acme/b': 1 / 3}):
+        records.extend(stats.split(record))
+    records.extend(stats.split(record))
+    request_stats = stats.Stats()
+    for item in records:
+        request_stats(item)
+    repos = request_stats.group(lambda item: item.repo)
+    assert repos['acme/a'].export() == {'requests': 1.666667, 'failed': 0, 'seconds': 0.5, 'sent': 166.666667,
+                                        'received': 333.333333, 'cost': 5}
+    assert repos['acme/b'].export()['cost'] == 1
+    assert request_stats.get_totals().export() == {'requests': 2, 'failed': 0, 'seconds': 0.6, 'sent': 200,
+                                                   'received': 400, 'cost': 6}
+
+
+def test_batched_mutations_of_repositories(fake: FakeGitHub, run_cli: CliRunner, config_path: str,
+                                           tmp_path: Path) -> None:
+    assert run_cli('--pull') == 0
+    add_label(config_path, 'new', '123456')
+    stats_path = tmp_path / 'stats.json'
+    assert run_cli('--push', '--jobs', '6', '--batch-mutations', '--stats-out', str(stats_path)) == 0
+    data = json.loads(stats_path.read_text())
+    assert data['actions']['batch']['requests'] < len(fake.repos)
+    repos = data['repos']
+    assert sorted(repos) == sorted(fake.repos)
+    assert sum(totals['requests'] for totals in repos.values()) == pytest.approx(data['total']['requests'])
@@ -0,0 +1,30 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from pathlib import Path
+
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.label import Label
+from github_labels_sync.store import LabelStore
+
+from .conftest import CliRunner
+
+
+def test_push_lists_live_labels(fake: FakeGitHub, run_cli: CliRunner) -> None:
+    assert run_cli('--pull') == 0
+    assert run_cli('--push') == 0
+    # Changed by somebody else while the snapshot in the store is still fresh.
+    label = fake.repos['owner1/repo3'].all_labels['label1']
+    fake.update_label(label, {'color': '123456'})
+    assert run_cli('--push') == 0
+    assert fake.repos['owner1/repo3'].all_labels['label1'].color != '123456'
+
+
+def test_find_label_ignores_stale_snapshots(tmp_path: Path) -> None:
+    store = LabelStore(str(tmp_path / 'labels.sqlite'), ttl=300)
+    store.set_labels('owner/repo', [Label.create('bug', 'ff0000', '')])
+    assert [usage.repo for usage in store.find_label('bug')] == ['owner/repo']
+    assert not store.find_label('bug', max_age=0)
+    store.invalidate('owner/repo')
+    assert not store.find_label('bug')
+    store.close()
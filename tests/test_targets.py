@@ -0,0 +1,39 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+import json
+from pathlib import Path
+
+import pytest
+
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub
+from github_labels_sync.label import Label
+from github_labels_sync.targets import TargetSelector
+
+from .conftest import CliRunner
+
+
+def test_push_to_selected_repositories(fake: FakeGitHub, run_cli: CliRunner, config_path: str) -> None:
+    fake.repos['owner1/repo3'].topics = ['labels']
+    fake.repos['owner1/repo5'].topics = ['labels']
+    fake.repos['owner0/repo4'].is_archived = True
+    targets = [{'owner': 'owner0'}, {'owner': 'owner1', 'topics': ['labels'], 'exclude': ['repo5']}]
+    Path(config_path).write_text(json.dumps({
+        'repos': {'primary': 'owner0/repo0', 'secondary': ['owner1/repo1'], 'targets': targets}}))
+    assert run_cli('--pull') == 0
+    config = Config(config_path, cache=False)
+    config.labels.update([Label.create('new', '123456', '')])
+    config.save()
+    assert run_cli('--push') == 0
+    # Archived repositories are skipped by default.
+    assert sorted(repo for repo, item in fake.repos.items() if 'new' in item.all_labels) == [
+        'owner0/repo0', 'owner0/repo2', 'owner1/repo1', 'owner1/repo3']
+
+
+def test_invalid_selector() -> None:
+    assert TargetSelector.load({'owner': 'acme', 'names': ['App-*']}).names == ('app-*',)
+    with pytest.raises(ValueError, match='Unknown keys private'):
+        TargetSelector.load({'owner': 'acme', 'private': True})
+    with pytest.raises(TypeError, match='repos.targets.archived'):
+        TargetSelector.load({'owner': 'acme', 'archived': 'yes'})
@@ -0,0 +1,57 @@
+# Copyright 2018 Jiří Janoušek <janousek.jiri@gmail.com>
+# Licensed under BSD-2-Clause license - see file LICENSE for details.
+
+from typing import Any, Dict, FrozenSet, List, Set, Tuple, Union
+
+import pytest
+import requests
+
+from github_labels_sync.config import Config
+from github_labels_sync.fake_github import FakeGitHub, FakeRepo, FakeServer
+from github_labels_sync.github import GitHub, GraphqlClient, RestClient
+from github_labels_sync.label import Label
+from github_labels_sync.push_command import PushOptions, push
+from github_labels_sync.tokens import Token, TokenPool
+
+
+class Session(requests.Session):
+    # Records the token of each GraphQL request with owners of repositories it accesses by names or node IDs.
+    def __init__(self, fake: FakeGitHub) -> None:
+        super().__init__()
+        self.fake = fake
+        self.sent: List[Tuple[str, FrozenSet[str]]] = []
+
+    def request(self, method: Union[str, bytes], url: Union[str, bytes],
+                *args: Any, **kwargs: Any) -> requests.Response:
+        if 'json' in kwargs:
+            owners: Set[str] = set()
+            self.find_owners(kwargs['json']['variables'], owners)
+            self.sent.append((kwargs['headers']['Authorization'], frozenset(owners)))
+        return super().request(method, url, *args, **kwargs)
+
+    def find_owners(self, value: Any, owners: Set[str], key: str = '') -> None:
+        if isinstance(value, dict):
+            for item_key, item in value.items():
+                self.find_owners(item, owners, item_key)
+        elif isinstance(value, str) and key.startswith('owner'):
+            owners.add(value.lower())
+        elif isinstance(value, str) and value in self.fake.nodes:
+            node: Any = self.fake.nodes[value]
+            owners.add((node if isinstance(node, FakeRepo) else node.repo).owner.lower())
+
+
+@pytest.mark.parametrize('linger', [0.0, 0.5])
+def test_batches_use_allowed_tokens(fake: FakeGitHub, server: FakeServer, config_path: str, linger: float) -> None:
+    session = Session(fake)
+    github = GitHub(GraphqlClient(server.graphql_url, session), RestClient(server.url, session))
+    github.set_tokens(TokenPool([Token('a', ['owner0']), Token('b', ['owner1'])]))
+    github.set_batching(linger=linger)
+    config = Config(config_path)
+    config.labels.update(github.list_labels(config.primary_repo))
+    config.labels.update([Label.create('new', '123456', '')])
+    config.save()
+    assert push(github, config, PushOptions(jobs=4)) == 0
+    assert all('new' in repo.all_labels for repo in fake.repos.values())
+    tokens: Dict[str, FrozenSet[str]] = {'bearer a': frozenset(['owner0']), 'bearer b': frozenset(['owner1'])}
+    assert session.sent
+    assert all(owners <= tokens[authorization] for authorization, owners in session.sent)